@@ -24,6 +24,7 @@
         'security/ir.model.access.csv',
         'data/kiosk_config_data.xml',
         'data/forher_attendance_type_data.xml',
+        'data/ir_cron.xml',
         # 'data/forher_calendar_data.xml',
         # 'data/forher_calendar_fulltime.xml',
         # 'data/forher_attendance_catoi.xml',
@@ -36,6 +37,14 @@
         'views/kiosk_templates.xml',   # <-- ĐỂ SAU
         'views/hr_attendance_manager_views.xml',
         'views/forher_shift_views.xml',
+        'views/forher_shift_rotation_views.xml',
+        'views/attendance_monthly_summary_views.xml',
+        'views/attendance_daily_report_views.xml',
+        'views/attendance_archive_views.xml',
+        'views/attendance_approval_job_views.xml',
+        'views/attendance_kiosk_punch_views.xml',
+        'wizard/attendance_import_wizard_views.xml',
+        'wizard/shift_roster_wizard_views.xml',
         'views/menu.xml',
     ],
     'installable': True,
@@ -1,71 +1,59 @@
 # controllers/kiosk.py
 from odoo import http, _, fields
 from odoo.http import request
+from odoo.addons.forher_company_overview.models.perf_profiler import profiled
 import pytz
-from datetime import datetime, time
-
-def _today_range_utc(env):
-    """Trả về cặp (day_start_utc, day_end_utc) theo timezone user để so khớp 'trong ngày'."""
-    user_tz = pytz.timezone(env.user.tz or 'UTC')
-    now_utc = fields.Datetime.now()
-    aware_utc = now_utc.replace(tzinfo=pytz.UTC)
-    local_now = aware_utc.astimezone(user_tz)
-    local_date = local_now.date()
-    local_start = datetime.combine(local_date, time.min).replace(tzinfo=user_tz)
-    local_end   = datetime.combine(local_date, time.max).replace(tzinfo=user_tz)
-    day_start_utc = local_start.astimezone(pytz.UTC)
-    day_end_utc   = local_end.astimezone(pytz.UTC)
-    return day_start_utc, day_end_utc
+from datetime import datetime, timedelta
 
-class ForherKioskController(http.Controller):
-
-    def _get_kiosk_employees(self):
-        """Lấy danh sách nhân viên hiển thị trên kiosk theo Record Rule."""
-        user = request.env.user
-        Employee = request.env['hr.employee']  # KHÔNG sudo()
-
-        # Search tất cả active employee → Record Rule sẽ tự filter
-        employees = Employee.search([('active', '=', True)], order='name')
-
-        # Lấy company_ids của employee đang đăng nhập (dùng để hiển thị tên chi nhánh)
-        employee = user.employee_ids[:1]
-        company_ids = employee.company_id.child_ids.ids + [employee.company_id.id] if employee else []
+# Độ lệch đồng hồ tối đa chấp nhận cho thời gian chấm công gửi từ client
+KIOSK_CLOCK_SKEW = timedelta(minutes=5)
 
-        return employees, company_ids
+class ForherKioskController(http.Controller):
 
+    def _get_kiosk_company_ids(self):
+        """Chi nhánh của nhân viên đang đăng nhập (kèm chi nhánh con)."""
+        employee = request.env.user.employee_ids[:1]
+        return employee.company_id.child_ids.ids + [employee.company_id.id] if employee else []
 
     @http.route('/forher_attendance/kiosk', type='http', auth='user', website=True, csrf=False)
     def kiosk_page(self, **kw):
-        employees, company_ids = self._get_kiosk_employees()
+        # Danh sách nhân viên được kiosk.js tải dần qua /kiosk/employees
+        company_ids = self._get_kiosk_company_ids()
         return request.render('forher_attendance.kiosk_form', {
-            'employees': employees,
             'kiosk_company_name': ', '.join(request.env['res.company'].browse(company_ids).mapped('name')),
         })
 
-    @http.route('/forher_attendance/kiosk/punch', type='http', auth='user', methods=['POST'], csrf=False)
-    def kiosk_punch(self, **post):
-        fixed_loc = request.env['ir.config_parameter'].sudo().get_param('forher_attendance.kiosk_location', 'Store Front')
-        pin  = (post.get('pin') or '').strip()
-        code = (post.get('code') or '').strip()
+    @http.route('/forher_attendance/kiosk/employees', type='json', auth='user', methods=['POST'])
+    @profiled()
+    def kiosk_employees(self, query='', offset=0, limit=50, **kw):
+        """Tìm nhân viên theo tiền tố tên/mã, phân trang (danh sách lấy từ cache theo Record Rule)."""
         try:
-            emp_id = int(post.get('employee_id') or 0)
-        except Exception:
+            offset = max(int(offset or 0), 0)
+            limit = min(max(int(limit or 50), 1), 200)
+        except (TypeError, ValueError):
+            offset, limit = 0, 50
+        # KHÔNG sudo(): Record Rule quyết định nhân viên nào hiển thị
+        return request.env['hr.employee']._search_kiosk_roster(str(query or ''), offset, limit)
+
+    def _find_punch_employee(self, employee_id=None, pin=None, code=None):
+        """Xác định nhân viên chấm công, trả về (employee, error)."""
+        pin = (pin or '').strip()
+        code = (code or '').strip()
+        try:
+            emp_id = int(employee_id or 0)
+        except (TypeError, ValueError):
             emp_id = 0
 
         Employee = request.env['hr.employee'].sudo()
-        Attendance = request.env['hr.attendance'].sudo()
-        employees, company_ids = self._get_kiosk_employees()
-
-        # Xác định employee
-        employee = False
+        employee = Employee
         if emp_id:
             emp = Employee.browse(emp_id)
-            if not emp.exists() or emp.company_id.id not in company_ids:
-                employee = False
+            if not emp.exists() or emp.company_id.id not in self._get_kiosk_company_ids():
+                employee = Employee
             elif not emp.pin:
-                return self._render_error('Nhân viên này chưa được gán PIN.', employees)
+                return Employee, 'Nhân viên này chưa được gán PIN.'
             elif not pin or pin != emp.pin:
-                return self._render_error('PIN không đúng.', employees)
+                return Employee, 'PIN không đúng.'
             else:
                 employee = emp
         else:
@@ -78,78 +66,176 @@ class ForherKioskController(http.Controller):
                 ], limit=1)
 
         if not employee:
-            return self._render_error(_('Không tìm thấy nhân viên. Kiểm tra lựa chọn/PIN/Mã!'), employees)
-
-        # Tính "hôm nay" theo TZ user
-        day_start_utc, day_end_utc = _today_range_utc(request.env)
-
-        # Tra cứu bản ghi hôm nay
-        today_att = Attendance.search([
-            ('employee_id', '=', employee.id),
-            ('check_in', '>=', fields.Datetime.to_string(day_start_utc)),
-            ('check_in', '<=', fields.Datetime.to_string(day_end_utc)),
-        ], limit=1, order='check_in desc')
-
-        # Nếu đã check-in & check-out -> thông báo 1 ngày 1 lần
-        if today_att and today_att.check_out:
-            return self._render_error('Bạn được chấm công 1 ngày/1 lần. Hôm nay bạn đã hoàn thành chấm công.', employees)
-
-        # Nếu đã check-in hôm nay nhưng chưa check-out -> thực hiện check-out
-        if today_att and not today_att.check_out:
-            try:
-                today_att.write({
-                    'check_out': fields.Datetime.now(),
-                    'check_out_note': 'Kiosk',
-                    'check_out_location': fixed_loc,
-                })
-            except Exception as e:
-                request.env.cr.rollback()
-                return self._render_error(str(e), employees)
-
-            return request.render('forher_attendance.kiosk_success', {
-                'employee': employee,
-                'action': 'checkout',
-                'location': fixed_loc,
-                'now': fields.Datetime.context_timestamp(request.env.user, fields.Datetime.now()),
-            })
-
-        # Kiểm tra bản ghi mở từ ngày trước
-        open_att = Attendance.search([
-            ('employee_id', '=', employee.id),
-            ('check_out', '=', False),
-        ], limit=1, order='check_in desc')
+            return Employee, _('Không tìm thấy nhân viên. Kiểm tra lựa chọn/PIN/Mã!')
+        return employee, None
 
-        if open_att:
-            return self._render_error('Bạn còn bản ghi chấm công ngày trước chưa kết thúc. Vui lòng liên hệ quản lý để xử lý.', employees)
+    def _do_punch(self, employee, punch_time=None):
+        """Check-in / check-out cho 1 nhân viên, trả về (action, error)."""
+        return request.env['forher.attendance.kiosk.punch'].sudo()._punch(employee, punch_time)
 
-        # Check-in lần đầu trong ngày
+    def _find_offline_employee(self, employee_id=None, code=None):
+        """Nhân viên của lượt offline (kiosk không lưu PIN): theo lựa chọn hoặc mã, trong chi nhánh kiosk."""
+        company_ids = self._get_kiosk_company_ids()
+        Employee = request.env['hr.employee'].sudo()
         try:
-            Attendance.create({
-                'employee_id': employee.id,
-                'check_in': fields.Datetime.now(),
-                'check_in_note': 'Kiosk',
-                'check_in_location': fixed_loc,
-            })
-        except Exception as e:
-            request.env.cr.rollback()
-            return self._render_error(str(e), employees)
+            emp_id = int(employee_id or 0)
+        except (TypeError, ValueError):
+            emp_id = 0
+        code = (code or '').strip()
+        if emp_id:
+            employee = Employee.browse(emp_id).exists()
+        elif code:
+            employee = Employee.search([
+                '|', ('employee_code', '=', code), ('barcode', '=', code),
+                ('active', '=', True),
+            ], limit=1)
+        else:
+            employee = Employee
+        if employee and employee.company_id.id in company_ids:
+            return employee
+        return Employee
+
+    @http.route('/forher_attendance/kiosk/punch', type='http', auth='user', methods=['POST'], csrf=False)
+    @profiled()
+    def kiosk_punch(self, **post):
+        employee, error = self._find_punch_employee(post.get('employee_id'), post.get('pin'), post.get('code'))
+        action = None
+        if not error:
+            action, error = self._do_punch(employee)
+        if error:
+            return self._render_error(error)
 
         return request.render('forher_attendance.kiosk_success', {
             'employee': employee,
-            'action': 'checkin',
-            'location': fixed_loc,
+            'action': action,
+            'location': request.env['ir.config_parameter'].sudo().get_param('forher_attendance.kiosk_location', 'Store Front'),
             'now': fields.Datetime.context_timestamp(request.env.user, fields.Datetime.now()),
         })
 
-    def _render_error(self, message, employees):
+    @http.route('/forher_attendance/kiosk/punch_json', type='json', auth='user', methods=['POST'])
+    @profiled()
+    def kiosk_punch_json(self, employee_id=None, pin=None, code=None, key=None, **kw):
+        """Chấm công qua fetch từ kiosk.js: không render template, payload tối thiểu."""
+        punch = {'key': key, 'employee_id': employee_id, 'pin': pin, 'code': code}
+        if key:
+            done = request.env['forher.attendance.kiosk.punch'].sudo().search([('key', '=', key)], limit=1)
+            if not done:
+                done = self._apply_kiosk_punches([(fields.Datetime.now(), punch)])
+            return self._with_shift(self._punch_log_result(done), done.employee_id, done.punch_time)
+
+        employee, error = self._find_punch_employee(employee_id, pin, code)
+        action = None
+        if not error:
+            action, error = self._do_punch(employee)
+        if error:
+            return {'ok': False, 'error': error}
+        now = fields.Datetime.now()
+        return self._with_shift(self._punch_result(employee, action, now), employee, now)
+
+    @http.route('/forher_attendance/kiosk/sync', type='json', auth='user', methods=['POST'])
+    @profiled()
+    def kiosk_sync(self, punches=None, **kw):
+        """Đồng bộ hàng đợi chấm công offline của kiosk trong 1 lần gọi.
+
+        ``punches`` là danh sách {key, employee_id, code, timestamp (ISO 8601)}; kiosk không
+        lưu PIN nên lượt offline không được áp dụng ngay mà ghi nhật ký 'Chờ duyệt' để quản
+        lý duyệt. Thời gian phải nằm trong cửa sổ offline cấu hình (không ghi lùi quá xa,
+        không ở tương lai). Mã đã xử lý trả lại kết quả cũ.
+        """
+        punches = [p for p in (punches or []) if isinstance(p, dict) and p.get('key')]
+        KioskPunch = request.env['forher.attendance.kiosk.punch'].sudo()
+        done = KioskPunch.search([('key', 'in', list({p['key'] for p in punches}))])
+        done_keys = set(done.mapped('key'))
+        results = [self._punch_log_result(log) for log in done]
+
+        now = fields.Datetime.now()
+        oldest = now - KioskPunch._get_offline_window()
+        log_vals = {}
+        for punch in punches:
+            if punch['key'] in done_keys or punch['key'] in log_vals:
+                continue
+            vals = {'key': punch['key'], 'offline': True}
+            punch_time = self._parse_client_time(punch.get('timestamp'))
+            employee = self._find_offline_employee(punch.get('employee_id'), punch.get('code'))
+            if not punch_time or punch_time > now + KIOSK_CLOCK_SKEW:
+                vals.update(state='rejected', message='Thời gian chấm công không hợp lệ.')
+            elif punch_time < oldest:
+                vals.update(state='rejected', message='Lượt chấm công offline đã quá thời hạn đồng bộ.')
+            elif not employee:
+                vals.update(state='rejected', message=_('Không tìm thấy nhân viên. Kiểm tra lựa chọn/PIN/Mã!'))
+            else:
+                vals.update(state='review', message='Chấm công offline, chờ quản lý duyệt.')
+            vals.update(employee_id=employee.id, punch_time=punch_time or False)
+            log_vals[punch['key']] = vals
+
+        logs = KioskPunch.create(list(log_vals.values()))
+        results += [self._punch_log_result(log) for log in logs]
+        return {'results': results}
+
+    def _parse_client_time(self, value):
+        """Thời gian ISO 8601 từ client → datetime UTC naive."""
+        if not value or not isinstance(value, str):
+            return None
+        try:
+            value = datetime.fromisoformat(value.replace('Z', '+00:00'))
+        except ValueError:
+            return None
+        if value.tzinfo:
+            value = value.astimezone(pytz.UTC).replace(tzinfo=None)
+        return value.replace(microsecond=0)
+
+    def _apply_kiosk_punches(self, items):
+        """Áp dụng lần lượt các (punch_time, punch) và ghi nhật ký bằng 1 lần create."""
+        log_vals = []
+        for punch_time, punch in items:
+            employee, error = self._find_punch_employee(punch.get('employee_id'), punch.get('pin'), punch.get('code'))
+            action = None
+            if not error:
+                action, error = self._do_punch(employee, punch_time)
+            log_vals.append({
+                'key': punch['key'],
+                'employee_id': employee.id,
+                'punch_time': punch_time,
+                'action': action,
+                'state': 'rejected' if error else 'done',
+                'message': error,
+            })
+        return request.env['forher.attendance.kiosk.punch'].sudo().create(log_vals)
+
+    def _punch_result(self, employee, action, punch_time):
+        local_time = fields.Datetime.context_timestamp(request.env.user, punch_time)
+        return {
+            'ok': True,
+            'action': action,
+            'employee': employee.name,
+            'time': local_time.strftime('%H:%M:%S - %d/%m/%Y'),
+        }
+
+    def _with_shift(self, result, employee, punch_time):
+        """Bổ sung ca làm trong ngày của nhân viên vào kết quả chấm công."""
+        if result.get('ok') and employee:
+            day = fields.Datetime.context_timestamp(request.env.user, punch_time).date()
+            lines = request.env['forher.shift.assignment.line'].sudo()._get_employee_shifts(employee.id, day)
+            result['shift'] = ', '.join(lines.shift_id.mapped('name'))
+        return result
+
+    def _punch_log_result(self, log):
+        if log.state == 'done':
+            result = self._punch_result(log.employee_id, log.action, log.punch_time)
+        elif log.state == 'review':
+            result = {'ok': True, 'review': True, 'employee': log.employee_id.name, 'message': log.message}
+        else:
+            result = {'ok': False, 'error': log.message}
+        result['key'] = log.key
+        return result
+
+    def _render_error(self, message):
         """Helper render template lỗi"""
         return request.render('forher_attendance.kiosk_form', {
             'error': message,
-            'employees': employees,
         })
     
     @http.route('/forher_attendance/kiosk/thank_you', type='http', auth='user', website=True, csrf=False)
     def kiosk_thank_you(self, **kw):
         """Trang cảm ơn sau khi chấm công"""
         return request.render('forher_attendance.kiosk_thank_you')
-
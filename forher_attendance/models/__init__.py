@@ -1 +1,11 @@
 from . import attendance
+from . import attendance_monthly_summary
+from . import attendance_import
+from . import attendance_auto_close
+from . import attendance_kiosk_punch
+from . import shift_rotation
+from . import shift_assignment_line
+from . import attendance_approval_job
+from . import attendance_archive
+from . import attendance_daily_report
+from . import holiday_recompute
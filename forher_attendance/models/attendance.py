@@ -1,9 +1,15 @@
 # file: models/forher_attendance.py
-from odoo import api, fields, models, _, tools
+from odoo import api, fields, models, _
 from odoo.exceptions import ValidationError, UserError
+from odoo.tools.lru import LRU
 from datetime import datetime, timedelta, date
 import pytz
+import unicodedata
 from odoo.http import request
+from odoo.addons.forher_company_overview.models.perf_profiler import profiled
+
+# Danh sách nhân viên kiosk: (db, user, tập chi nhánh) → (phiên bản, roster); chỉ giữ bản mới nhất
+_kiosk_roster_cache = LRU(256)
 
 # -------------------------
 # Attendance Type (loại công)
@@ -70,29 +76,33 @@ class HrAttendance(models.Model):
         ('rejected', 'Bị từ chối'),
     ], string="Trạng thái", default="draft")
 
-    def action_send_to_confirm(self):
-        for rec in self:
-            rec.state = 'to_confirm'
-        return True
-
-    def action_confirm(self):
-        for rec in self:
-            rec.state = 'confirmed'
-        return True
-
-    def action_validate(self):
-        for rec in self:
-            rec.state = 'validated'
-        return True
+    # 1 bản ghi / nhân viên / ngày (local) và tối đa 1 bản ghi chưa check-out / nhân viên,
+    # được DB đảm bảo nên không bị lọt khi nhiều kiosk chấm công cùng lúc
+    _sql_constraints = [
+        ('employee_date_uniq', 'unique(employee_id, date)',
+         'Nhân viên đã chấm công trong ngày này. Chỉ được chấm 1 lần/ngày.'),
+        ('employee_open_uniq', 'EXCLUDE USING btree (employee_id WITH =) WHERE (check_out IS NULL)',
+         'Nhân viên đang có bản ghi chấm công chưa kết thúc.'),
+    ]
+
+    def init(self):
+        # Index phủ cho tra cứu "bản ghi gần nhất / đang mở" của nhân viên theo check_in
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS hr_attendance_employee_check_in_idx
+                ON %s (employee_id, check_in) INCLUDE (check_out, state)
+        """ % self._table)
 
-    def action_reject(self):
-        for rec in self:
-            rec.state = 'rejected'
-        return True
+    @api.model
+    def _get_constraint_error(self, exc):
+        """Thông báo đã dịch cho lỗi vi phạm ràng buộc DB của chấm công, None nếu không phải."""
+        constraint = getattr(getattr(exc, 'diag', None), 'constraint_name', None)
+        for key, _definition, message in self._sql_constraints:
+            if constraint == '%s_%s' % (self._table, key):
+                return _(message)
+        return None
 
     def action_set_draft(self):
-        for rec in self:
-            rec.state = 'draft'
+        self.write({'state': 'draft'})
         return True
 
     date_start = fields.Datetime(
@@ -139,8 +149,30 @@ class HrAttendance(models.Model):
         default=0.0
     )
 
+    @staticmethod
+    def _to_local(dt, user_tz):
+        """Chuyển datetime UTC (naive) của Odoo sang giờ local theo ``user_tz``."""
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=pytz.UTC)
+        return dt.astimezone(user_tz)
+
+    def _get_shift_window_map(self, user_tz):
+        """Nạp ca làm cho toàn bộ recordset bằng 1 truy vấn.
+
+        Trả về dict {(employee_id, ngày local): [(shift_id, planned_start, planned_end), ...]}
+        dùng chung cho các compute và constraint bên dưới.
+        """
+        pairs = [
+            (rec.employee_id.id, self._to_local(rec.check_in, user_tz).date())
+            for rec in self if rec.check_in and rec.employee_id
+        ]
+        return self.env['forher.shift.assignment']._get_shift_windows(pairs, user_tz)
+
     @api.depends("check_in", "check_out", "employee_id", "is_holiday")
+    @profiled()
     def _compute_ot_hours(self):
+        user_tz = pytz.timezone(self.env.user.tz or "UTC")
+        shift_windows = self._get_shift_window_map(user_tz)
         for rec in self:
             rec.ot_hours_normal = 0.0
             rec.ot_hours_holiday = 0.0
@@ -150,32 +182,14 @@ class HrAttendance(models.Model):
             if not rec.check_in or not rec.check_out or not rec.employee_id:
                 continue
 
-            # timezone
-            user_tz = pytz.timezone(self.env.user.tz or "UTC")
-            local_in = rec.check_in.astimezone(user_tz)
-            local_out = rec.check_out.astimezone(user_tz)
-            d = local_in.date()
+            local_in = self._to_local(rec.check_in, user_tz)
+            local_out = self._to_local(rec.check_out, user_tz)
 
             # Lấy ca làm
-            assignment = self.env['forher.shift.assignment'].search([
-                ('employee_ids', 'in', rec.employee_id.id),
-                ('date', '=', d),
-            ], limit=1)
-            if not assignment or not assignment.shift_id:
+            windows = shift_windows.get((rec.employee_id.id, local_in.date()))
+            if not windows:
                 continue
-
-            shift = assignment.shift_id
-
-            def float_to_time(float_hour):
-                hour = int(float_hour)
-                minute = int((float_hour % 1) * 60)
-                return time(hour, minute)
-
-            shift_start = float_to_time(shift.start_time)
-            shift_end = float_to_time(shift.end_time)
-
-            planned_start = user_tz.localize(datetime.combine(d, shift_start))
-            planned_end = user_tz.localize(datetime.combine(d, shift_end))
+            _shift_id, planned_start, planned_end = windows[0]
 
             # Số giờ OT: chỉ tính sau ca
             ot_hours = max(0.0, (local_out - planned_end).total_seconds() / 3600)
@@ -188,34 +202,21 @@ class HrAttendance(models.Model):
             rec.ot_hours_total = rec.ot_hours_normal + rec.ot_hours_holiday
             rec.ot_done = rec.ot_hours_total
 
-
-    
-    from datetime import datetime, time
-
     @api.depends('check_in', 'check_out', 'employee_id')
+    @profiled()
     def _compute_worked_hours_float(self):
+        user_tz = pytz.timezone(self.env.user.tz or "UTC")
+        shift_windows = self._get_shift_window_map(user_tz)
         for rec in self:
             if rec.check_in and rec.check_out:
-                assignment = self.env['forher.shift.assignment'].search([
-                    ('employee_ids', 'in', rec.employee_id.id),
-                    ('date', '=', rec.check_in.date())
-                ], limit=1)
-                if assignment and assignment.shift_id:
-                    user_tz = pytz.timezone(self.env.user.tz or "UTC")
-                    shift_start = assignment.shift_id.start_time
-                    shift_end = assignment.shift_id.end_time
-
-                    # Giờ bắt đầu/ kết thúc ca
-                    start_hour = int(shift_start)
-                    start_minute = int((shift_start % 1) * 60)
-                    end_hour = int(shift_end)
-                    end_minute = int((shift_end % 1) * 60)
-                    planned_start = user_tz.localize(datetime.combine(rec.check_in.date(), time(start_hour, start_minute)))
-                    planned_end = user_tz.localize(datetime.combine(rec.check_in.date(), time(end_hour, end_minute)))
+                local_in = self._to_local(rec.check_in, user_tz)
+                windows = shift_windows.get((rec.employee_id.id, local_in.date()))
+                if windows:
+                    _shift_id, planned_start, planned_end = windows[0]
 
                     # Giờ làm thực tế trong ca (không vượt quá end ca)
-                    actual_start = max(planned_start, rec.check_in.astimezone(user_tz))
-                    actual_end = min(planned_end, rec.check_out.astimezone(user_tz))  # giới hạn tới end ca
+                    actual_start = max(planned_start, local_in)
+                    actual_end = min(planned_end, self._to_local(rec.check_out, user_tz))  # giới hạn tới end ca
                     delta = actual_end - actual_start
                     rec.worked_hours_float = max(delta.total_seconds() / 3600.0, 0.0)
                 else:
@@ -227,102 +228,131 @@ class HrAttendance(models.Model):
 
 
     @api.depends('employee_id', 'check_in', 'check_out')
+    @profiled()
     def _compute_is_holiday(self):
+        holiday_dates = self.env['forher.holiday.calendar']._get_holiday_dates()
         for rec in self:
-            rec.is_holiday = False
             date_check = rec.check_in.date() if rec.check_in else False
-            if date_check:
-                holiday_dates = self.env['forher.holiday.calendar'].search([]).mapped('date')
-                if date_check in holiday_dates:
-                    rec.is_holiday = True
+            rec.is_holiday = bool(date_check and date_check in holiday_dates)
 
     @api.depends('employee_id', 'check_in', 'check_out')
+    @profiled()
     def _compute_is_leave(self):
+        on_leave = self.env['forher.leave.request']._get_on_leave_pairs(
+            (rec.employee_id.id, rec.check_in.date()) for rec in self if rec.employee_id and rec.check_in
+        )
         for rec in self:
-            rec.is_leave = False
-            if rec.employee_id and rec.check_in:
-                date_check = rec.check_in.date()
-                leave = self.env['forher.leave.request'].search([
-                    ('employee_id', '=', rec.employee_id.id),
-                    ('state', 'in', ['approve', 'confirm']),
-                    ('start_date', '<=', date_check),
-                    ('end_date', '>=', date_check)
-                ], limit=1)
-                if leave:
-                    rec.is_leave = True
+            rec.is_leave = bool(
+                rec.employee_id and rec.check_in
+                and (rec.employee_id.id, rec.check_in.date()) in on_leave
+            )
 
-    @api.model
-    def create(self, vals):
-        record = super(HrAttendance, self).create(vals)
-        employee = record.employee_id
-        date_check = record.check_in.date() if record.check_in else False
-
-        if employee and date_check:
-            # --- 1. Ngày nghỉ phép ---
-            leave = self.env['forher.leave.request'].search([
-                ('employee_id', '=', employee.id),
-                ('state', 'in', ['approve', 'confirm']),
-                ('start_date', '<=', date_check),
-                ('end_date', '>=', date_check)
-            ], limit=1)
-
-            if leave:
-                record.write({'is_leave': True})
-                raise ValidationError(
-                    _('Ngày %s là ngày nghỉ phép của nhân viên %s. Không thể chấm công.') %
-                    (date_check.strftime('%d/%m/%Y'), employee.name)
-                )
+    def _get_forher_attendance_type(self, code, name, unit, operator='='):
+        AttendanceType = self.env['forher.attendance.type']
+        att_type = AttendanceType.search([('code', operator, code)], limit=1)
+        if not att_type:
+            att_type = AttendanceType.create({
+                'name': name,
+                'code': code,
+                'unit': unit,
+                'amount': 0.0
+            })
+        return att_type
+
+    @api.model_create_multi
+    @profiled()
+    def create(self, vals_list):
+        records = super(HrAttendance, self).create(vals_list)
+        holiday_dates = self.env['forher.holiday.calendar']._get_holiday_dates()
+        standard_records = self.browse()
+
+        for record in records:
+            employee = record.employee_id
+            date_check = record.check_in.date() if record.check_in else False
+
+            if employee and date_check:
+                # --- 1. Ngày nghỉ phép (is_leave đã được tính theo lô) ---
+                if record.is_leave:
+                    raise ValidationError(
+                        _('Ngày %s là ngày nghỉ phép của nhân viên %s. Không thể chấm công.') %
+                        (date_check.strftime('%d/%m/%Y'), employee.name)
+                    )
 
-            # --- 2. Ngày lễ ---
-            holiday_dates = self.env['forher.holiday.calendar'].search([]).mapped('date')
-            if date_check in holiday_dates:
-                ot_type = self.env['forher.attendance.type'].search([('code', 'ilike', 'OT')], limit=1)
-                if not ot_type:
-                    ot_type = self.env['forher.attendance.type'].create({
-                        'name': 'Overtime',
-                        'code': 'OT',
-                        'unit': 'hour',
-                        'amount': 0.0
+                # --- 2. Ngày lễ ---
+                if date_check in holiday_dates:
+                    ot_type = self._get_forher_attendance_type('OT', 'Overtime', 'hour', operator='ilike')
+                    record.write({
+                        'is_holiday': True,
+                        'attendance_type_id': ot_type.id,
+                        'quantity': record.worked_hours_float or 0.0,
+                        'total_amount': (record.worked_hours_float or 0.0) * 27000
                     })
-                record.write({
-                    'is_holiday': True,
-                    'attendance_type_id': ot_type.id,
-                    'quantity': record.worked_hours_float or 0.0,
-                    'total_amount': (record.worked_hours_float or 0.0) * 27000
-                })
-                return record
+                    continue
+
+            standard_records |= record
+
+        if not standard_records:
+            return records
 
         # --- 3. Logic công chuẩn / OT / Holiday ---
-        record._compute_late_early()
-        if record.is_holiday:
+        standard_records._compute_late_early()
+        holiday_records = standard_records.filtered('is_holiday')
+        if holiday_records:
             # Nếu là ngày lễ → set loại HOLIDAY
-            holiday_type = self.env['forher.attendance.type'].search([('code', '=', 'HOLIDAY')], limit=1)
-            if not holiday_type:
-                holiday_type = self.env['forher.attendance.type'].create({
-                    'name': 'Ngày lễ',
-                    'code': 'HOLIDAY',
-                    'unit': 'day',
-                    'amount': 0.0
-                })
-            record.attendance_type_id = holiday_type.id
-        else:
+            holiday_records.attendance_type_id = self._get_forher_attendance_type('HOLIDAY', 'Ngày lễ', 'day')
+        if standard_records - holiday_records:
             # Ngày thường → luôn set công chuẩn, đi trễ/về sớm không thay đổi
-            chuan_type = self.env['forher.attendance.type'].search([('code', '=', 'CHUAN')], limit=1)
-            if not chuan_type:
-                chuan_type = self.env['forher.attendance.type'].create({
-                    'name': 'Công chuẩn',
-                    'code': 'CHUAN',
-                    'unit': 'day',
-                    'amount': 0.0
-                })
-            record.attendance_type_id = chuan_type.id
-
+            (standard_records - holiday_records).attendance_type_id = self._get_forher_attendance_type('CHUAN', 'Công chuẩn', 'day')
 
         # --- 4. Tính tổng tiền ---
-        record._compute_total_amount()
-        return record
+        standard_records._compute_total_amount()
+        return records
+
+    def _reclassify_holiday_type(self):
+        """Gán lại loại công cho các bản ghi vừa đổi trạng thái ngày lễ, theo đúng quy tắc lúc tạo.
+
+        Vào ngày lễ → OT; hết là ngày lễ → bản ghi OT/HOLIDAY tự gán về công chuẩn. Chỉ ghi loại
+        công (mỗi loại 1 lệnh, bỏ qua cập nhật tổng hợp tháng); số lượng / thành tiền và tổng hợp
+        tháng do người gọi tính lại theo lô.
+        """
+        ot_type = self._get_forher_attendance_type('OT', 'Overtime', 'hour', operator='ilike')
+        holiday_type = self._get_forher_attendance_type('HOLIDAY', 'Ngày lễ', 'day')
+        records = self.with_context(forher_skip_summary_refresh=True)
+        to_holiday = records.filtered(lambda r: r.employee_id and r.check_in and r.is_holiday)
+        if to_holiday:
+            to_holiday.attendance_type_id = ot_type
+        to_standard = (records - to_holiday).filtered(
+            lambda r: not r.is_holiday and r.attendance_type_id in (ot_type | holiday_type))
+        if to_standard:
+            to_standard.attendance_type_id = self._get_forher_attendance_type('CHUAN', 'Công chuẩn', 'day')
+
+    # Trường làm thay đổi tổng hợp tháng (trực tiếp hoặc qua các trường tính toán)
+    SUMMARY_FIELDS = (
+        'state', 'employee_id', 'date', 'check_in', 'check_out', 'attendance_type_id',
+        'quantity', 'total_amount', 'branch_id', 'ot_done',
+    )
+
+    def write(self, vals):
+        Summary = self.env['forher.attendance.monthly.summary']
+        if self.env.context.get('forher_skip_summary_refresh') or not any(
+                field in vals for field in self.SUMMARY_FIELDS):
+            return super().write(vals)
+        # Khoá cũ phải lấy trước khi ghi: đổi nhân viên/ngày/trạng thái làm mất khoá cũ
+        keys = Summary._get_summary_keys(self)
+        res = super().write(vals)
+        # Cập nhật tổng hợp tháng cho các (nhân viên, tháng) bị ảnh hưởng, cả cũ lẫn mới
+        Summary._refresh_keys(keys | Summary._get_summary_keys(self))
+        return res
+
+    def unlink(self):
+        Summary = self.env['forher.attendance.monthly.summary']
+        keys = Summary._get_summary_keys(self)
+        res = super().unlink()
+        Summary._refresh_keys(keys)
+        return res
 
     @api.depends('check_in', 'check_out', 'attendance_type_id', 'ot_done')
+    @profiled()
     def _compute_total_amount(self):
         HOURLY_RATE = 27000
         for rec in self:
@@ -365,7 +395,10 @@ class HrAttendance(models.Model):
             rec.ot_hours_display = rec.ot_done or 0.0
 
     @api.constrains('check_in', 'employee_id')
+    @profiled()
     def _check_one_attendance_per_day_and_contract(self):
+        user_tz = pytz.timezone(self.env.user.tz or 'UTC')
+        shift_windows = self._get_shift_window_map(user_tz)
         for rec in self:
             if not rec.check_in or not rec.employee_id:
                 continue
@@ -378,114 +411,91 @@ class HrAttendance(models.Model):
                 )
 
             # 2. Kiểm tra phân ca trong ngày
-            user_tz = pytz.timezone(self.env.user.tz or 'UTC')
-            dt = rec.check_in if rec.check_in.tzinfo else rec.check_in.replace(tzinfo=pytz.UTC)
-            local_dt = dt.astimezone(user_tz)
+            local_dt = self._to_local(rec.check_in, user_tz)
             d = local_dt.date()
 
-            assignments = self.env['forher.shift.assignment'].search([
-                ('employee_ids', 'in', rec.employee_id.id),
-                ('date', '=', d),
-            ])
-            if not assignments:
+            windows = shift_windows.get((rec.employee_id.id, d))
+            if not windows:
                 raise ValidationError(
                     _('Nhân viên %s chưa được phân ca trong ngày %s. Không thể chấm công.') %
                     (rec.employee_id.name, d.strftime('%d/%m/%Y'))
                 )
 
             # 👉 2.1: Ràng buộc giờ check_in theo ca
-            def float_to_time(float_hour):
-                hour = int(float_hour)
-                minute = int(round((float_hour % 1) * 60))
-                return time(hour, minute)
-
-            valid_shift = False
-            for assign in assignments:
-                shift = assign.shift_id
-                if not shift:
-                    continue
-
-                shift_start = float_to_time(shift.start_time)
-                shift_end   = float_to_time(shift.end_time)
-
-                planned_start = user_tz.localize(datetime.combine(d, shift_start))
-                planned_end   = user_tz.localize(datetime.combine(d, shift_end))
-
-                # Cho phép từ 30p trước giờ ca → hết ca
-                allowed_start = planned_start - timedelta(minutes=30)
-                allowed_end   = planned_end
-
-                if allowed_start <= local_dt <= allowed_end:
-                    valid_shift = True
-                    break
-
+            # Cho phép từ 30p trước giờ ca → hết ca
+            valid_shift = any(
+                planned_start - timedelta(minutes=30) <= local_dt <= planned_end
+                for _shift_id, planned_start, planned_end in windows
+            )
             if not valid_shift:
                 raise ValidationError(('Không có ca làm trong khoảng thời gian này. Không thể chấm công. Vui lòng check lại ca làm'))
 
-
-            # 3. Chặn chấm công nhiều lần trong ngày
-            local_start = datetime.combine(d, time.min).replace(tzinfo=user_tz)
-            local_end   = datetime.combine(d, time.max).replace(tzinfo=user_tz)
-            day_start_utc = local_start.astimezone(pytz.UTC)
-            day_end_utc   = local_end.astimezone(pytz.UTC)
-
-            existing = self.search([
-                ('employee_id', '=', rec.employee_id.id),
-                ('id', '!=', rec.id),
-                ('check_in', '>=', fields.Datetime.to_string(day_start_utc)),
-                ('check_in', '<=', fields.Datetime.to_string(day_end_utc)),
-            ], limit=1)
-            if existing:
-                raise ValidationError(
-                    _('Nhân viên %s đã chấm công hôm %s. Chỉ được chấm 1 lần/ngày.') %
-                    (rec.employee_id.name, d.strftime('%d/%m/%Y'))
-                )
+            # 3. Chấm công nhiều lần trong ngày: chặn bởi ràng buộc employee_date_uniq
 
     @api.depends("check_in", "check_out", "employee_id")
+    @profiled()
     def _compute_late_early(self):
+        # Timezone user
+        user_tz = pytz.timezone(self.env.user.tz or "UTC")
+        shift_windows = self._get_shift_window_map(user_tz)
         for rec in self:
             rec.is_late = False
             rec.is_early = False
             if not rec.check_in or not rec.employee_id:
                 continue
 
-            # Timezone user
-            user_tz = pytz.timezone(self.env.user.tz or "UTC")
-            dt = rec.check_in if rec.check_in.tzinfo else rec.check_in.replace(tzinfo=pytz.UTC)
-            local_dt = dt.astimezone(user_tz)
-            d = local_dt.date()
-
-            # Hàm float -> time
-            def float_to_time(float_hour):
-                hour = int(float_hour)
-                minute = int((float_hour % 1) * 60)
-                return time(hour, minute)
-
-            # Lấy tất cả ca ngày hôm đó của nhân viên
-            assignments = self.env['forher.shift.assignment'].search([
-                ('employee_ids', 'in', rec.employee_id.id),
-                ('date', '=', d),
-            ])
-            for assign in assignments:
-                shift = assign.shift_id
-                if not shift:
-                    continue
-
-                shift_start = float_to_time(shift.start_time)
-                shift_end = float_to_time(shift.end_time)
-                planned_start = user_tz.localize(datetime.combine(d, shift_start))
-                planned_end = user_tz.localize(datetime.combine(d, shift_end))
+            local_dt = self._to_local(rec.check_in, user_tz)
 
+            # Tất cả ca ngày hôm đó của nhân viên
+            for _shift_id, planned_start, planned_end in shift_windows.get((rec.employee_id.id, local_dt.date()), []):
                 # Nếu check_in nằm trong khoảng ca này
                 if planned_start - timedelta(minutes=30) <= local_dt <= planned_end + timedelta(minutes=30):
                     if local_dt > planned_start:
                         rec.is_late = True
-                    if rec.check_out and rec.check_out.astimezone(user_tz) < planned_end:
+                    if rec.check_out and self._to_local(rec.check_out, user_tz) < planned_end:
                         rec.is_early = True
                     break  # xét ca phù hợp đầu tiên rồi dừng
 
 
 
+    def _sql_compute_late_early(self):
+        """Tính is_late/is_early cho cả recordset bằng 1 câu UPDATE dựa trên khung giờ ca UTC.
+
+        Cùng quy tắc với ``_compute_late_early``: lấy ca đầu tiên trong ngày mà check_in nằm
+        trong [bắt đầu - 30p, kết thúc + 30p].
+        """
+        if not self.ids:
+            return
+        self.flush_recordset(['employee_id', 'check_in', 'check_out', 'date', 'is_late', 'is_early'])
+        self.env['forher.shift.assignment'].flush_model(['planned_start_utc', 'planned_end_utc'])
+        self.env['forher.shift.assignment.line'].flush_model(['assignment_id', 'employee_id', 'date'])
+        self.env.cr.execute("""
+            WITH flags AS (
+                SELECT a.id,
+                       COALESCE(a.check_in > w.planned_start_utc, FALSE) AS is_late,
+                       COALESCE(a.check_out < w.planned_end_utc, FALSE) AS is_early
+                  FROM hr_attendance a
+             LEFT JOIN LATERAL (
+                       SELECT sa.planned_start_utc, sa.planned_end_utc
+                         FROM forher_shift_assignment_line l
+                         JOIN forher_shift_assignment sa ON sa.id = l.assignment_id
+                        WHERE l.employee_id = a.employee_id
+                          AND l.date = a.date
+                          AND tsrange(sa.planned_start_utc - interval '30 minutes',
+                                      sa.planned_end_utc + interval '30 minutes', '[]') @> a.check_in
+                     ORDER BY sa.planned_start_utc, sa.id
+                        LIMIT 1
+                   ) w ON TRUE
+                 WHERE a.id = ANY(%%s)
+            )
+            UPDATE hr_attendance a
+               SET is_late = f.is_late, is_early = f.is_early
+              FROM flags f
+             WHERE f.id = a.id
+               AND (a.is_late IS DISTINCT FROM f.is_late OR a.is_early IS DISTINCT FROM f.is_early)
+        """, (self.ids,))
+        self.invalidate_recordset(['is_late', 'is_early'])
+
     # === ForHer integration fields === tổng quan chấm công
     branch_id = fields.Many2one(
         'res.company',
@@ -558,6 +568,7 @@ class HrAttendance(models.Model):
 
     # === COMPUTED FIELDS ===
     @api.depends('check_in')
+    @profiled()
     def _compute_date(self):
         """Tính toán ngày từ thời gian check-in (fix timezone)"""
         for record in self:
@@ -574,6 +585,7 @@ class HrAttendance(models.Model):
 
     # === VALIDATION & CONSTRAINTS ===
     @api.constrains('check_in', 'check_out', 'employee_id')
+    @profiled()
     def _check_validity(self):
         """Kiểm tra tính hợp lệ của bản ghi chấm công"""
         for attendance in self:
@@ -581,74 +593,70 @@ class HrAttendance(models.Model):
                 raise ValidationError(
                     _('Nhân viên %s chưa được gán chi nhánh. Không thể chấm công.') % attendance.employee_id.name
                 )
-
-            # Nếu check_in có, kiểm tra có bản ghi chưa check_out cùng ngày hay overlap
-            if attendance.check_in:
-                # compute day range in UTC for safety
-                # convert check_in to date (UTC)
-                dt = attendance.check_in
-                if dt.tzinfo is None:
-                    dt = dt.replace(tzinfo=pytz.UTC)
-                dt_utc = dt.astimezone(pytz.UTC)
-                day_start = dt_utc.replace(hour=0, minute=0, second=0, microsecond=0)
-                day_end = day_start + timedelta(days=1)
-                domain = [
-                    ('employee_id', '=', attendance.employee_id.id),
-                    ('id', '!=', attendance.id),
-                    ('check_in', '>=', fields.Datetime.to_string(day_start)),
-                    ('check_in', '<', fields.Datetime.to_string(day_end)),
-                    ('check_out', '=', False)
-                ]
-                existing = self.search(domain, limit=1)
-                if existing:
-                    raise ValidationError(
-                        _('Nhân viên %s đã có bản ghi chấm công chưa kết thúc trong ngày %s') % (attendance.employee_id.name, attendance.date or ''))
+            # Bản ghi chưa check_out: chặn bởi ràng buộc employee_open_uniq
     # === METHODS ===
+    # Nhóm được xác nhận / duyệt / từ chối chấm công
+    APPROVER_GROUPS = (
+        'forher_company_overview.forher_group_branch_manager',
+        'forher_company_overview.forher_group_board',
+        'base.group_system',  # admin
+    )
+
+    def _check_approver(self, message):
+        """Kiểm tra quyền 1 lần cho cả recordset."""
+        if not any(self.env.user.has_group(g) for g in self.APPROVER_GROUPS):
+            raise UserError(message)
+
+    def _transition_state(self, from_states, to_state):
+        """Chuyển trạng thái các bản ghi đang ở ``from_states`` bằng 1 lần write()."""
+        records = self.filtered(lambda r: r.state in from_states)
+        if records:
+            records.write({'state': to_state})
+        return records
+
     def action_send_to_confirm(self):
-        for record in self:
-            if record.state == 'draft':
-                record.state = 'to_confirm'
+        self._transition_state(('draft',), 'to_confirm')
         return True
 
     def action_confirm(self):
-        allowed_groups = [
-            'forher_company_overview.forher_group_branch_manager',
-            'forher_company_overview.forher_group_board',
-            'base.group_system',
-        ]
-        if not any(self.env.user.has_group(g) for g in allowed_groups):
-            raise UserError(_('Bạn không có quyền xác nhận chấm công.'))
-        for record in self:
-            if record.state == 'to_confirm':
-                record.state = 'confirmed'
+        self._check_approver(_('Bạn không có quyền xác nhận chấm công.'))
+        self._transition_state(('to_confirm',), 'confirmed')
         return True
 
     def action_validate(self):
-        allowed_groups = [
-            'forher_company_overview.forher_group_branch_manager',
-            'forher_company_overview.forher_group_board',
-            'base.group_system',  # admin
-        ]
-        if not any(self.env.user.has_group(g) for g in allowed_groups):
-            raise UserError(_('Bạn không có quyền duyệt chấm công.'))
-        for record in self:
-            if record.state == 'confirmed':
-                record.state = 'validated'
+        self._check_approver(_('Bạn không có quyền duyệt chấm công.'))
+        self._transition_state(('confirmed',), 'validated')
         return True
 
     def action_reject(self):
-        allowed_groups = [
-            'forher_company_overview.forher_group_branch_manager',
-            'forher_company_overview.forher_group_board',
-            'base.group_system',  # admin
-        ]
-        if not any(self.env.user.has_group(g) for g in allowed_groups):
-            raise UserError(_('Bạn không có quyền từ chối chấm công.'))
-        for record in self:
-            if record.state == 'confirmed':
-                record.state = 'rejected'
+        self._check_approver(_('Bạn không có quyền từ chối chấm công.'))
+        self._transition_state(('confirmed',), 'rejected')
         return True
 
+    def _action_approve_in_background(self, action, message):
+        """Tạo tác vụ duyệt chạy nền theo lô cho tập bản ghi lớn (cuối tháng)."""
+        self._check_approver(message)
+        job = self.env['forher.attendance.approval.job'].create_job(action, self.ids)
+        return {
+            'type': 'ir.actions.client',
+            'tag': 'display_notification',
+            'params': {
+                'type': 'info',
+                'title': _('Đã tạo tác vụ chạy nền'),
+                'message': _('%(name)s: %(count)s bản ghi sẽ được xử lý theo lô.') % {'name': job.name, 'count': job.total},
+                'sticky': False,
+            },
+        }
+
+    def action_confirm_background(self):
+        return self._action_approve_in_background('confirm', _('Bạn không có quyền xác nhận chấm công.'))
+
+    def action_validate_background(self):
+        return self._action_approve_in_background('validate', _('Bạn không có quyền duyệt chấm công.'))
+
+    def action_reject_background(self):
+        return self._action_approve_in_background('reject', _('Bạn không có quyền từ chối chấm công.'))
+
 
     @api.model
     def create_attendance(
@@ -678,10 +686,8 @@ class HrAttendance(models.Model):
         today_local = now_local.date()
 
         # === 3. Kiểm tra phân ca (bắt buộc) ===
-        assignments = self.env['forher.shift.assignment'].search([
-            ('employee_ids', 'in', employee.id),
-            ('date', '=', today_local),
-        ])
+        assignments = self.env['forher.shift.assignment.line']._get_employee_shifts(
+            employee.id, today_local).assignment_id
         if not assignments:
             raise UserError(_("Nhân viên %s không có ca làm trong ngày %s. Không thể chấm công.") %
                             (employee.name, today_local.strftime("%d/%m/%Y")))
@@ -745,8 +751,9 @@ class HrAttendance(models.Model):
                 ))
 
     @api.model
+    @profiled()
     def cron_aggregate_attendance_monthly(self, year=None, month=None):
-        """Tổng hợp công — gợi ý: gọi cron vào 1-3 tháng sau"""
+        """Tổng hợp công vào forher.attendance.monthly.summary — gợi ý: gọi cron vào 1-3 tháng sau"""
         today = date.today()
         if not year:
             year = today.year
@@ -754,27 +761,7 @@ class HrAttendance(models.Model):
             month = today.month - 1 or 12
             if month == 12:
                 year = year - 1
-        # first and last day UTC
-        from calendar import monthrange
-        first = date(year, month, 1)
-        last = date(year, month, monthrange(year, month)[1])
-        domain = [
-            ('date', '>=', first),
-            ('date', '<=', last),
-            ('state', 'in', ['confirmed', 'validated'])
-        ]
-        attendances = self.search(domain)
-        # build summary per employee
-        summary = {}
-        for att in attendances:
-            emp = att.employee_id
-            key = (emp.id, att.attendance_type_id.id if att.attendance_type_id else False)
-            if key not in summary:
-                summary[key] = {'employee': emp, 'type': att.attendance_type_id, 'quantity': 0.0, 'amount': 0.0}
-            summary[key]['quantity'] += att.quantity or 0.0
-            summary[key]['amount'] += att.total_amount or 0.0
-        # You may write summaries to a model for persistence or email to accountant; here we just return
-        return summary
+        return self.env['forher.attendance.monthly.summary']._rebuild_month(date(year, month, 1))
 
 
 # -------------------------
@@ -821,8 +808,19 @@ class HrEmployee(models.Model):
 
     @api.depends('attendance_ids')
     def _compute_attendance_count(self):
+        # Đếm cả phần đã lưu trữ, 1 truy vấn cho cả recordset
+        counts = {}
+        if self.ids:
+            self.env['hr.attendance'].flush_model(['employee_id'])
+            self.env.cr.execute("""
+                SELECT employee_id, COUNT(*)
+                  FROM %s src
+                 WHERE employee_id IN %%s
+              GROUP BY employee_id
+            """ % self.env['forher.attendance.archive']._get_union_query(), (tuple(self.ids),))
+            counts = dict(self.env.cr.fetchall())
         for employee in self:
-            employee.attendance_count = len(employee.attendance_ids)
+            employee.attendance_count = counts.get(employee._origin.id, 0)
 
     def action_view_attendance(self):
         self.ensure_one()
@@ -831,6 +829,104 @@ class HrEmployee(models.Model):
         action['context'] = {'default_employee_id': self.id}
         return action
 
+    # -------------------------
+    # Danh sách nhân viên cho kiosk (cache)
+    # -------------------------
+    # Thay đổi các trường này làm danh sách kiosk thay đổi
+    KIOSK_ROSTER_FIELDS = ['name', 'employee_code', 'active', 'company_id']
+    KIOSK_ROSTER_SEQUENCE = 'forher_attendance_kiosk_roster_version_seq'
+
+    def init(self):
+        super().init()
+        self.env.cr.execute("CREATE SEQUENCE IF NOT EXISTS %s" % self.KIOSK_ROSTER_SEQUENCE)
+
+    @api.model_create_multi
+    def create(self, vals_list):
+        employees = super().create(vals_list)
+        self._bump_kiosk_roster_version()
+        return employees
+
+    def write(self, vals):
+        res = super().write(vals)
+        if any(field in vals for field in self.KIOSK_ROSTER_FIELDS):
+            self._bump_kiosk_roster_version()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self._bump_kiosk_roster_version()
+        return res
+
+    @api.model
+    def _bump_kiosk_roster_version(self):
+        """Tăng phiên bản danh sách kiosk (sequence, dùng chung mọi worker).
+
+        Sequence không theo giao dịch: worker khác có thể đọc phiên bản mới rồi nạp danh sách
+        cũ trước khi giao dịch này commit, nên tăng thêm 1 lần sau commit.
+        """
+        self.env.cr.execute("SELECT nextval('%s')" % self.KIOSK_ROSTER_SEQUENCE)
+        registry = self.env.registry
+        sequence = self.KIOSK_ROSTER_SEQUENCE
+
+        @self.env.cr.postcommit.add
+        def bump_after_commit():
+            with registry.cursor() as cr:
+                cr.execute("SELECT nextval('%s')" % sequence)
+
+    @api.model
+    def _get_kiosk_roster_version(self):
+        """Phiên bản danh sách kiosk: đọc 1 dòng từ sequence, không quét bảng nhân viên."""
+        self.env.cr.execute("SELECT last_value FROM %s" % self.KIOSK_ROSTER_SEQUENCE)
+        return self.env.cr.fetchone()[0]
+
+    @staticmethod
+    def _normalize_kiosk_text(text):
+        """Chữ thường, bỏ dấu tiếng Việt để tìm kiếm trên kiosk."""
+        text = unicodedata.normalize('NFD', (text or '').lower().replace('đ', 'd'))
+        return ''.join(c for c in text if not unicodedata.combining(c))
+
+    @api.model
+    def _get_kiosk_roster(self, company_ids):
+        """Danh sách nhân viên kiosk theo (user, tập chi nhánh), đã lọc bởi Record Rule.
+
+        Trả về tuple (id, tên, mã NV, các từ khoá tìm kiếm). Cache chỉ giữ bản của phiên bản
+        mới nhất cho mỗi (user, tập chi nhánh): khi nhân viên được tạo/sửa/lưu trữ/xoá, bản cũ
+        bị thay thế chứ không nằm lại trong cache.
+        """
+        key = (self.env.cr.dbname, self.env.uid, company_ids)
+        version = self._get_kiosk_roster_version()
+        cached = _kiosk_roster_cache.get(key)
+        if cached and cached[0] == version:
+            return cached[1]
+        roster = []
+        for row in self.search_read([('active', '=', True)], ['name', 'employee_code'], order='name'):
+            code = row['employee_code'] if row['employee_code'] != 'New' else False
+            words = self._normalize_kiosk_text(row['name']).split()
+            if code:
+                words.append(self._normalize_kiosk_text(code))
+            roster.append((row['id'], row['name'], code or '', tuple(words)))
+        roster = tuple(roster)
+        _kiosk_roster_cache[key] = (version, roster)
+        return roster
+
+    @api.model
+    def _search_kiosk_roster(self, query='', offset=0, limit=50):
+        """Tìm theo tiền tố (tên đầy đủ, từng từ trong tên, mã NV) và phân trang."""
+        roster = self._get_kiosk_roster(tuple(sorted(self.env.companies.ids)))
+        query = self._normalize_kiosk_text(query).strip()
+        if query:
+            roster = [
+                emp for emp in roster
+                if ' '.join(emp[3]).startswith(query) or any(word.startswith(query) for word in emp[3])
+            ]
+        return {
+            'total': len(roster),
+            'records': [
+                {'id': emp_id, 'name': name, 'code': code}
+                for emp_id, name, code, _words in roster[offset:offset + limit]
+            ],
+        }
+
 # -*- coding: utf-8 -*-
 from odoo import models, fields, api, _
 from odoo.exceptions import ValidationError
@@ -860,7 +956,15 @@ class ForHerShift(models.Model):
     @api.depends("start_time", "end_time")
     def _compute_duration(self):
         for rec in self:
-            rec.duration = rec.end_time - rec.start_time if rec.end_time > rec.start_time else 0.0
+            # Ca qua đêm (22h → 6h) kết thúc vào ngày hôm sau; giờ bắt đầu = giờ kết thúc là 0 giờ
+            rec.duration = rec.end_time - rec.start_time if rec.end_time >= rec.start_time else rec.end_time + 24 - rec.start_time
+
+    def write(self, vals):
+        res = super().write(vals)
+        if 'company_id' in vals:
+            # Chi nhánh của dòng phân ca theo nhân viên lấy từ ca
+            self.env['forher.shift.assignment'].search([('shift_id', 'in', self.ids)])._sync_assignment_lines()
+        return res
 
 
 class ForHerShiftAssignment(models.Model):
@@ -879,6 +983,10 @@ class ForHerShiftAssignment(models.Model):
     date_start = fields.Datetime("Bắt đầu ca", compute="_compute_date_start_stop", store=True)
     date_stop = fields.Datetime("Kết thúc ca", compute="_compute_date_start_stop", store=True)
 
+    # Khung giờ ca theo UTC (tính 1 lần theo timezone chi nhánh), dùng cho so khớp bằng SQL
+    planned_start_utc = fields.Datetime("Bắt đầu ca (UTC)", compute="_compute_planned_utc", store=True, index=True)
+    planned_end_utc = fields.Datetime("Kết thúc ca (UTC)", compute="_compute_planned_utc", store=True)
+
     name = fields.Char("Tên hiển thị", compute='_compute_name', store=True)
 
     # Trường mới để hiển thị nhân viên gộp
@@ -922,22 +1030,204 @@ class ForHerShiftAssignment(models.Model):
             else:
                 rec.date_start = rec.date_stop = False
 
+    @api.model_create_multi
+    def create(self, vals_list):
+        records = super().create(vals_list)
+        records._sync_assignment_lines()
+        return records
+
+    def write(self, vals):
+        res = super().write(vals)
+        if {'employee_ids', 'date', 'shift_id'}.intersection(vals):
+            self._sync_assignment_lines()
+        return res
+
+    def _sync_assignment_lines(self):
+        """Đồng bộ forher.shift.assignment.line từ Many2many employee_ids bằng SQL."""
+        if not self.ids:
+            return
+        self.flush_recordset(['employee_ids', 'date', 'shift_id', 'company_id'])
+        Line = self.env['forher.shift.assignment.line']
+        Line.flush_model()
+        field = self._fields['employee_ids']
+        self.env.cr.execute("DELETE FROM %s WHERE assignment_id = ANY(%%s)" % Line._table, (self.ids,))
+        self.env.cr.execute("""
+            INSERT INTO %(line)s (
+                assignment_id, employee_id, date, shift_id, company_id,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT a.id, rel.%(col_employee)s, a.date, a.shift_id, a.company_id,
+                   %%(uid)s, now() AT TIME ZONE 'UTC', %%(uid)s, now() AT TIME ZONE 'UTC'
+              FROM %(table)s a
+              JOIN %(relation)s rel ON rel.%(col_assignment)s = a.id
+             WHERE a.id = ANY(%%(ids)s)
+        """ % {
+            'line': Line._table,
+            'table': self._table,
+            'relation': field.relation,
+            'col_assignment': field.column1,
+            'col_employee': field.column2,
+        }, {'uid': self.env.uid, 'ids': self.ids})
+        Line.invalidate_model()
+
+    def _get_branch_tz(self):
+        self.ensure_one()
+        company = self.company_id
+        return pytz.timezone(company.resource_calendar_id.tz or company.partner_id.tz or 'UTC')
+
+    @api.depends('date', 'shift_id.start_time', 'shift_id.end_time',
+                 'company_id.resource_calendar_id.tz', 'company_id.partner_id.tz')
+    def _compute_planned_utc(self):
+        for rec in self:
+            if not rec.date or not rec.shift_id:
+                rec.planned_start_utc = rec.planned_end_utc = False
+                continue
+            branch_tz = rec._get_branch_tz()
+            day_start = datetime.combine(rec.date, time.min)
+            start_local = day_start + timedelta(hours=rec.shift_id.start_time)
+            end_local = day_start + timedelta(hours=rec.shift_id.end_time)
+            if end_local <= start_local:
+                # Ca qua đêm
+                end_local += timedelta(days=1)
+            rec.planned_start_utc = branch_tz.localize(start_local).astimezone(pytz.UTC).replace(tzinfo=None)
+            rec.planned_end_utc = branch_tz.localize(end_local).astimezone(pytz.UTC).replace(tzinfo=None)
+
+    @api.model
+    def _get_shift_windows(self, pairs, user_tz):
+        """Nạp ca làm cho nhiều cặp (employee_id, ngày local) bằng đúng 1 truy vấn SQL.
+
+        Trả về dict {(employee_id, date): [(shift_id, planned_start, planned_end), ...]},
+        planned_start/planned_end lấy từ khung giờ UTC đã lưu, đổi sang ``user_tz``,
+        sắp theo giờ bắt đầu ca.
+        """
+        pairs = {(employee_id, d) for employee_id, d in pairs if employee_id and d}
+        if not pairs:
+            return {}
+
+        self.flush_model(['shift_id', 'date', 'planned_start_utc', 'planned_end_utc'])
+        Line = self.env['forher.shift.assignment.line']
+        Line.flush_model(['assignment_id', 'employee_id', 'date'])
+        employee_ids, dates = zip(*pairs)
+        # Dò index (employee_id, date, shift_id) của bảng phân ca theo nhân viên
+        self.env.cr.execute("""
+            SELECT l.employee_id, l.date, a.shift_id, a.planned_start_utc, a.planned_end_utc
+              FROM unnest(%%s::int[], %%s::date[]) AS k(employee_id, date)
+              JOIN %(line)s l ON l.employee_id = k.employee_id AND l.date = k.date
+              JOIN %(table)s a ON a.id = l.assignment_id
+             WHERE a.planned_start_utc IS NOT NULL
+          ORDER BY l.date, a.planned_start_utc, a.shift_id
+        """ % {'table': self._table, 'line': Line._table}, (list(employee_ids), list(dates)))
+
+        windows = {}
+        for employee_id, d, shift_id, planned_start, planned_end in self.env.cr.fetchall():
+            windows.setdefault((employee_id, d), []).append((
+                shift_id,
+                pytz.UTC.localize(planned_start).astimezone(user_tz),
+                pytz.UTC.localize(planned_end).astimezone(user_tz),
+            ))
+        return windows
+
     @api.constrains('date', 'shift_id', 'company_id')
     def _check_unique_shift_per_day(self):
         """Mỗi ngày chỉ được tạo 1 record cho mỗi ca trong cùng công ty."""
-        for rec in self:
-            # Tìm các record khác trùng ngày + ca + cùng công ty
-            domain = [
-                ('date', '=', rec.date),
-                ('shift_id', '=', rec.shift_id.id),
-                ('company_id', '=', rec.company_id.id),
-                ('id', '!=', rec.id)
-            ]
-            if self.search_count(domain):
-                raise ValidationError(
-                    f"Ngày {rec.date} đã có ca '{rec.shift_id.name}' cho chi nhánh '{rec.company_id.name}' rồi. "
-                    "Mỗi ngày chỉ được tạo tối đa 1 record cho mỗi ca trong cùng chi nhánh."
-                )
+        # Kiểm tra cả lô bằng 1 truy vấn (tạo hàng loạt khi sinh lịch ca)
+        self.flush_model(['date', 'shift_id', 'company_id'])
+        self.env.cr.execute("""
+            SELECT a.id
+              FROM %(table)s a
+              JOIN %(table)s b ON b.date = a.date
+                              AND b.shift_id = a.shift_id
+                              AND b.company_id IS NOT DISTINCT FROM a.company_id
+                              AND b.id != a.id
+             WHERE a.id = ANY(%%s)
+             LIMIT 1
+        """ % {'table': self._table}, (self.ids,))
+        row = self.env.cr.fetchone()
+        if row:
+            rec = self.browse(row[0])
+            raise ValidationError(
+                f"Ngày {rec.date} đã có ca '{rec.shift_id.name}' cho chi nhánh '{rec.company_id.name}' rồi. "
+                "Mỗi ngày chỉ được tạo tối đa 1 record cho mỗi ca trong cùng chi nhánh."
+            )
+
+    @api.model
+    def _bulk_assign(self, plan, dry_run=False):
+        """Ghi lịch phân ca ``plan`` = {(ngày, shift_id): set(employee_id)} hàng loạt.
+
+        Ca chưa có bản ghi được tạo bằng 1 lần create-multi; ca đã có chỉ được bổ sung
+        nhân viên còn thiếu bằng 1 câu INSERT vào bảng quan hệ Many2many.
+        Trả về thống kê theo chi nhánh {company_id: {'new', 'extended', 'pairs'}};
+        ``dry_run`` chỉ tính thống kê, không ghi gì.
+        """
+        stats = {}
+        if not plan:
+            return stats
+        shift_company = {
+            row['id']: row['company_id'] and row['company_id'][0]
+            for row in self.env['forher.shift'].search_read(
+                [('id', 'in', list({shift_id for _day, shift_id in plan}))], ['company_id'])
+        }
+        existing = {
+            (row['date'], row['shift_id'][0]): row['id']
+            for row in self.search_read([
+                ('date', 'in', list({day for day, _shift_id in plan})),
+                ('shift_id', 'in', list(shift_company)),
+            ], ['date', 'shift_id'])
+        }
+
+        # Các cặp (assignment, nhân viên) đã có
+        field = self._fields['employee_ids']
+        linked = set()
+        if existing:
+            self.flush_model(['employee_ids'])
+            self.env.cr.execute("""
+                SELECT %(col_assignment)s, %(col_employee)s FROM %(relation)s
+                 WHERE %(col_assignment)s = ANY(%%s)
+            """ % {
+                'relation': field.relation,
+                'col_assignment': field.column1,
+                'col_employee': field.column2,
+            }, (list(existing.values()),))
+            linked = set(self.env.cr.fetchall())
+
+        vals_list, new_pairs = [], []
+        for (day, shift_id), employee_ids in sorted(plan.items()):
+            company_stats = stats.setdefault(shift_company.get(shift_id), {'new': 0, 'extended': 0, 'pairs': 0})
+            assignment_id = existing.get((day, shift_id))
+            if not assignment_id:
+                vals_list.append({'date': day, 'shift_id': shift_id, 'employee_ids': [(6, 0, sorted(employee_ids))]})
+                company_stats['new'] += 1
+                company_stats['pairs'] += len(employee_ids)
+                continue
+            missing = [(assignment_id, employee_id) for employee_id in sorted(employee_ids)
+                       if (assignment_id, employee_id) not in linked]
+            if missing:
+                new_pairs += missing
+                company_stats['extended'] += 1
+                company_stats['pairs'] += len(missing)
+
+        if dry_run:
+            return stats
+
+        if vals_list:
+            self.create(vals_list)
+        if new_pairs:
+            assignment_ids, employee_ids = zip(*new_pairs)
+            self.env.cr.execute("""
+                INSERT INTO %(relation)s (%(col_assignment)s, %(col_employee)s)
+                SELECT * FROM unnest(%%s::int[], %%s::int[])
+                ON CONFLICT DO NOTHING
+            """ % {
+                'relation': field.relation,
+                'col_assignment': field.column1,
+                'col_employee': field.column2,
+            }, (list(assignment_ids), list(employee_ids)))
+            extended = self.browse(sorted(set(assignment_ids)))
+            extended.invalidate_recordset(['employee_ids'])
+            # Tính lại các trường phụ thuộc employee_ids (grouped_employee_names, ...)
+            extended.modified(['employee_ids'])
+            extended._sync_assignment_lines()
+        return stats
 
 
 # =====================
@@ -962,7 +1252,7 @@ class ForHerViolationRecord(models.Model):
     _description = "Ghi nhận vi phạm"
 
     employee_id = fields.Many2one("hr.employee", string="Nhân viên", required=True)
-    attendance_id = fields.Many2one("hr.attendance", string="Bản ghi công")
+    attendance_id = fields.Many2one("hr.attendance", string="Bản ghi công", index=True)
     violation_rule_id = fields.Many2one("forher.violation.rule", string="Vi phạm", required=True)
     date = fields.Date("Ngày", default=fields.Date.today)
     note = fields.Text("Ghi chú")
@@ -1001,40 +1291,50 @@ class HrAttendanceInherit(models.Model):
                rule_obj.create({'code': 'L3', 'name': 'Đi trễ lần 3+', 'penalty_type': 'rank_deduction'}),
         }
 
-        employees = self.env["hr.employee"].search([])
-        for emp in employees:
-            # Lấy tất cả attendance trong tháng
-            attendances = self.search([
-                ("employee_id", "=", emp.id),
-                ("check_in", ">=", start_month),
-                ("check_in", "<=", end_month)
-            ])
-            attendances._compute_late_early()  # Recompute is_late
-
-            late_attendances = attendances.filtered(lambda r: r.is_late).sorted(key=lambda r: r.check_in)
-
-            for idx, att in enumerate(late_attendances, 1):
-                # Kiểm tra xem bản ghi vi phạm đã tồn tại chưa
-                existing = self.env["forher.violation.record"].search([("attendance_id", "=", att.id)], limit=1)
-                if existing:
-                    continue
-
-                # Xác định rule và note dựa trên lần trễ
-                if idx == 1:
-                    note = "Đi trễ lần 1 trong tháng"
-                    rule_id = rules[1].id
-                elif idx == 2:
-                    note = "Đi trễ lần 2 trong tháng"
-                    rule_id = rules[2].id
-                else:
-                    note = f"Đi trễ lần {idx} trong tháng"
-                    rule_id = rules[3].id
-
-                # Tạo bản ghi vi phạm
-                self.env["forher.violation.record"].create({
-                    "employee_id": emp.id,
-                    "attendance_id": att.id,
-                    "violation_rule_id": rule_id,
-                    "note": note
-                })
-                
+        # Recompute is_late cho cả tháng theo lô (ca làm có thể đã thay đổi)
+        attendances = self.search([
+            ("date", ">=", start_month),
+            ("date", "<=", end_month),
+        ])
+        attendances._sql_compute_late_early()
+        self.env['forher.violation.record'].flush_model(['attendance_id'])
+
+        # Đánh số lần trễ theo nhân viên trong tháng, bỏ các bản ghi đã có vi phạm
+        self.env.cr.execute("""
+            WITH late AS (
+                SELECT a.id,
+                       a.employee_id,
+                       ROW_NUMBER() OVER (PARTITION BY a.employee_id ORDER BY a.check_in, a.id) AS late_rank
+                  FROM hr_attendance a
+                  JOIN hr_employee e ON e.id = a.employee_id AND e.active
+                 WHERE a.is_late
+                   AND a.date >= %s
+                   AND a.date <= %s
+            )
+            SELECT late.id, late.employee_id, late.late_rank
+              FROM late
+             WHERE NOT EXISTS (
+                       SELECT 1 FROM forher_violation_record v WHERE v.attendance_id = late.id
+                   )
+          ORDER BY late.employee_id, late.late_rank
+        """, (start_month, end_month))
+
+        vals_list = []
+        for attendance_id, employee_id, idx in self.env.cr.fetchall():
+            # Xác định rule và note dựa trên lần trễ
+            if idx == 1:
+                note = "Đi trễ lần 1 trong tháng"
+            elif idx == 2:
+                note = "Đi trễ lần 2 trong tháng"
+            else:
+                note = f"Đi trễ lần {idx} trong tháng"
+            vals_list.append({
+                "employee_id": employee_id,
+                "attendance_id": attendance_id,
+                "violation_rule_id": rules[min(idx, 3)].id,
+                "note": note,
+            })
+
+        # Tạo bản ghi vi phạm theo lô
+        self.env["forher.violation.record"].create(vals_list)
+        return True
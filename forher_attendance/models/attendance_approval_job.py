@@ -0,0 +1,127 @@
+# file: models/attendance_approval_job.py
+import json
+import logging
+import threading
+
+from odoo import _, api, fields, models
+from odoo.addons.forher_company_overview.models.perf_profiler import profiled
+
+_logger = logging.getLogger(__name__)
+
+
+class ForHerAttendanceApprovalJob(models.Model):
+    """Tác vụ xác nhận / duyệt / từ chối chấm công chạy nền theo lô.
+
+    Dùng khi duyệt hàng chục nghìn bản ghi cuối tháng: mỗi lô ``chunk_size`` bản ghi
+    được chuyển trạng thái bằng 1 lần write() và commit riêng, tiến độ lưu trên tác vụ.
+    """
+    _name = 'forher.attendance.approval.job'
+    _description = 'Tác vụ duyệt chấm công chạy nền'
+    _order = 'id desc'
+
+    # hành động → (trạng thái nguồn, trạng thái đích)
+    ACTIONS = {
+        'confirm': (('to_confirm',), 'confirmed'),
+        'validate': (('confirmed',), 'validated'),
+        'reject': (('confirmed',), 'rejected'),
+    }
+    # Số lô tối đa xử lý trong 1 lần chạy cron (cron tự chạy tiếp nếu còn)
+    CHUNKS_PER_RUN = 10
+
+    name = fields.Char('Tên', required=True, readonly=True)
+    action = fields.Selection([
+        ('confirm', 'Xác nhận'),
+        ('validate', 'Phê duyệt'),
+        ('reject', 'Từ chối'),
+    ], string='Hành động', required=True, readonly=True)
+    user_id = fields.Many2one('res.users', string='Người tạo', required=True, readonly=True,
+                              default=lambda self: self.env.user)
+    state = fields.Selection([
+        ('pending', 'Chờ xử lý'),
+        ('running', 'Đang xử lý'),
+        ('done', 'Hoàn tất'),
+        ('failed', 'Lỗi'),
+    ], string='Trạng thái', default='pending', required=True, readonly=True)
+    res_ids = fields.Text('Bản ghi', readonly=True, help='Danh sách id hr.attendance (JSON)')
+    chunk_size = fields.Integer('Số bản ghi / lô', default=2000, readonly=True)
+    total = fields.Integer('Tổng số bản ghi', readonly=True)
+    processed = fields.Integer('Đã xử lý', readonly=True)
+    changed = fields.Integer('Đã chuyển trạng thái', readonly=True)
+    progress = fields.Float('Tiến độ (%)', compute='_compute_progress')
+    message = fields.Char('Thông báo', readonly=True)
+
+    @api.depends('processed', 'total')
+    def _compute_progress(self):
+        for job in self:
+            job.progress = 100.0 * job.processed / job.total if job.total else 100.0
+
+    @api.model
+    def create_job(self, action, attendance_ids, chunk_size=2000):
+        ids = sorted(set(attendance_ids))
+        job = self.create({
+            'name': _('%(action)s %(count)s bản ghi chấm công') % {
+                'action': dict(self._fields['action'].selection)[action],
+                'count': len(ids),
+            },
+            'action': action,
+            'res_ids': json.dumps(ids),
+            'total': len(ids),
+            'chunk_size': max(chunk_size, 1),
+        })
+        self.env.ref('forher_attendance.forher_attendance_approval_job_cron')._trigger()
+        return job
+
+    def _process_chunks(self, max_chunks):
+        """Xử lý tối đa ``max_chunks`` lô của tác vụ, commit sau mỗi lô; trả về số lô đã chạy."""
+        self.ensure_one()
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        ids = json.loads(self.res_ids or '[]')
+        from_states, to_state = self.ACTIONS[self.action]
+        Attendance = self.env['hr.attendance'].with_user(self.user_id)
+        self.state = 'running'
+
+        done_chunks = 0
+        while done_chunks < max_chunks:
+            chunk = ids[self.processed:self.processed + self.chunk_size]
+            if not chunk:
+                break
+            try:
+                with self.env.cr.savepoint():
+                    changed = Attendance.browse(chunk).exists()._transition_state(from_states, to_state)
+            except Exception as e:
+                _logger.exception('Tác vụ duyệt chấm công %s lỗi tại vị trí %s', self.id, self.processed)
+                self.write({'state': 'failed', 'message': str(e)})
+                break
+            self.write({
+                'processed': self.processed + len(chunk),
+                'changed': self.changed + len(changed),
+            })
+            done_chunks += 1
+            if auto_commit:
+                self.env.cr.commit()
+
+        if self.state == 'running' and self.processed >= self.total:
+            self.write({'state': 'done', 'message': False})
+        return done_chunks
+
+    @api.model
+    @profiled()
+    def _cron_process_jobs(self):
+        jobs = self.search([('state', 'in', ('pending', 'running'))], order='id')
+        budget = self.CHUNKS_PER_RUN
+        for job in jobs:
+            if budget <= 0:
+                break
+            budget -= max(job._process_chunks(budget), 1)
+
+        remaining = self.search([('state', 'in', ('pending', 'running'))])
+        self.env['ir.cron']._notify_progress(
+            done=len(jobs) - len(remaining),
+            remaining=len(remaining),
+        )
+
+    def action_retry(self):
+        """Chạy tiếp tác vụ lỗi từ lô bị lỗi."""
+        self.filtered(lambda j: j.state == 'failed').write({'state': 'pending', 'message': False})
+        self.env.ref('forher_attendance.forher_attendance_approval_job_cron')._trigger()
+        return True
@@ -0,0 +1,134 @@
+# file: models/attendance_archive.py
+import logging
+import threading
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models
+from odoo.addons.forher_company_overview.models.perf_profiler import profiled
+
+_logger = logging.getLogger(__name__)
+
+
+class ForHerAttendanceArchive(models.Model):
+    """Lưu trữ chấm công các tháng cũ đã đóng.
+
+    Các (nhân viên, tháng) cũ hơn mốc ``forher_attendance.archive_horizon_months`` mà
+    mọi bản ghi đều đã duyệt và đã check-out được chuyển khỏi hr_attendance sang bảng
+    gọn này (chỉ giữ các cột phục vụ lương/báo cáo). Tổng hợp tháng, báo cáo theo ngày
+    và phiếu lương đọc hợp nhất dữ liệu nóng + lưu trữ qua ``_get_union_query``.
+    """
+    _name = 'forher.attendance.archive'
+    _description = 'Lưu trữ chấm công'
+    _order = 'date desc, employee_id'
+    _rec_name = 'employee_id'
+
+    # Cột được giữ lại, trùng tên với hr_attendance
+    ARCHIVE_COLUMNS = (
+        'employee_id', 'branch_id', 'attendance_type_id', 'date', 'check_in', 'check_out',
+        'quantity', 'worked_hours', 'worked_hours_float', 'ot_hours_normal', 'ot_hours_holiday',
+        'ot_hours_total', 'is_late', 'is_early', 'is_holiday', 'total_amount',
+    )
+    DEFAULT_HORIZON_MONTHS = 24
+
+    original_id = fields.Integer('ID chấm công gốc', readonly=True, index=True)
+    employee_id = fields.Many2one('hr.employee', string='Nhân viên', readonly=True, ondelete='cascade')
+    branch_id = fields.Many2one('res.company', string='Chi nhánh', readonly=True, index=True)
+    attendance_type_id = fields.Many2one('forher.attendance.type', string='Loại công', readonly=True)
+    date = fields.Date('Ngày', readonly=True)
+    check_in = fields.Datetime('Check in', readonly=True)
+    check_out = fields.Datetime('Check out', readonly=True)
+    quantity = fields.Float('Số lượng', readonly=True)
+    worked_hours = fields.Float('Giờ làm', readonly=True)
+    worked_hours_float = fields.Float('Giờ làm trong ca', readonly=True)
+    ot_hours_normal = fields.Float('OT thường', readonly=True)
+    ot_hours_holiday = fields.Float('OT ngày lễ', readonly=True)
+    ot_hours_total = fields.Float('Tổng OT', readonly=True)
+    is_late = fields.Boolean('Đi muộn', readonly=True)
+    is_early = fields.Boolean('Về sớm', readonly=True)
+    is_holiday = fields.Boolean('Ngày lễ', readonly=True)
+    total_amount = fields.Monetary('Tổng tiền (VNĐ)', currency_field='company_currency_id', readonly=True)
+    company_currency_id = fields.Many2one('res.currency', string='Tiền tệ công ty', related='branch_id.currency_id', readonly=True)
+
+    def init(self):
+        self.env.cr.execute("""
+            CREATE INDEX IF NOT EXISTS forher_attendance_archive_employee_date_idx
+                ON %s (employee_id, date)
+        """ % self._table)
+
+    @api.model
+    def _get_union_query(self):
+        """Nguồn SQL hợp nhất hr_attendance (nóng) và bảng lưu trữ, cùng bộ cột + ``state``."""
+        columns = ', '.join(self.ARCHIVE_COLUMNS)
+        return """(
+            SELECT %(columns)s, state FROM hr_attendance
+             UNION ALL
+            SELECT %(columns)s, 'validated' AS state FROM %(table)s
+        )""" % {'columns': columns, 'table': self._table}
+
+    @api.model
+    def _get_horizon_months(self):
+        value = self.env['ir.config_parameter'].sudo().get_param(
+            'forher_attendance.archive_horizon_months', self.DEFAULT_HORIZON_MONTHS)
+        try:
+            return max(int(value), 1)
+        except (TypeError, ValueError):
+            return self.DEFAULT_HORIZON_MONTHS
+
+    @api.model
+    def _archive_month(self, month):
+        """Chuyển các (nhân viên, ``month``) đã đóng sang lưu trữ bằng 1 câu DELETE ... RETURNING.
+
+        Xoá thẳng bằng SQL, không qua ``unlink``: chỉ áp dụng cho tháng đã duyệt hết nên tổng hợp
+        tháng (đọc hợp nhất) không đổi; vi phạm trỏ tới bản ghi được FK đặt về rỗng; tác vụ duyệt
+        và nhật ký kiosk không có FK. Danh sách hr.attendance chỉ còn dữ liệu nóng, phần cũ xem ở
+        menu Lưu trữ chấm công.
+        """
+        columns = ', '.join(self.ARCHIVE_COLUMNS)
+        self.env.cr.execute("""
+            WITH eligible AS (
+                SELECT employee_id
+                  FROM hr_attendance
+                 WHERE date >= %%(first)s AND date < %%(last)s
+              GROUP BY employee_id
+                HAVING bool_and(state = 'validated' AND check_out IS NOT NULL)
+            ), moved AS (
+                DELETE FROM hr_attendance a
+                 USING eligible e
+                 WHERE a.employee_id = e.employee_id
+                   AND a.date >= %%(first)s AND a.date < %%(last)s
+             RETURNING a.id, %(a_columns)s
+            )
+            INSERT INTO %(table)s (original_id, %(columns)s, create_uid, create_date, write_uid, write_date)
+            SELECT id, %(columns)s, %%(uid)s, now() AT TIME ZONE 'UTC', %%(uid)s, now() AT TIME ZONE 'UTC'
+              FROM moved
+        """ % {
+            'table': self._table,
+            'columns': columns,
+            'a_columns': ', '.join('a.%s' % c for c in self.ARCHIVE_COLUMNS),
+        }, {'first': month, 'last': month + relativedelta(months=1), 'uid': self.env.uid})
+        return self.env.cr.rowcount
+
+    @api.model
+    @profiled()
+    def cron_archive_attendance(self):
+        """Lưu trữ từng tháng cũ hơn mốc cấu hình, commit sau mỗi tháng."""
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        cutoff = fields.Date.context_today(self).replace(day=1) - relativedelta(months=self._get_horizon_months())
+        self.env['hr.attendance'].flush_model()
+        self.env.cr.execute("""
+            SELECT DISTINCT date_trunc('month', date)::date
+              FROM hr_attendance
+             WHERE date < %s
+          ORDER BY 1
+        """, (cutoff,))
+        total = 0
+        for (month,) in self.env.cr.fetchall():
+            moved = self._archive_month(month)
+            total += moved
+            _logger.info('Lưu trữ chấm công tháng %s: %s bản ghi', month, moved)
+            if auto_commit:
+                self.env.cr.commit()
+        self.env['hr.attendance'].invalidate_model()
+        self.invalidate_model()
+        return total
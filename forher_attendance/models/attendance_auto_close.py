@@ -0,0 +1,81 @@
+# file: models/attendance_auto_close.py
+import logging
+
+from odoo import api, fields, models
+from odoo.addons.forher_company_overview.models.perf_profiler import profiled
+
+_logger = logging.getLogger(__name__)
+
+
+class HrAttendanceAutoClose(models.Model):
+    _inherit = 'hr.attendance'
+
+    # Số phút sau giờ kết thúc ca mới tự đóng bản ghi quên check-out
+    DEFAULT_AUTO_CLOSE_GRACE = 30
+
+    auto_closed = fields.Boolean(
+        'Tự động check-out', readonly=True, copy=False,
+        help='Check-out được hệ thống tự ghi theo giờ kết thúc ca, quản lý cần kiểm tra lại',
+    )
+
+    @api.model
+    def _get_auto_close_grace(self):
+        value = self.env['ir.config_parameter'].sudo().get_param(
+            'forher_attendance.auto_close_grace_minutes', self.DEFAULT_AUTO_CLOSE_GRACE)
+        try:
+            return max(int(value), 0)
+        except (TypeError, ValueError):
+            return self.DEFAULT_AUTO_CLOSE_GRACE
+
+    @api.model
+    @profiled()
+    def cron_auto_close_attendance(self):
+        """Đóng các bản ghi chưa check-out khi ca đã kết thúc quá N phút.
+
+        1 câu UPDATE join với khung giờ ca (cùng quy tắc chọn ca như ``_sql_compute_late_early``)
+        ghi check_out = giờ kết thúc ca và đánh dấu ``auto_closed``; sau đó chỉ tính lại
+        giờ làm / OT / thành tiền cho đúng các bản ghi vừa đóng.
+        """
+        self.flush_model(['employee_id', 'check_in', 'check_out', 'date'])
+        self.env['forher.shift.assignment'].flush_model(['planned_start_utc', 'planned_end_utc'])
+        self.env['forher.shift.assignment.line'].flush_model(['assignment_id', 'employee_id', 'date'])
+        self.env.cr.execute("""
+            WITH due AS (
+                SELECT a.id, w.planned_end_utc
+                  FROM hr_attendance a
+                  JOIN LATERAL (
+                       SELECT sa.planned_end_utc
+                         FROM forher_shift_assignment_line l
+                         JOIN forher_shift_assignment sa ON sa.id = l.assignment_id
+                        WHERE l.employee_id = a.employee_id
+                          AND l.date = a.date
+                          AND tsrange(sa.planned_start_utc - interval '30 minutes',
+                                      sa.planned_end_utc + interval '30 minutes', '[]') @> a.check_in
+                     ORDER BY sa.planned_start_utc, sa.id
+                        LIMIT 1
+                   ) w ON TRUE
+                 WHERE a.check_out IS NULL
+                   AND w.planned_end_utc > a.check_in
+                   AND w.planned_end_utc < (now() AT TIME ZONE 'UTC') - make_interval(mins => %(grace)s)
+            )
+            UPDATE hr_attendance a
+               SET check_out = due.planned_end_utc,
+                   check_out_note = %(note)s,
+                   auto_closed = TRUE,
+                   write_uid = %(uid)s,
+                   write_date = now() AT TIME ZONE 'UTC'
+              FROM due
+             WHERE due.id = a.id
+         RETURNING a.id
+        """, {'grace': self._get_auto_close_grace(), 'note': 'Tự động đóng theo ca', 'uid': self.env.uid})
+        records = self.browse([row[0] for row in self.env.cr.fetchall()])
+        if not records:
+            return records
+
+        # Đánh dấu tính lại các trường phụ thuộc check_out chỉ cho các bản ghi này
+        records.invalidate_recordset(['check_out', 'check_out_note', 'auto_closed', 'write_uid', 'write_date'])
+        records.modified(['check_out'])
+        records.flush_recordset()
+        self.env['forher.attendance.monthly.summary']._refresh_attendances(records)
+        _logger.info('Tự động check-out %s bản ghi chấm công quá giờ ca', len(records))
+        return records
@@ -0,0 +1,111 @@
+# file: models/attendance_daily_report.py
+import logging
+
+from odoo import api, fields, models, tools
+from odoo.addons.forher_company_overview.models.perf_profiler import profiled
+
+_logger = logging.getLogger(__name__)
+
+
+class ForHerAttendanceDailyReport(models.Model):
+    """KPI chấm công theo (chi nhánh, ngày) cho dashboard quản lý.
+
+    Materialized view gộp sẵn hr_attendance (kể cả phần đã lưu trữ) + nghỉ phép, được làm mới bằng
+    REFRESH ... CONCURRENTLY từ cron nên dashboard chỉ gộp vài nghìn dòng.
+    """
+    _name = 'forher.attendance.daily.report'
+    _description = 'Báo cáo chấm công theo ngày'
+    _auto = False
+    _rec_name = 'date'
+    _order = 'date desc, branch_id'
+
+    # Trạng thái nghỉ phép được tính là "nghỉ" (giống is_leave trên chấm công)
+    LEAVE_STATES = ('approve', 'confirm')
+
+    date = fields.Date('Ngày', readonly=True)
+    branch_id = fields.Many2one('res.company', string='Chi nhánh', readonly=True)
+    present_count = fields.Integer('Có mặt', readonly=True)
+    attendance_count = fields.Integer('Số bản ghi công', readonly=True)
+    late_count = fields.Integer('Đi muộn', readonly=True)
+    early_count = fields.Integer('Về sớm', readonly=True)
+    on_leave_count = fields.Integer('Nghỉ phép', readonly=True)
+    worked_hours = fields.Float('Giờ làm', readonly=True)
+    ot_hours_normal = fields.Float('OT thường', readonly=True)
+    ot_hours_holiday = fields.Float('OT ngày lễ', readonly=True)
+    ot_hours_total = fields.Float('Tổng OT', readonly=True)
+    total_amount = fields.Monetary('Tổng tiền (VNĐ)', currency_field='company_currency_id', readonly=True)
+    company_currency_id = fields.Many2one('res.currency', string='Tiền tệ công ty', related='branch_id.currency_id', readonly=True)
+
+    def init(self):
+        tools.drop_view_if_exists(self.env.cr, self._table)
+        # id cố định theo (ngày, chi nhánh) để REFRESH CONCURRENTLY so khớp được các dòng
+        self.env.cr.execute("""
+            CREATE MATERIALIZED VIEW %(table)s AS (
+                WITH att AS (
+                    SELECT a.date,
+                           COALESCE(a.branch_id, 0) AS branch_key,
+                           COUNT(DISTINCT a.employee_id) AS present_count,
+                           COUNT(*) AS attendance_count,
+                           COUNT(*) FILTER (WHERE a.is_late) AS late_count,
+                           COUNT(*) FILTER (WHERE a.is_early) AS early_count,
+                           SUM(COALESCE(a.worked_hours_float, 0)) AS worked_hours,
+                           SUM(COALESCE(a.ot_hours_normal, 0)) AS ot_hours_normal,
+                           SUM(COALESCE(a.ot_hours_holiday, 0)) AS ot_hours_holiday,
+                           SUM(COALESCE(a.ot_hours_total, 0)) AS ot_hours_total,
+                           SUM(COALESCE(a.total_amount, 0)) AS total_amount
+                      FROM %(attendance)s a
+                     WHERE a.date IS NOT NULL
+                       AND a.state IS DISTINCT FROM 'rejected'
+                  GROUP BY a.date, COALESCE(a.branch_id, 0)
+                ),
+                lv AS (
+                    SELECT d::date AS date,
+                           COALESCE(e.company_id, 0) AS branch_key,
+                           COUNT(DISTINCT l.employee_id) AS on_leave_count
+                      FROM forher_leave_request l
+                      JOIN hr_employee e ON e.id = l.employee_id
+                CROSS JOIN generate_series(l.start_date, l.end_date, interval '1 day') d
+                     WHERE l.state IN %(leave_states)s
+                  GROUP BY d::date, COALESCE(e.company_id, 0)
+                )
+                SELECT ((COALESCE(att.date, lv.date) - DATE '2000-01-01') * 100000
+                        + COALESCE(att.branch_key, lv.branch_key))::integer AS id,
+                       COALESCE(att.date, lv.date) AS date,
+                       NULLIF(COALESCE(att.branch_key, lv.branch_key), 0) AS branch_id,
+                       COALESCE(att.present_count, 0) AS present_count,
+                       COALESCE(att.attendance_count, 0) AS attendance_count,
+                       COALESCE(att.late_count, 0) AS late_count,
+                       COALESCE(att.early_count, 0) AS early_count,
+                       COALESCE(lv.on_leave_count, 0) AS on_leave_count,
+                       COALESCE(att.worked_hours, 0) AS worked_hours,
+                       COALESCE(att.ot_hours_normal, 0) AS ot_hours_normal,
+                       COALESCE(att.ot_hours_holiday, 0) AS ot_hours_holiday,
+                       COALESCE(att.ot_hours_total, 0) AS ot_hours_total,
+                       COALESCE(att.total_amount, 0) AS total_amount
+                  FROM att
+             FULL JOIN lv ON lv.date = att.date AND lv.branch_key = att.branch_key
+            )
+        """ % {
+            'table': self._table,
+            'attendance': self.env['forher.attendance.archive']._get_union_query(),
+            'leave_states': "('%s')" % "', '".join(self.LEAVE_STATES),
+        })
+        # REFRESH CONCURRENTLY cần 1 index unique chỉ gồm tên cột
+        self.env.cr.execute("CREATE UNIQUE INDEX %(table)s_id_idx ON %(table)s (id)" % {'table': self._table})
+        self.env.cr.execute("CREATE INDEX %(table)s_branch_date_idx ON %(table)s (branch_id, date)" % {'table': self._table})
+        self.env.cr.execute("CREATE INDEX %(table)s_date_idx ON %(table)s (date)" % {'table': self._table})
+
+    @api.model
+    def _refresh(self):
+        """Làm mới dữ liệu mà không khoá đọc của dashboard."""
+        self.env['hr.attendance'].flush_model()
+        self.env['forher.leave.request'].flush_model(['employee_id', 'start_date', 'end_date', 'state'])
+        self.env.cr.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY %s" % self._table)
+        self.invalidate_model()
+        _logger.info('Đã làm mới %s', self._table)
+        return True
+
+    @api.model
+    @profiled()
+    def cron_refresh_daily_report(self):
+        return self._refresh()
@@ -0,0 +1,147 @@
+# file: models/attendance_import.py
+import logging
+from datetime import datetime
+
+import psycopg2
+import pytz
+
+from odoo import _, api, models
+from odoo.exceptions import UserError, ValidationError
+
+_logger = logging.getLogger(__name__)
+
+# Định dạng thời gian thường gặp trong file xuất từ máy chấm công
+PUNCH_DATETIME_FORMATS = (
+    '%Y-%m-%d %H:%M:%S',
+    '%Y-%m-%d %H:%M',
+    '%d/%m/%Y %H:%M:%S',
+    '%d/%m/%Y %H:%M',
+)
+# Lỗi dữ liệu của 1 dòng import; lỗi khác (lập trình, kết nối) vẫn được ném ra
+IMPORT_ROW_ERRORS = (ValidationError, UserError, psycopg2.IntegrityError)
+
+
+class HrAttendanceImport(models.Model):
+    _inherit = 'hr.attendance'
+
+    @api.model
+    def _get_import_employee_map(self):
+        """{mã nhân viên / barcode: employee_id} nạp 1 lần cho cả lượt import."""
+        employee_map = {}
+        for row in self.env['hr.employee'].search_read([('active', '=', True)], ['employee_code', 'barcode']):
+            for key in (row['employee_code'], row['barcode']):
+                if key and key != 'New':
+                    employee_map.setdefault(key.strip(), row['id'])
+        return employee_map
+
+    @api.model
+    def _parse_punch_datetime(self, value, tz):
+        """Giờ local trong file → datetime UTC naive (chuẩn lưu trữ của Odoo)."""
+        if not value:
+            return False
+        if not isinstance(value, datetime):
+            value = str(value).strip()
+            for fmt in PUNCH_DATETIME_FORMATS:
+                try:
+                    value = datetime.strptime(value, fmt)
+                    break
+                except ValueError:
+                    continue
+            else:
+                raise ValueError(_('Thời gian không hợp lệ: %s') % value)
+        return tz.localize(value).astimezone(pytz.UTC).replace(tzinfo=None)
+
+    @api.model
+    def import_punches(self, rows, chunk_size=500):
+        """Nhập dữ liệu chấm công từ máy chấm công theo lô.
+
+        ``rows`` là iterable (có thể là generator) các dict với khoá
+        ``employee_code``/``barcode``/``code``, ``check_in``, ``check_out`` và tuỳ chọn
+        ``note``, ``location``; thời gian theo giờ local của người dùng.
+
+        Mỗi lô ``chunk_size`` dòng được kiểm tra rồi tạo bằng 1 lần create-multi trong
+        savepoint riêng; lô lỗi được tách lại từng dòng để chỉ loại các dòng hỏng.
+        Trả về {'created': số bản ghi, 'rejected': [(dòng, mã, lý do), ...]}.
+        """
+        tz = pytz.timezone(self.env.user.tz or 'UTC')
+        employee_map = self._get_import_employee_map()
+        result = {'created': 0, 'rejected': []}
+        seen = set()
+        chunk = []
+
+        for line_no, row in enumerate(rows, 2):
+            code = str(row.get('employee_code') or row.get('barcode') or row.get('code') or '').strip()
+            employee_id = employee_map.get(code)
+            if not employee_id:
+                result['rejected'].append((line_no, code, _('Không tìm thấy nhân viên.')))
+                continue
+            try:
+                check_in = self._parse_punch_datetime(row.get('check_in'), tz)
+                check_out = self._parse_punch_datetime(row.get('check_out'), tz)
+            except ValueError as e:
+                result['rejected'].append((line_no, code, str(e)))
+                continue
+            if not check_in:
+                result['rejected'].append((line_no, code, _('Thiếu giờ check-in.')))
+                continue
+            if check_out and check_out < check_in:
+                result['rejected'].append((line_no, code, _('Giờ check-out trước giờ check-in.')))
+                continue
+
+            # Mỗi nhân viên chỉ 1 bản ghi / ngày local trong file
+            key = (employee_id, pytz.UTC.localize(check_in).astimezone(tz).date())
+            if key in seen:
+                result['rejected'].append((line_no, code, _('Trùng ngày chấm công trong file.')))
+                continue
+            seen.add(key)
+
+            chunk.append((line_no, code, key, {
+                'employee_id': employee_id,
+                'check_in': check_in,
+                'check_out': check_out,
+                'check_in_note': row.get('note') or 'Import',
+                'check_in_location': row.get('location') or False,
+            }))
+            if len(chunk) >= chunk_size:
+                self._import_punch_chunk(chunk, result)
+                chunk = []
+
+        if chunk:
+            self._import_punch_chunk(chunk, result)
+        return result
+
+    @api.model
+    def _import_punch_chunk(self, chunk, result):
+        # Loại các ngày đã có chấm công trong DB bằng 1 truy vấn cho cả lô
+        existing = {
+            (employee.id, day)
+            for employee, day in self._read_group(
+                [('employee_id', 'in', list({key[0] for _line, _code, key, _vals in chunk})),
+                 ('date', 'in', list({key[1] for _line, _code, key, _vals in chunk}))],
+                ['employee_id', 'date:day'],
+            )
+        }
+        pending = []
+        for line_no, code, key, vals in chunk:
+            if key in existing:
+                result['rejected'].append((line_no, code, _('Nhân viên đã có chấm công ngày này.')))
+            else:
+                pending.append((line_no, code, vals))
+        if not pending:
+            return
+
+        try:
+            with self.env.cr.savepoint():
+                self.create([vals for _line, _code, vals in pending])
+            result['created'] += len(pending)
+            return
+        except IMPORT_ROW_ERRORS:
+            _logger.info('Lô import chấm công lỗi, tách theo từng dòng (%s dòng)', len(pending))
+
+        for line_no, code, vals in pending:
+            try:
+                with self.env.cr.savepoint():
+                    self.create([vals])
+                result['created'] += 1
+            except IMPORT_ROW_ERRORS as e:
+                result['rejected'].append((line_no, code, self._get_constraint_error(e) or str(e)))
@@ -0,0 +1,144 @@
+# file: models/attendance_kiosk_punch.py
+from datetime import datetime, time, timedelta
+
+import pytz
+
+from odoo import _, api, fields, models
+
+
+def _today_range_utc(env, at=None):
+    """Trả về cặp (day_start_utc, day_end_utc) theo timezone user để so khớp 'trong ngày'."""
+    user_tz = pytz.timezone(env.user.tz or 'UTC')
+    now_utc = at or fields.Datetime.now()
+    aware_utc = now_utc.replace(tzinfo=pytz.UTC)
+    local_now = aware_utc.astimezone(user_tz)
+    local_date = local_now.date()
+    local_start = datetime.combine(local_date, time.min).replace(tzinfo=user_tz)
+    local_end   = datetime.combine(local_date, time.max).replace(tzinfo=user_tz)
+    day_start_utc = local_start.astimezone(pytz.UTC)
+    day_end_utc   = local_end.astimezone(pytz.UTC)
+    return day_start_utc, day_end_utc
+
+
+class ForHerAttendanceKioskPunch(models.Model):
+    """Nhật ký lượt chấm công gửi từ kiosk, khoá theo mã idempotency (UUID) của client.
+
+    Kiosk mất mạng sẽ xếp hàng chấm công (không lưu PIN) và gửi lại theo lô; mỗi mã chỉ
+    được xử lý 1 lần. Lượt offline không xác thực được bằng PIN nên được giữ ở trạng thái
+    'Chờ duyệt' cho quản lý duyệt rồi mới ghi vào chấm công.
+    """
+    _name = 'forher.attendance.kiosk.punch'
+    _description = 'Nhật ký chấm công kiosk'
+    _order = 'punch_time desc, id desc'
+    _rec_name = 'key'
+
+    DEFAULT_OFFLINE_WINDOW = 12
+
+    key = fields.Char('Mã idempotency', required=True, index=True, readonly=True)
+    employee_id = fields.Many2one('hr.employee', string='Nhân viên', ondelete='set null', readonly=True)
+    company_id = fields.Many2one('res.company', string='Chi nhánh', related='employee_id.company_id', store=True, readonly=True)
+    punch_time = fields.Datetime('Thời gian chấm công', readonly=True)
+    action = fields.Selection([('checkin', 'Check-in'), ('checkout', 'Check-out')], string='Thao tác', readonly=True)
+    state = fields.Selection([
+        ('review', 'Chờ duyệt'),
+        ('done', 'Thành công'),
+        ('rejected', 'Bị từ chối'),
+    ], string='Kết quả', required=True, readonly=True, index=True)
+    message = fields.Char('Lý do', readonly=True)
+    offline = fields.Boolean('Đồng bộ offline', readonly=True)
+    reviewer_id = fields.Many2one('res.users', string='Người duyệt', readonly=True)
+
+    _sql_constraints = [
+        ('key_uniq', 'unique(key)', 'Mã chấm công kiosk đã tồn tại.'),
+    ]
+
+    @api.model
+    def _get_offline_window(self):
+        """Lượt offline cũ hơn số giờ này bị từ chối khi đồng bộ."""
+        value = self.env['ir.config_parameter'].sudo().get_param(
+            'forher_attendance.kiosk_offline_window_hours', self.DEFAULT_OFFLINE_WINDOW)
+        try:
+            return timedelta(hours=max(int(value), 1))
+        except (TypeError, ValueError):
+            return timedelta(hours=self.DEFAULT_OFFLINE_WINDOW)
+
+    @api.model
+    def _punch(self, employee, punch_time=None):
+        """Check-in / check-out cho 1 nhân viên, trả về (action, error).
+
+        Chỉ đọc bản ghi chấm công gần nhất của nhân viên đó.
+        """
+        fixed_loc = self.env['ir.config_parameter'].sudo().get_param('forher_attendance.kiosk_location', 'Store Front')
+        Attendance = self.env['hr.attendance'].sudo()
+        punch_time = punch_time or fields.Datetime.now()
+
+        # Tính "hôm nay" (theo thời điểm chấm công) theo TZ user
+        day_start_utc, day_end_utc = _today_range_utc(self.env, punch_time)
+        day_start = fields.Datetime.to_string(day_start_utc)
+        day_end = fields.Datetime.to_string(day_end_utc)
+
+        last_att = Attendance.search([
+            ('employee_id', '=', employee.id),
+            ('check_in', '<=', punch_time),
+        ], limit=1, order='check_in desc')
+        today_att = last_att if last_att and day_start <= fields.Datetime.to_string(last_att.check_in) <= day_end else Attendance
+
+        # Nếu đã check-in & check-out -> thông báo 1 ngày 1 lần
+        if today_att and today_att.check_out:
+            return None, 'Bạn được chấm công 1 ngày/1 lần. Hôm nay bạn đã hoàn thành chấm công.'
+
+        # Nếu đã check-in hôm nay nhưng chưa check-out -> thực hiện check-out
+        if today_att:
+            try:
+                with self.env.cr.savepoint():
+                    today_att.write({
+                        'check_out': punch_time,
+                        'check_out_note': 'Kiosk',
+                        'check_out_location': fixed_loc,
+                    })
+            except Exception as e:
+                return None, Attendance._get_constraint_error(e) or str(e)
+            return 'checkout', None
+
+        # Kiểm tra bản ghi mở từ ngày trước
+        if (last_att and not last_att.check_out) or Attendance.search_count([
+            ('employee_id', '=', employee.id),
+            ('check_out', '=', False),
+        ], limit=1):
+            return None, 'Bạn còn bản ghi chấm công ngày trước chưa kết thúc. Vui lòng liên hệ quản lý để xử lý.'
+
+        # Check-in lần đầu trong ngày
+        try:
+            with self.env.cr.savepoint():
+                Attendance.create({
+                    'employee_id': employee.id,
+                    'check_in': punch_time,
+                    'check_in_note': 'Kiosk',
+                    'check_in_location': fixed_loc,
+                })
+        except Exception as e:
+            return None, Attendance._get_constraint_error(e) or str(e)
+        return 'checkin', None
+
+    def action_approve(self):
+        """Quản lý duyệt lượt offline: áp dụng theo thứ tự thời gian chấm công.
+
+        Lượt không áp dụng được (trùng, ngoài ca, ...) vẫn chờ duyệt kèm lý do để xử lý tay.
+        """
+        self.env['hr.attendance']._check_approver(_('Bạn không có quyền duyệt chấm công offline.'))
+        for punch in self.filtered(lambda p: p.state == 'review').sorted(lambda p: (p.punch_time, p.id)):
+            action, error = self._punch(punch.employee_id, punch.punch_time)
+            if error:
+                punch.sudo().message = error
+                continue
+            punch.sudo().write({'state': 'done', 'action': action, 'message': False, 'reviewer_id': self.env.uid})
+        return True
+
+    def action_reject(self):
+        self.env['hr.attendance']._check_approver(_('Bạn không có quyền duyệt chấm công offline.'))
+        self.filtered(lambda p: p.state == 'review').sudo().write({
+            'state': 'rejected',
+            'message': _('Quản lý từ chối lượt chấm công offline.'),
+            'reviewer_id': self.env.uid,
+        })
+        return True
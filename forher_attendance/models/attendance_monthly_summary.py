@@ -0,0 +1,123 @@
+# file: models/attendance_monthly_summary.py
+from dateutil.relativedelta import relativedelta
+
+from odoo import api, fields, models
+
+
+class ForHerAttendanceMonthlySummary(models.Model):
+    """Tổng hợp công theo (nhân viên, loại công, tháng).
+
+    Bảng được ghi trực tiếp bằng SQL GROUP BY trên hr_attendance + bảng lưu trữ (chỉ
+    các bản ghi 'confirmed'/'validated') và được làm mới theo từng (nhân viên, tháng) khi trạng
+    thái chấm công thay đổi, để payroll/dashboard đọc số liệu đã gộp sẵn.
+    """
+    _name = 'forher.attendance.monthly.summary'
+    _description = 'Tổng hợp công theo tháng'
+    _order = 'month desc, employee_id, attendance_type_id'
+    _rec_name = 'employee_id'
+
+    # Trạng thái chấm công được tính vào tổng hợp
+    SUMMARY_STATES = ('confirmed', 'validated')
+
+    employee_id = fields.Many2one('hr.employee', string='Nhân viên', required=True, index=True, ondelete='cascade', readonly=True)
+    attendance_type_id = fields.Many2one('forher.attendance.type', string='Loại công', ondelete='cascade', readonly=True)
+    month = fields.Date('Tháng', required=True, index=True, readonly=True, help='Ngày đầu tháng')
+    branch_id = fields.Many2one('res.company', string='Chi nhánh', index=True, readonly=True)
+    attendance_count = fields.Integer('Số bản ghi công', readonly=True)
+    quantity = fields.Float('Số lượng', readonly=True)
+    total_amount = fields.Monetary('Tổng tiền (VNĐ)', currency_field='company_currency_id', readonly=True)
+    company_currency_id = fields.Many2one('res.currency', string='Tiền tệ công ty', related='branch_id.currency_id', readonly=True)
+
+    def init(self):
+        # NULL attendance_type_id vẫn phải là 1 nhóm duy nhất
+        self.env.cr.execute("""
+            CREATE UNIQUE INDEX IF NOT EXISTS forher_attendance_monthly_summary_key_uniq
+                ON %s (employee_id, COALESCE(attendance_type_id, 0), month)
+        """ % self._table)
+
+    # -------------------------
+    # Làm mới dữ liệu
+    # -------------------------
+    def _prepare_refresh(self):
+        self.env['hr.attendance'].flush_model([
+            'employee_id', 'attendance_type_id', 'date', 'branch_id', 'quantity', 'total_amount', 'state',
+        ])
+
+    def _insert_groups(self, join_clause, where_clause, params):
+        """INSERT ... SELECT ... GROUP BY trên chấm công (nóng + lưu trữ) cho phần dữ liệu được lọc."""
+        self.env.cr.execute("""
+            INSERT INTO %(table)s (
+                employee_id, attendance_type_id, month, branch_id,
+                attendance_count, quantity, total_amount,
+                create_uid, create_date, write_uid, write_date
+            )
+            SELECT a.employee_id,
+                   a.attendance_type_id,
+                   date_trunc('month', a.date)::date,
+                   MAX(a.branch_id),
+                   COUNT(*),
+                   SUM(COALESCE(a.quantity, 0)),
+                   SUM(COALESCE(a.total_amount, 0)),
+                   %%(uid)s, now() AT TIME ZONE 'UTC', %%(uid)s, now() AT TIME ZONE 'UTC'
+              FROM %(source)s a
+              %(join)s
+             WHERE a.state IN %%(states)s
+               AND a.date IS NOT NULL
+               AND %(where)s
+          GROUP BY a.employee_id, a.attendance_type_id, date_trunc('month', a.date)
+        """ % {
+            'table': self._table,
+            'source': self.env['forher.attendance.archive']._get_union_query(),
+            'join': join_clause,
+            'where': where_clause,
+        },
+            dict(params, uid=self.env.uid, states=self.SUMMARY_STATES))
+
+    @api.model
+    def _rebuild_month(self, month):
+        """Tính lại toàn bộ 1 tháng bằng 1 GROUP BY."""
+        first = month.replace(day=1)
+        last = first + relativedelta(months=1)
+        self._prepare_refresh()
+        self.env.cr.execute("DELETE FROM %s WHERE month = %%s" % self._table, (first,))
+        self._insert_groups('', 'a.date >= %(first)s AND a.date < %(last)s', {'first': first, 'last': last})
+        self.invalidate_model()
+        return self.search([('month', '=', first)])
+
+    @api.model
+    def _get_summary_keys(self, attendances):
+        """Các (nhân viên, tháng) mà ``attendances`` đang được tính vào tổng hợp."""
+        return {
+            (att.employee_id.id, att.date.replace(day=1))
+            for att in attendances
+            if att.employee_id and att.date and att.state in self.SUMMARY_STATES
+        }
+
+    @api.model
+    def _refresh_attendances(self, attendances):
+        """Làm mới các dòng (nhân viên, tháng) bị ảnh hưởng bởi ``attendances``."""
+        self._refresh_keys({
+            (att.employee_id.id, att.date.replace(day=1))
+            for att in attendances if att.employee_id and att.date
+        })
+
+    @api.model
+    def _refresh_keys(self, keys):
+        """Làm mới các dòng của tập khoá (employee_id, ngày đầu tháng)."""
+        if not keys:
+            return
+        employee_ids, months = zip(*keys)
+        params = {'employee_ids': list(employee_ids), 'months': list(months)}
+        self._prepare_refresh()
+        self.env.cr.execute("""
+            DELETE FROM %s s
+             USING unnest(%%(employee_ids)s::int[], %%(months)s::date[]) AS k(employee_id, month)
+             WHERE s.employee_id = k.employee_id AND s.month = k.month
+        """ % self._table, params)
+        self._insert_groups(
+            "JOIN unnest(%(employee_ids)s::int[], %(months)s::date[]) AS k(employee_id, month)"
+            " ON k.employee_id = a.employee_id",
+            "a.date >= k.month AND a.date < k.month + interval '1 month'",
+            params,
+        )
+        self.invalidate_model()
@@ -0,0 +1,113 @@
+# file: models/holiday_recompute.py
+import logging
+import threading
+from datetime import datetime, time, timedelta
+
+from odoo import api, fields, models
+from odoo.addons.forher_company_overview.models.perf_profiler import profiled
+
+_logger = logging.getLogger(__name__)
+
+
+class ForHerAttendanceHolidayRecompute(models.Model):
+    """Hàng đợi tính lại chấm công theo ngày khi lịch ngày lễ thay đổi.
+
+    Các trường lưu trên hr.attendance không phụ thuộc lịch ngày lễ, nên mỗi ngày lễ
+    được thêm/sửa/xoá sẽ xếp 1 dòng vào đây; cron tính lại is_holiday, loại công, OT và thành
+    tiền cho đúng các bản ghi của ngày đó theo lô, thao tác trên lịch vẫn tức thì.
+    """
+    _name = 'forher.attendance.holiday.recompute'
+    _description = 'Hàng đợi tính lại chấm công theo ngày lễ'
+    _order = 'date, id'
+
+    # Các trường phụ thuộc ngày lễ (attendance_type_id được phân loại lại riêng)
+    HOLIDAY_FIELDS = (
+        'ot_hours_normal', 'ot_hours_holiday', 'ot_hours_total', 'ot_done', 'total_amount',
+    )
+    BATCH_SIZE = 1000
+
+    date = fields.Date('Ngày', required=True, index=True, readonly=True)
+    last_attendance_id = fields.Integer('Đã xử lý tới id', default=0, readonly=True)
+
+    @api.model
+    def _enqueue(self, dates):
+        dates = {d for d in dates if d}
+        if not dates:
+            return
+        queued = self.sudo().search([('date', 'in', list(dates))])
+        # Ngày đang xử lý dở thì chạy lại từ đầu
+        queued.write({'last_attendance_id': 0})
+        self.sudo().create([{'date': d} for d in sorted(dates - set(queued.mapped('date')))])
+        self.env.ref('forher_attendance.forher_attendance_holiday_recompute_cron')._trigger()
+
+    def _get_attendance_domain(self):
+        # is_holiday so theo ngày UTC của check_in
+        start = datetime.combine(self.date, time.min)
+        return [
+            ('check_in', '>=', start),
+            ('check_in', '<', start + timedelta(days=1)),
+            ('id', '>', self.last_attendance_id),
+        ]
+
+    def _process_batch(self):
+        """Tính lại 1 lô bản ghi chấm công của ngày; trả về False khi đã xong ngày."""
+        self.ensure_one()
+        Attendance = self.env['hr.attendance'].sudo()
+        records = Attendance.search(self._get_attendance_domain(), order='id', limit=self.BATCH_SIZE)
+        if not records:
+            self.unlink()
+            return False
+        # is_holiday trước, để phân loại lại loại công rồi mới tính các trường phụ thuộc
+        was_holiday = {rec.id: rec.is_holiday for rec in records}
+        self.env.add_to_compute(Attendance._fields['is_holiday'], records)
+        records.flush_recordset(['is_holiday'])
+        records.filtered(lambda r: r.is_holiday != was_holiday[r.id])._reclassify_holiday_type()
+        for fname in self.HOLIDAY_FIELDS:
+            self.env.add_to_compute(Attendance._fields[fname], records)
+        records.flush_recordset(list(self.HOLIDAY_FIELDS) + ['attendance_type_id', 'quantity'])
+        # Tổng hợp tháng cập nhật 1 lần cho cả lô
+        self.env['forher.attendance.monthly.summary']._refresh_attendances(records)
+        self.last_attendance_id = records[-1].id
+        return True
+
+    @api.model
+    @profiled()
+    def _cron_process_queue(self, max_batches=20):
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        batches = 0
+        for item in self.search([]):
+            while batches < max_batches and item._process_batch():
+                batches += 1
+                if auto_commit:
+                    self.env.cr.commit()
+            if batches >= max_batches:
+                break
+        if auto_commit:
+            self.env.cr.commit()
+
+        remaining = self.search_count([])
+        self.env['ir.cron']._notify_progress(done=batches, remaining=remaining)
+        _logger.info('Tính lại chấm công ngày lễ: %s lô, còn %s ngày', batches, remaining)
+
+
+class HolidayCalendar(models.Model):
+    _inherit = 'forher.holiday.calendar'
+
+    @api.model
+    def create(self, vals):
+        rec = super().create(vals)
+        self.env['forher.attendance.holiday.recompute']._enqueue(rec.mapped('date'))
+        return rec
+
+    def write(self, vals):
+        old_dates = set(self.mapped('date')) if 'date' in vals else set()
+        res = super().write(vals)
+        if 'date' in vals:
+            self.env['forher.attendance.holiday.recompute']._enqueue(old_dates | set(self.mapped('date')))
+        return res
+
+    def unlink(self):
+        dates = set(self.mapped('date'))
+        res = super().unlink()
+        self.env['forher.attendance.holiday.recompute']._enqueue(dates)
+        return res
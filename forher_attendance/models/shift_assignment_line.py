@@ -0,0 +1,50 @@
+# file: models/shift_assignment_line.py
+from odoo import api, fields, models
+
+
+class ForHerShiftAssignmentLine(models.Model):
+    """Phân ca theo từng nhân viên (1 dòng / nhân viên / ngày / ca).
+
+    Bảng phẳng được đồng bộ từ Many2many ``forher.shift.assignment.employee_ids`` để
+    tra "ca của tôi hôm nay" bằng 1 lần dò index (employee_id, date, shift_id) thay
+    vì join qua bảng quan hệ; index unique chặn phân trùng ca cho 1 nhân viên.
+    Không sửa trực tiếp — mọi thay đổi đi qua forher.shift.assignment.
+    """
+    _name = 'forher.shift.assignment.line'
+    _description = 'Phân ca theo nhân viên'
+    _order = 'date, employee_id, shift_id'
+    _rec_name = 'employee_id'
+
+    assignment_id = fields.Many2one('forher.shift.assignment', string='Phân ca', required=True,
+                                    index=True, ondelete='cascade', readonly=True)
+    employee_id = fields.Many2one('hr.employee', string='Nhân viên', required=True, ondelete='cascade', readonly=True)
+    date = fields.Date('Ngày làm việc', required=True, readonly=True)
+    shift_id = fields.Many2one('forher.shift', string='Ca làm việc', required=True, ondelete='cascade', readonly=True)
+    company_id = fields.Many2one('res.company', string='Chi nhánh', index=True, readonly=True)
+
+    _sql_constraints = [
+        ('employee_date_shift_uniq', 'unique(employee_id, date, shift_id)',
+         'Nhân viên đã được phân ca này trong ngày.'),
+    ]
+
+    def init(self):
+        # Nạp dữ liệu phân ca đã có khi cài module / nâng cấp lần đầu
+        self.env.cr.execute("SELECT 1 FROM %s LIMIT 1" % self._table)
+        if not self.env.cr.fetchone():
+            self.env['forher.shift.assignment'].search([])._sync_assignment_lines()
+
+    @api.model
+    def _get_employee_shifts(self, employee_id, day):
+        """Các dòng phân ca của nhân viên trong ngày ``day``."""
+        return self.search([('employee_id', '=', employee_id), ('date', '=', day)])
+
+    @api.model
+    def _get_shift_day_counts(self, employee_ids, date_from, date_to):
+        """{employee_id: số ngày có phân ca trong [date_from, date_to]} bằng 1 GROUP BY."""
+        self.flush_model(['employee_id', 'date'])
+        self.env.cr.execute("""
+            SELECT employee_id, COUNT(DISTINCT date) FROM %s
+             WHERE employee_id = ANY(%%s) AND date BETWEEN %%s AND %%s
+          GROUP BY employee_id
+        """ % self._table, (list(employee_ids), date_from, date_to))
+        return {employee_id: float(days) for employee_id, days in self.env.cr.fetchall()}
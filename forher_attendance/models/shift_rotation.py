@@ -0,0 +1,62 @@
+# file: models/shift_rotation.py
+from odoo import api, fields, models
+
+
+class ForHerShiftRotation(models.Model):
+    """Mẫu xoay ca theo chi nhánh.
+
+    Các dòng (theo thứ tự) tạo thành 1 chu kỳ lặp lại tính từ ``date_start``; dòng
+    không có ca là ngày nghỉ. Ví dụ ca sáng/ca tối xen kẽ = 2 dòng (Sáng, Tối).
+    Muốn 2 nhóm đổi ca ngược nhau thì tạo 2 mẫu với thứ tự dòng đảo lại.
+    """
+    _name = 'forher.shift.rotation'
+    _description = 'Mẫu xoay ca'
+    _order = 'company_id, name'
+
+    name = fields.Char('Tên mẫu', required=True)
+    company_id = fields.Many2one('res.company', string='Chi nhánh', required=True, index=True,
+                                 default=lambda self: self.env.company)
+    date_start = fields.Date('Ngày bắt đầu chu kỳ', required=True,
+                             default=lambda self: fields.Date.context_today(self).replace(day=1))
+    skip_weekend = fields.Boolean('Nghỉ cuối tuần', help='Không phân ca vào thứ Bảy và Chủ nhật')
+    employee_ids = fields.Many2many('hr.employee', 'forher_shift_rotation_hr_employee_rel',
+                                    'rotation_id', 'employee_id', string='Nhân viên')
+    line_ids = fields.One2many('forher.shift.rotation.line', 'rotation_id', string='Chu kỳ ca', copy=True)
+    cycle_length = fields.Integer('Số ngày / chu kỳ', compute='_compute_cycle_length')
+    active = fields.Boolean(default=True)
+
+    @api.depends('line_ids')
+    def _compute_cycle_length(self):
+        for rec in self:
+            rec.cycle_length = len(rec.line_ids)
+
+    def _get_shift_for_date(self, day):
+        """Ca của ngày ``day`` theo chu kỳ (forher.shift rỗng = nghỉ)."""
+        self.ensure_one()
+        lines = self.line_ids.sorted(lambda l: (l.sequence, l.id))
+        if not lines or (self.skip_weekend and day.weekday() >= 5):
+            return self.env['forher.shift']
+        return lines[(day - self.date_start).days % len(lines)].shift_id
+
+    def _build_roster_plan(self, days):
+        """{(ngày, shift_id): set(employee_id)} cho các ngày ``days``."""
+        plan = {}
+        for rotation in self:
+            employee_ids = set(rotation.employee_ids.filtered('active').ids)
+            if not employee_ids:
+                continue
+            for day in days:
+                shift = rotation._get_shift_for_date(day)
+                if shift:
+                    plan.setdefault((day, shift.id), set()).update(employee_ids)
+        return plan
+
+
+class ForHerShiftRotationLine(models.Model):
+    _name = 'forher.shift.rotation.line'
+    _description = 'Dòng mẫu xoay ca'
+    _order = 'rotation_id, sequence, id'
+
+    rotation_id = fields.Many2one('forher.shift.rotation', string='Mẫu xoay ca', required=True, ondelete='cascade')
+    sequence = fields.Integer('Thứ tự', default=10)
+    shift_id = fields.Many2one('forher.shift', string='Ca làm việc', help='Để trống = ngày nghỉ')
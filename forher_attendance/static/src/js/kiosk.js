@@ -1,9 +1,163 @@
 (function () {
+  var DB_NAME = 'forher_kiosk';
+  var STORE = 'punches';
+  var SYNC_INTERVAL = 60000;
+  var ROSTER_PAGE_SIZE = 50;
+  var syncing = false;
+
   function onReady(fn) {
     if (document.readyState !== 'loading') fn();
     else document.addEventListener('DOMContentLoaded', fn);
   }
 
+  // ---------- Hàng đợi chấm công offline (IndexedDB) ----------
+  function newKey() {
+    if (window.crypto && window.crypto.randomUUID) return window.crypto.randomUUID();
+    return 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g, function (c) {
+      var r = Math.random() * 16 | 0;
+      return (c === 'x' ? r : (r & 0x3 | 0x8)).toString(16);
+    });
+  }
+
+  function openDb() {
+    return new Promise(function (resolve, reject) {
+      if (!window.indexedDB) return reject(new Error('IndexedDB không khả dụng'));
+      var req = window.indexedDB.open(DB_NAME, 2);
+      req.onupgradeneeded = function (ev) {
+        if (ev.oldVersion < 1) {
+          req.result.createObjectStore(STORE, { keyPath: 'key' });
+          return;
+        }
+        // v1 lưu cả PIN trong hàng đợi: xoá PIN khỏi các lượt còn tồn
+        req.transaction.objectStore(STORE).openCursor().onsuccess = function (e) {
+          var cursor = e.target.result;
+          if (!cursor) return;
+          var value = cursor.value;
+          if (value.pin !== undefined) {
+            delete value.pin;
+            cursor.update(value);
+          }
+          cursor.continue();
+        };
+      };
+      req.onsuccess = function () { resolve(req.result); };
+      req.onerror = function () { reject(req.error); };
+    });
+  }
+
+  function withStore(mode, fn) {
+    return openDb().then(function (db) {
+      return new Promise(function (resolve, reject) {
+        var tx = db.transaction(STORE, mode);
+        var result = fn(tx.objectStore(STORE));
+        tx.oncomplete = function () { db.close(); resolve(result && result.result); };
+        tx.onerror = function () { db.close(); reject(tx.error); };
+      });
+    });
+  }
+
+  function enqueuePunch(punch) {
+    return withStore('readwrite', function (store) { store.put(punch); });
+  }
+
+  function rpc(url, params) {
+    return fetch(url, {
+      method: 'POST',
+      credentials: 'same-origin',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ jsonrpc: '2.0', method: 'call', params: params }),
+    }).then(function (resp) {
+      if (!resp.ok) throw new Error(resp.statusText);
+      return resp.json();
+    }).then(function (payload) {
+      if (payload.error) {
+        throw new Error((payload.error.data && payload.error.data.message) || payload.error.message);
+      }
+      return payload.result;
+    });
+  }
+
+  // Gửi toàn bộ hàng đợi trong 1 lần gọi, xoá các lượt server đã trả kết quả
+  function flushQueue() {
+    if (syncing || !navigator.onLine) return Promise.resolve();
+    syncing = true;
+    return withStore('readonly', function (store) { return store.getAll(); }).then(function (punches) {
+      if (!punches || !punches.length) return;
+      return rpc('/forher_attendance/kiosk/sync', { punches: punches }).then(function (res) {
+        return withStore('readwrite', function (store) {
+          res.results.forEach(function (r) { store.delete(r.key); });
+        });
+      });
+    }).catch(function () {
+      // Giữ nguyên hàng đợi, thử lại lần sau
+    }).finally(function () {
+      syncing = false;
+    });
+  }
+
+  // ---------- Danh sách nhân viên: tìm theo tiền tố, tải theo trang ----------
+  function initRoster() {
+    var search = document.getElementById('fk-emp-search');
+    var select = document.getElementById('fk-emp-select');
+    var more   = document.getElementById('fk-emp-more');
+    if (!select) return;
+
+    var state = { query: '', offset: 0, seq: 0 };
+    var timer = null;
+
+    function load(reset) {
+      if (reset) state.offset = 0;
+      var seq = ++state.seq;
+      rpc('/forher_attendance/kiosk/employees', {
+        query: state.query,
+        offset: state.offset,
+        limit: ROSTER_PAGE_SIZE,
+      }).then(function (res) {
+        if (seq !== state.seq) return; // bỏ kết quả của lần gõ cũ
+        if (reset) {
+          while (select.options.length > 1) select.remove(1);
+        }
+        res.records.forEach(function (emp) {
+          var opt = document.createElement('option');
+          opt.value = emp.id;
+          opt.textContent = emp.code ? emp.name + ' [' + emp.code + ']' : emp.name;
+          select.appendChild(opt);
+        });
+        state.offset += res.records.length;
+        if (more) more.style.display = state.offset < res.total ? '' : 'none';
+        // Chỉ còn 1 kết quả → chọn luôn
+        if (reset && state.query && res.total === 1) select.value = String(res.records[0].id);
+      }).catch(function () {
+        // Offline: vẫn chấm công được bằng PIN/Mã
+      });
+    }
+
+    if (search) {
+      search.addEventListener('input', function () {
+        clearTimeout(timer);
+        timer = setTimeout(function () {
+          state.query = search.value.trim();
+          load(true);
+        }, 250);
+      });
+    }
+    if (more) {
+      more.addEventListener('click', function (ev) {
+        ev.preventDefault();
+        load(false);
+      });
+    }
+    var form = document.getElementById('fk-form');
+    if (form) {
+      form.addEventListener('reset', function () {
+        if (!state.query) return;
+        state.query = '';
+        load(true);
+      });
+    }
+    load(true);
+  }
+
   function initOnce() {
     var pinInput = document.getElementById('fk-pin');
     var keypad   = document.getElementById('fk-keypad');
@@ -12,17 +166,86 @@
 
     if (!pinInput) return; // chờ đến khi form render xong
 
+    initRoster();
+
     // Autofocus
     try { pinInput.focus(); } catch (e) {}
 
+    // Hiển thị kết quả chấm công ngay trên form
+    function showResult(ok, message) {
+      var box = document.getElementById('fk-result');
+      if (!box) return;
+      box.className = 'alert ' + (ok ? 'alert-success' : 'alert-danger');
+      box.textContent = message;
+      box.style.display = '';
+    }
+
+    // Gửi chấm công qua JSON-RPC, không tải lại trang; mất mạng thì xếp hàng offline.
+    // Hàng đợi KHÔNG lưu PIN (máy kiosk dùng chung): lượt offline chỉ ghi nhân viên/mã
+    // và được quản lý duyệt sau khi đồng bộ.
+    function punch(data) {
+      var item = {
+        key: newKey(),
+        employee_id: data.get('employee_id'),
+        code: data.get('code'),
+        timestamp: new Date().toISOString(),
+      };
+      var queue = function () {
+        if (!item.employee_id && !item.code) {
+          return Promise.resolve({
+            ok: false,
+            error: 'Mất kết nối: hãy chọn nhân viên hoặc nhập mã để lưu chấm công offline.',
+          });
+        }
+        return enqueuePunch(item).then(function () {
+          return { ok: true, queued: true };
+        });
+      };
+      if (!navigator.onLine) return queue();
+      // Đồng bộ hàng đợi cũ trước để server nhận đúng thứ tự thời gian
+      return flushQueue().then(function () {
+        return rpc('/forher_attendance/kiosk/punch_json', Object.assign({ pin: data.get('pin') }, item));
+      }).catch(function (err) {
+        // Lỗi mạng → lưu offline; lỗi do server trả về → hiển thị luôn
+        if (err instanceof TypeError) return queue();
+        return { ok: false, error: err.message };
+      });
+    }
+
     // Loading state cho form submit
     if (form) {
       form.addEventListener('submit', function(e) {
+        if (!window.fetch) return; // trình duyệt cũ: submit form như bình thường
+        e.preventDefault();
         var submitBtn = form.querySelector('.fk-submit');
+        var btnHtml = submitBtn ? submitBtn.innerHTML : '';
         if (submitBtn) {
           submitBtn.disabled = true;
           submitBtn.innerHTML = '<i class="fa fa-spinner fa-spin"></i> Đang xử lý...';
         }
+        punch(new FormData(form)).then(function (res) {
+          if (res.queued) {
+            showResult(true, 'Mất kết nối: đã lưu chấm công, sẽ đồng bộ khi có mạng và chờ quản lý duyệt.');
+            form.reset();
+          } else if (res.ok) {
+            var label = res.action === 'checkin' ? 'Check-in' : 'Check-out';
+            var shift = res.shift ? ' - Ca: ' + res.shift : '';
+            showResult(true, label + ' thành công: ' + res.employee + ' (' + res.time + ')' + shift);
+            form.reset();
+          } else {
+            showResult(false, res.error);
+          }
+        }).catch(function () {
+          // Không lưu được offline (không có IndexedDB): quay về submit form truyền thống
+          form.submit();
+        }).finally(function () {
+          if (submitBtn) {
+            submitBtn.disabled = false;
+            submitBtn.innerHTML = btnHtml;
+          }
+          pinInput.value = '';
+          try { pinInput.focus(); } catch (err) {}
+        });
       });
     }
 
@@ -71,6 +294,7 @@
     // Bắt phím cứng từ bàn phím: 0-9, Backspace, Delete
     document.addEventListener('keydown', function (e) {
       if (!pinInput) return;
+      if (e.target && e.target.id === 'fk-emp-search') return; // đang gõ tìm nhân viên
       var k = e.key;
 
       if (/^[0-9]$/.test(k)) {
@@ -91,8 +315,13 @@
     }, { capture: true });
   }
 
+  // Đồng bộ hàng đợi khi có mạng trở lại và định kỳ
+  window.addEventListener('online', flushQueue);
+  setInterval(flushQueue, SYNC_INTERVAL);
+
   // Khởi tạo khi DOM sẵn sàng
   onReady(function () {
+    flushQueue();
     // Nếu phần tử chưa có (do render QWeb trễ), dùng MutationObserver để chờ
     if (document.getElementById('fk-pin')) {
       initOnce();
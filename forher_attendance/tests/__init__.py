@@ -0,0 +1,4 @@
+from . import test_shift_resolver
+from . import test_shift_roster
+from . import test_attendance_perf
+from . import test_attendance_import
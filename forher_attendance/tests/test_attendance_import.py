@@ -0,0 +1,50 @@
+from datetime import date
+
+from odoo.tests.common import TransactionCase
+
+
+class TestAttendanceImport(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env.user.tz = 'Asia/Ho_Chi_Minh'
+        cls.env.company.resource_calendar_id.tz = 'Asia/Ho_Chi_Minh'
+        cls.day = date(2025, 3, 3)
+        shift = cls.env['forher.shift'].create({
+            'name': 'Ca import', 'code': 'IMP', 'start_time': 8.0, 'end_time': 17.0,
+        })
+        cls.employees = cls.env['hr.employee'].create([
+            {'name': 'NV import %s' % i, 'barcode': 'IMP%s' % i} for i in range(4)
+        ])
+        # NV import 3 không có hợp đồng → create bị ValidationError
+        cls.env['forher.hr.contract'].create([{
+            'name': 'HĐ import %s' % employee.id,
+            'employee_id': employee.id,
+            'company_id': employee.company_id.id,
+            'wage': 5000000,
+            'date_start': date(2024, 1, 1),
+            'state': 'open',
+        } for employee in cls.employees[:3]])
+        cls.env['forher.shift.assignment'].create({
+            'shift_id': shift.id, 'date': cls.day, 'employee_ids': [(6, 0, cls.employees.ids)],
+        })
+
+    def test_mixed_chunk(self):
+        rows = [
+            {'barcode': 'IMP0', 'check_in': '2025-03-03 08:00', 'check_out': '2025-03-03 17:00'},  # 2
+            {'barcode': 'KHONGCO', 'check_in': '2025-03-03 08:00'},                               # 3
+            {'barcode': 'IMP1', 'check_in': '03/03/2025 08:05', 'check_out': '03/03/2025 17:00'},  # 4
+            {'barcode': 'IMP2', 'check_in': 'sai giờ'},                                            # 5
+            {'barcode': 'IMP3', 'check_in': '2025-03-03 08:00', 'check_out': '2025-03-03 17:00'},  # 6
+            {'barcode': 'IMP0', 'check_in': '2025-03-03 09:00'},                                   # 7
+            {'barcode': 'IMP2', 'check_in': '2025-03-03 08:00', 'check_out': '2025-03-03 07:00'},  # 8
+        ]
+        result = self.env['hr.attendance'].import_punches(rows, chunk_size=10)
+
+        self.assertEqual(result['created'], 2)
+        self.assertEqual(sorted(line for line, _code, _reason in result['rejected']), [3, 5, 6, 7, 8])
+        attendances = self.env['hr.attendance'].search([('employee_id', 'in', self.employees.ids)])
+        self.assertEqual(attendances.employee_id, self.employees[:2])
+        # Dòng lỗi ở lô (không có hợp đồng) được tách riêng, không kéo theo dòng hợp lệ
+        reasons = {line: reason for line, _code, reason in result['rejected']}
+        self.assertIn(self.employees[3].name, reasons[6])
@@ -0,0 +1,205 @@
+import json
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+
+import pytz
+
+from odoo.tests.common import TransactionCase, tagged
+
+_logger = logging.getLogger(__name__)
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'perf_baseline.json')
+
+
+@tagged('post_install', '-at_install', '-standard', 'perf')
+class TestAttendancePerf(TransactionCase):
+    """Benchmark chấm công trên dữ liệu giả lập N nhân viên x M ngày.
+
+    Chạy riêng: ``odoo-bin -d <db> --test-tags perf -u forher_attendance --stop-after-init``.
+    Mỗi phép đo ghi số truy vấn và thời gian (chia theo số bản ghi). Chỉ số truy vấn được so
+    với ``perf_baseline.json`` cùng cỡ dữ liệu; thời gian phụ thuộc máy nên chỉ ghi log. Chưa có
+    mốc thì bỏ qua phép đo. Đặt ``FORHER_PERF_UPDATE_BASELINE=1`` để ghi mốc vào file này trong
+    mã nguồn, rồi commit file đó.
+    """
+    EMPLOYEES = int(os.environ.get('FORHER_PERF_EMPLOYEES', 200))
+    DAYS = min(int(os.environ.get('FORHER_PERF_DAYS', 20)), 28)
+    # Số lần chấm công kiểu kiosk (tạo từng bản ghi)
+    KIOSK_PUNCHES = 20
+    # Biên cho phép so với mốc số truy vấn
+    QUERY_TOLERANCE = 1.10
+    # Trường tính toán lưu trên hr.attendance, tính lại trong phép đo tháng
+    RECOMPUTE_FIELDS = (
+        'worked_hours', 'worked_hours_float', 'is_late', 'is_early', 'is_holiday', 'is_leave',
+        'ot_hours_normal', 'ot_hours_holiday', 'ot_hours_total', 'ot_done',
+        'worked_hours_display', 'ot_hours_display', 'total_amount',
+    )
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env.user.tz = 'Asia/Ho_Chi_Minh'
+        cls.env.company.resource_calendar_id.tz = 'Asia/Ho_Chi_Minh'
+        cls.tz = pytz.timezone('Asia/Ho_Chi_Minh')
+        cls.results = {}
+        with open(BASELINE_PATH) as f:
+            cls.baseline = json.load(f)
+
+        # Dữ liệu trong tháng hiện tại để action_check_violation có việc để làm
+        first = date.today().replace(day=1)
+        cls.days = [first + timedelta(days=i) for i in range(cls.DAYS)]
+
+        cls.shift = cls.env['forher.shift'].create({
+            'name': 'Ca benchmark', 'code': 'PERF', 'start_time': 8.0, 'end_time': 17.0,
+        })
+        cls.employees = cls.env['hr.employee'].create([
+            {'name': 'NV benchmark %s' % i} for i in range(cls.EMPLOYEES)
+        ])
+        cls.env['forher.hr.contract'].create([{
+            'name': 'HĐ benchmark %s' % employee.id,
+            'employee_id': employee.id,
+            'company_id': employee.company_id.id,
+            'wage': 5000000,
+            'date_start': first - timedelta(days=365),
+            'state': 'open',
+        } for employee in cls.employees])
+        cls.env['forher.shift.assignment'].create([
+            {'shift_id': cls.shift.id, 'date': d, 'employee_ids': [(6, 0, cls.employees.ids)]}
+            for d in cls.days
+        ])
+
+        # Ngày lễ cuối kỳ, 1/10 nhân viên nghỉ phép ngày đầu kỳ
+        cls.env['forher.holiday.calendar'].create({'name': 'Ngày lễ benchmark', 'date': cls.days[-1]})
+        leave_type = cls.env['forher.leave.type'].create({'name': 'Phép benchmark', 'code': 'PERF', 'max_days': 365})
+        cls.on_leave = cls.employees[::10]
+        cls.env['forher.leave.request'].create([{
+            'employee_id': employee.id,
+            'leave_type_id': leave_type.id,
+            'start_date': cls.days[0],
+            'end_date': cls.days[0],
+            'state': 'approve',
+        } for employee in cls.on_leave])
+
+        # Nửa đầu kỳ có sẵn chấm công (không đo), nửa sau dành cho các phép đo tạo mới
+        cls.half = cls.DAYS // 2
+        cls.env['hr.attendance'].create(cls._attendance_vals(cls.employees, cls.days[:cls.half]))
+        cls.env.flush_all()
+
+    def setUp(self):
+        super().setUp()
+        # Tên phép đo = tên test bỏ tiền tố "test_"
+        name = self._testMethodName[len('test_'):]
+        if not os.environ.get('FORHER_PERF_UPDATE_BASELINE') and not self._get_reference(name):
+            self.skipTest('Benchmark %s: chưa có mốc cho cỡ dữ liệu này, chạy với '
+                          'FORHER_PERF_UPDATE_BASELINE=1 để ghi rồi commit perf_baseline.json' % name)
+
+    @classmethod
+    def tearDownClass(cls):
+        if os.environ.get('FORHER_PERF_UPDATE_BASELINE') and cls.results:
+            dataset = {'employees': cls.EMPLOYEES, 'days': cls.DAYS}
+            if cls.baseline.get('dataset') != dataset:
+                cls.baseline = {'dataset': dataset, 'benchmarks': {}}
+            cls.baseline['benchmarks'].update(cls.results)
+            with open(BASELINE_PATH, 'w') as f:
+                json.dump(cls.baseline, f, indent=2, sort_keys=True)
+                f.write('\n')
+            _logger.info('Đã ghi mốc benchmark chấm công vào %s', BASELINE_PATH)
+        super().tearDownClass()
+
+    @classmethod
+    def _attendance_vals(cls, employees, days, note='Benchmark'):
+        vals_list = []
+        for d in days:
+            for employee in employees:
+                if d == cls.days[0] and employee in cls.on_leave:
+                    continue
+                # 1/5 nhân viên đi muộn 15 phút, tất cả về lúc 17:30 (có OT)
+                late = 15 if employee.id % 5 == 0 else 0
+                check_in = cls.tz.localize(datetime(d.year, d.month, d.day, 8, late))
+                check_out = cls.tz.localize(datetime(d.year, d.month, d.day, 17, 30))
+                vals_list.append({
+                    'employee_id': employee.id,
+                    'check_in': check_in.astimezone(pytz.UTC).replace(tzinfo=None),
+                    'check_out': check_out.astimezone(pytz.UTC).replace(tzinfo=None),
+                    'check_in_note': note,
+                })
+        return vals_list
+
+    def _measure(self, name, func, count=1):
+        """Đo ``func`` (kể cả flush cuối), ghi kết quả theo bản ghi và so với mốc."""
+        self.env.flush_all()
+        queries = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        func()
+        self.env.flush_all()
+        elapsed = time.perf_counter() - start
+        queries = self.env.cr.sql_log_count - queries
+
+        result = {
+            'queries': round(queries / count, 2),
+            'seconds': round(elapsed / count, 5),
+        }
+        self.results[name] = result
+        _logger.info('Benchmark %s (%s bản ghi): %s truy vấn, %.5fs / bản ghi',
+                     name, count, result['queries'], result['seconds'])
+        self._check_baseline(name, result)
+        return result
+
+    def _get_reference(self, name):
+        """Mốc của phép đo ``name`` nếu file mốc cùng cỡ dữ liệu."""
+        if self.baseline.get('dataset') != {'employees': self.EMPLOYEES, 'days': self.DAYS}:
+            return None
+        return self.baseline.get('benchmarks', {}).get(name)
+
+    def _check_baseline(self, name, result):
+        reference = self._get_reference(name)
+        if not reference:
+            return
+        _logger.info('Benchmark %s: %.5fs / bản ghi (mốc %.5fs)', name, result['seconds'], reference['seconds'])
+        self.assertLessEqual(
+            result['queries'], reference['queries'] * self.QUERY_TOLERANCE + 1,
+            'Benchmark %s: số truy vấn tăng so với mốc (%s)' % (name, reference['queries']))
+
+    def test_kiosk_single_create(self):
+        Attendance = self.env['hr.attendance']
+        employees = self.employees[1:self.KIOSK_PUNCHES + 1]
+        vals_list = self._attendance_vals(employees, [self.days[self.half]], note='Kiosk')
+
+        def punch():
+            for vals in vals_list:
+                Attendance.create(vals)
+
+        self._measure('kiosk_single_create', punch, count=len(vals_list))
+
+    def test_bulk_create(self):
+        vals_list = self._attendance_vals(self.employees, self.days[self.half:])
+        self._measure('bulk_create', lambda: self.env['hr.attendance'].create(vals_list), count=len(vals_list))
+        self.assertEqual(
+            self.env['hr.attendance'].search_count([('employee_id', 'in', self.employees.ids)]),
+            len(vals_list) + (self.EMPLOYEES * self.half - len(self.on_leave)),
+        )
+
+    def test_monthly_recompute(self):
+        attendances = self.env['hr.attendance'].search([('employee_id', 'in', self.employees.ids)])
+        attendances.write({'state': 'validated'})
+        Attendance = self.env['hr.attendance']
+        Summary = self.env['forher.attendance.monthly.summary']
+
+        def recompute():
+            # Tính lại các trường lưu của cả tháng rồi dựng lại tổng hợp
+            for fname in self.RECOMPUTE_FIELDS:
+                self.env.add_to_compute(Attendance._fields[fname], attendances)
+            attendances.flush_recordset(list(self.RECOMPUTE_FIELDS))
+            Summary._rebuild_month(self.days[0])
+
+        self._measure('monthly_recompute', recompute, count=len(attendances))
+        self.assertEqual(
+            sum(Summary.search([('employee_id', 'in', self.employees.ids)]).mapped('attendance_count')),
+            len(attendances),
+        )
+
+    def test_check_violation(self):
+        attendances = self.env['hr.attendance'].search([('employee_id', 'in', self.employees.ids)])
+        self._measure('check_violation', self.env['hr.attendance'].action_check_violation, count=len(attendances))
+        self.assertTrue(self.env['forher.violation.record'].search_count([('employee_id', 'in', self.employees.ids)]))
@@ -0,0 +1,129 @@
+from datetime import date, datetime, timedelta
+
+import pytz
+
+from odoo.tests.common import TransactionCase
+
+
+class TestShiftResolver(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.env.user.tz = 'Asia/Ho_Chi_Minh'
+        cls.env.company.resource_calendar_id.tz = 'Asia/Ho_Chi_Minh'
+        cls.tz = pytz.timezone('Asia/Ho_Chi_Minh')
+        cls.shift = cls.env['forher.shift'].create({
+            'name': 'Ca sáng',
+            'code': 'SANG',
+            'start_time': 8.5,
+            'end_time': 17.0,
+        })
+        cls.employees = cls.env['hr.employee'].create([
+            {'name': 'Nhân viên %s' % i} for i in range(40)
+        ])
+        cls.days = [date(2025, 3, 1) + timedelta(days=i) for i in range(5)]
+        cls.env['forher.shift.assignment'].create([
+            {'shift_id': cls.shift.id, 'date': d, 'employee_ids': [(6, 0, cls.employees.ids)]}
+            for d in cls.days
+        ])
+
+    def _count_queries(self, func):
+        self.env.flush_all()
+        start = self.env.cr.sql_log_count
+        func()
+        return self.env.cr.sql_log_count - start
+
+    def _new_attendances(self, employees):
+        """Bản ghi chưa lưu: compute chạy trên cache, chỉ còn truy vấn của resolver."""
+        Attendance = self.env['hr.attendance']
+        records = Attendance
+        for employee in employees:
+            for d in self.days:
+                check_in = self.tz.localize(datetime(d.year, d.month, d.day, 8, 45))
+                check_out = self.tz.localize(datetime(d.year, d.month, d.day, 16, 30))
+                records |= Attendance.new({
+                    'employee_id': employee.id,
+                    'check_in': check_in.astimezone(pytz.UTC).replace(tzinfo=None),
+                    'check_out': check_out.astimezone(pytz.UTC).replace(tzinfo=None),
+                })
+        return records
+
+    def test_windows(self):
+        Assignment = self.env['forher.shift.assignment']
+        employee = self.employees[0]
+        windows = Assignment._get_shift_windows([(employee.id, self.days[0])], self.tz)
+        self.assertEqual(list(windows), [(employee.id, self.days[0])])
+        shift_id, planned_start, planned_end = windows[(employee.id, self.days[0])][0]
+        self.assertEqual(shift_id, self.shift.id)
+        self.assertEqual((planned_start.hour, planned_start.minute), (8, 30))
+        self.assertEqual((planned_end.hour, planned_end.minute), (17, 0))
+        self.assertFalse(Assignment._get_shift_windows([(employee.id, date(2025, 4, 1))], self.tz))
+
+    def test_planned_utc(self):
+        assignment = self.env['forher.shift.assignment'].search([
+            ('shift_id', '=', self.shift.id), ('date', '=', self.days[0]),
+        ])
+        # 08:30 / 17:00 giờ Việt Nam = 01:30 / 10:00 UTC
+        self.assertEqual(assignment.planned_start_utc, datetime(2025, 3, 1, 1, 30))
+        self.assertEqual(assignment.planned_end_utc, datetime(2025, 3, 1, 10, 0))
+
+        night = self.env['forher.shift'].create({
+            'name': 'Ca đêm',
+            'code': 'DEM',
+            'start_time': 22.0,
+            'end_time': 6.0,
+        })
+        self.assertEqual(night.duration, 8.0)
+        # Ca mới chưa nhập giờ (0 → 0) không bị coi là ca qua đêm 24 giờ
+        self.assertEqual(self.env['forher.shift'].create({
+            'name': 'Ca trống', 'code': 'TRONG', 'start_time': 0.0, 'end_time': 0.0,
+        }).duration, 0.0)
+        night_assignment = self.env['forher.shift.assignment'].create({
+            'shift_id': night.id,
+            'date': self.days[0],
+            'employee_ids': [(6, 0, self.employees[:1].ids)],
+        })
+        self.assertEqual(night_assignment.planned_start_utc, datetime(2025, 3, 1, 15, 0))
+        self.assertEqual(night_assignment.planned_end_utc, datetime(2025, 3, 1, 23, 0))
+
+    def test_resolver_single_query(self):
+        Assignment = self.env['forher.shift.assignment']
+        for employees in (self.employees[:2], self.employees):
+            pairs = [(e.id, d) for e in employees for d in self.days]
+            with self.assertQueryCount(1):
+                windows = Assignment._get_shift_windows(pairs, self.tz)
+            self.assertEqual(len(windows), len(pairs))
+
+    def test_compute_queries_do_not_scale(self):
+        small = self._new_attendances(self.employees[:2])
+        large = self._new_attendances(self.employees)
+        # Khởi động cache (user, tz, ...)
+        self._new_attendances(self.employees[:1])._compute_late_early()
+
+        for method in ('_compute_late_early', '_compute_worked_hours_float'):
+            count_small = self._count_queries(getattr(small, method))
+            count_large = self._count_queries(getattr(large, method))
+            self.assertEqual(count_small, count_large, method)
+            self.assertLessEqual(count_large, 1, method)
+
+        self.assertTrue(all(large.mapped('is_late')))
+        self.assertTrue(all(large.mapped('is_early')))
+        self.assertAlmostEqual(large[0].worked_hours_float, 7.5)
+
+    def test_assignment_lines_follow_m2m(self):
+        Line = self.env['forher.shift.assignment.line']
+        assignment = self.env['forher.shift.assignment'].search([
+            ('shift_id', '=', self.shift.id), ('date', '=', self.days[0]),
+        ])
+        lines = Line.search([('assignment_id', '=', assignment.id)])
+        self.assertEqual(lines.employee_id, self.employees)
+        self.assertEqual(set(lines.mapped('date')), {self.days[0]})
+
+        assignment.employee_ids = [(3, self.employees[0].id)]
+        self.assertFalse(Line._get_employee_shifts(self.employees[0].id, self.days[0]))
+        self.assertEqual(Line._get_employee_shifts(self.employees[1].id, self.days[0]).shift_id, self.shift)
+        counts = Line._get_shift_day_counts(self.employees[:2].ids, self.days[0], self.days[-1])
+        self.assertEqual(counts, {self.employees[0].id: 4.0, self.employees[1].id: 5.0})
+
+        assignment.unlink()
+        self.assertFalse(Line.search([('date', '=', self.days[0]), ('shift_id', '=', self.shift.id)]))
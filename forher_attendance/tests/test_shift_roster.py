@@ -0,0 +1,73 @@
+from datetime import date
+
+from odoo.tests.common import TransactionCase
+
+
+class TestShiftRoster(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        Shift = cls.env['forher.shift']
+        cls.morning = Shift.create({'name': 'Ca sáng', 'code': 'RS', 'start_time': 8.0, 'end_time': 15.0})
+        cls.evening = Shift.create({'name': 'Ca tối', 'code': 'RT', 'start_time': 15.0, 'end_time': 22.0})
+        cls.employees = cls.env['hr.employee'].create([{'name': 'NV xoay ca %s' % i} for i in range(30)])
+        cls.rotation = cls.env['forher.shift.rotation'].create({
+            'name': 'Sáng/Tối',
+            'date_start': date(2025, 3, 1),
+            'skip_weekend': True,
+            'employee_ids': [(6, 0, cls.employees.ids)],
+            'line_ids': [(0, 0, {'sequence': 1, 'shift_id': cls.morning.id}),
+                         (0, 0, {'sequence': 2, 'shift_id': cls.evening.id})],
+        })
+        cls.wizard = cls.env['forher.shift.roster.wizard'].create({
+            'month': date(2025, 3, 1),
+            'company_ids': [(6, 0, cls.env.company.ids)],
+        })
+
+    def _assignments(self):
+        return self.env['forher.shift.assignment'].search([
+            ('shift_id', 'in', (self.morning | self.evening).ids),
+        ])
+
+    def test_preview_writes_nothing(self):
+        self.wizard.action_preview()
+        self.assertEqual(self.wizard.state, 'preview')
+        # Tháng 3/2025 có 21 ngày làm việc (trừ thứ Bảy, Chủ nhật)
+        self.assertEqual(self.wizard.new_count, 21)
+        self.assertEqual(self.wizard.pair_count, 21 * 30)
+        self.assertFalse(self._assignments())
+
+    def test_generate_rotation(self):
+        self.wizard.action_generate()
+        assignments = self._assignments()
+        self.assertEqual(len(assignments), 21)
+        # 03/03 (thứ Hai) cách ngày bắt đầu 2 ngày → ca sáng; 04/03 → ca tối
+        by_date = {a.date: a for a in assignments}
+        self.assertEqual(by_date[date(2025, 3, 3)].shift_id, self.morning)
+        self.assertEqual(by_date[date(2025, 3, 4)].shift_id, self.evening)
+        self.assertNotIn(date(2025, 3, 1), by_date)
+        self.assertEqual(by_date[date(2025, 3, 3)].employee_ids, self.employees)
+        self.assertIn(self.employees[0].name, by_date[date(2025, 3, 3)].grouped_employee_names)
+
+    def test_generate_extends_existing(self):
+        existing = self.env['forher.shift.assignment'].create({
+            'date': date(2025, 3, 3),
+            'shift_id': self.morning.id,
+            'employee_ids': [(6, 0, self.employees[:1].ids)],
+        })
+        self.wizard.action_generate()
+        self.assertEqual(self.wizard.new_count, 20)
+        self.assertEqual(self.wizard.extended_count, 1)
+        self.assertEqual(existing.employee_ids, self.employees)
+        self.assertIn(self.employees[-1].name, existing.grouped_employee_names)
+        lines = self.env['forher.shift.assignment.line'].search([('assignment_id', '=', existing.id)])
+        self.assertEqual(lines.employee_id, self.employees)
+
+        # Chạy lại không tạo thêm gì
+        wizard = self.env['forher.shift.roster.wizard'].create({
+            'month': date(2025, 3, 1),
+            'company_ids': [(6, 0, self.env.company.ids)],
+        })
+        wizard.action_generate()
+        self.assertEqual(wizard.pair_count, 0)
+        self.assertEqual(len(self._assignments()), 21)
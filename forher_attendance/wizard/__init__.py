@@ -0,0 +1,2 @@
+from . import attendance_import_wizard
+from . import shift_roster_wizard
@@ -0,0 +1,91 @@
+import base64
+import csv
+import io
+import logging
+
+from odoo import _, fields, models
+from odoo.exceptions import UserError
+
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+_logger = logging.getLogger(__name__)
+
+
+class AttendanceImportWizard(models.TransientModel):
+    _name = 'forher.attendance.import.wizard'
+    _description = 'Nhập dữ liệu chấm công từ máy chấm công'
+
+    data_file = fields.Binary(string='Tệp CSV/XLSX', required=True)
+    filename = fields.Char(string='Tên tệp')
+    delimiter = fields.Char(string='Ký tự phân tách', default=',')
+    chunk_size = fields.Integer(string='Số dòng mỗi lô', default=500)
+    state = fields.Selection([('upload', 'Tải lên'), ('done', 'Hoàn tất')], default='upload')
+    created_count = fields.Integer(string='Đã nhập', readonly=True)
+    rejected_count = fields.Integer(string='Bị loại', readonly=True)
+    reject_file = fields.Binary(string='Báo cáo dòng bị loại', readonly=True)
+    reject_filename = fields.Char(readonly=True)
+
+    def _iter_csv_rows(self, data):
+        text = io.TextIOWrapper(io.BytesIO(data), encoding='utf-8-sig')
+        delimiter = (self.delimiter or ',').strip() or ','
+        reader = csv.DictReader(text, delimiter=delimiter)
+        if not reader.fieldnames:
+            raise UserError(_('Tệp được cung cấp không có dòng tiêu đề để ánh xạ các trường.'))
+        yield from reader
+
+    def _iter_xlsx_rows(self, data):
+        if openpyxl is None:
+            raise UserError(_('Cần cài thư viện openpyxl để đọc tệp XLSX.'))
+        workbook = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if not header:
+            raise UserError(_('Tệp được cung cấp không có dòng tiêu đề để ánh xạ các trường.'))
+        header = [str(col or '').strip() for col in header]
+        for values in rows:
+            yield dict(zip(header, values))
+
+    def _build_reject_report(self, rejected):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(['line', 'employee_code', 'reason'])
+        writer.writerows(rejected)
+        return base64.b64encode(output.getvalue().encode('utf-8-sig'))
+
+    def action_import(self):
+        self.ensure_one()
+        if not self.data_file:
+            raise UserError(_('Vui lòng tải lên tệp CSV/XLSX để nhập dữ liệu.'))
+
+        data = base64.b64decode(self.data_file)
+        if (self.filename or '').lower().endswith('.xlsx'):
+            rows = self._iter_xlsx_rows(data)
+        else:
+            rows = self._iter_csv_rows(data)
+
+        result = self.env['hr.attendance'].import_punches(rows, chunk_size=max(self.chunk_size, 1))
+        _logger.info('Import chấm công: %s dòng nhập, %s dòng bị loại', result['created'], len(result['rejected']))
+
+        vals = {
+            'state': 'done',
+            'created_count': result['created'],
+            'rejected_count': len(result['rejected']),
+            'reject_file': False,
+            'reject_filename': False,
+        }
+        if result['rejected']:
+            vals.update({
+                'reject_file': self._build_reject_report(result['rejected']),
+                'reject_filename': 'attendance_import_rejects.csv',
+            })
+        self.write(vals)
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
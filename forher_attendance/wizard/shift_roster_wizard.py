@@ -0,0 +1,82 @@
+import logging
+from datetime import timedelta
+
+from dateutil.relativedelta import relativedelta
+
+from odoo import _, fields, models
+from odoo.exceptions import UserError
+from odoo.tools import html_escape
+
+_logger = logging.getLogger(__name__)
+
+
+class ShiftRosterWizard(models.TransientModel):
+    _name = 'forher.shift.roster.wizard'
+    _description = 'Sinh lịch phân ca theo tháng'
+
+    month = fields.Date(string='Tháng', required=True,
+                        default=lambda self: fields.Date.context_today(self).replace(day=1) + relativedelta(months=1))
+    company_ids = fields.Many2many('res.company', string='Chi nhánh',
+                                   help='Để trống = tất cả chi nhánh có mẫu xoay ca')
+    state = fields.Selection([('draft', 'Thiết lập'), ('preview', 'Xem trước'), ('done', 'Hoàn tất')], default='draft')
+    preview_html = fields.Html(string='Xem trước', readonly=True, sanitize=False)
+    new_count = fields.Integer(string='Ca tạo mới', readonly=True)
+    extended_count = fields.Integer(string='Ca bổ sung nhân viên', readonly=True)
+    pair_count = fields.Integer(string='Lượt phân ca', readonly=True)
+
+    def _get_rotations(self):
+        domain = [('line_ids', '!=', False)]
+        if self.company_ids:
+            domain.append(('company_id', 'in', self.company_ids.ids))
+        return self.env['forher.shift.rotation'].search(domain)
+
+    def _get_days(self):
+        first = self.month.replace(day=1)
+        last = first + relativedelta(months=1)
+        return [first + timedelta(days=i) for i in range((last - first).days)]
+
+    def _render_preview(self, stats):
+        companies = self.env['res.company'].browse([company_id for company_id in stats if company_id])
+        rows = ''.join(
+            '<tr><td>%s</td><td>%s</td><td>%s</td><td>%s</td></tr>' % (
+                html_escape(company.name), stats[company.id]['new'],
+                stats[company.id]['extended'], stats[company.id]['pairs'])
+            for company in companies.sorted('name')
+        )
+        return (
+            '<table class="table table-sm"><thead><tr>'
+            '<th>Chi nhánh</th><th>Ca tạo mới</th><th>Ca bổ sung nhân viên</th><th>Lượt phân ca</th>'
+            '</tr></thead><tbody>%s</tbody></table>' % rows
+        )
+
+    def _run(self, dry_run):
+        self.ensure_one()
+        rotations = self._get_rotations()
+        if not rotations:
+            raise UserError(_('Không có mẫu xoay ca nào cho các chi nhánh đã chọn.'))
+
+        plan = rotations._build_roster_plan(self._get_days())
+        stats = self.env['forher.shift.assignment']._bulk_assign(plan, dry_run=dry_run)
+        totals = {key: sum(s[key] for s in stats.values()) for key in ('new', 'extended', 'pairs')}
+        _logger.info('Sinh lịch ca %s (dry_run=%s): %s', self.month, dry_run, totals)
+
+        self.write({
+            'state': 'preview' if dry_run else 'done',
+            'preview_html': self._render_preview(stats),
+            'new_count': totals['new'],
+            'extended_count': totals['extended'],
+            'pair_count': totals['pairs'],
+        })
+        return {
+            'type': 'ir.actions.act_window',
+            'res_model': self._name,
+            'res_id': self.id,
+            'view_mode': 'form',
+            'target': 'new',
+        }
+
+    def action_preview(self):
+        return self._run(dry_run=True)
+
+    def action_generate(self):
+        return self._run(dry_run=False)
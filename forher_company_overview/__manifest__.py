@@ -17,6 +17,7 @@
         'views/company_overview_views.xml',
         'views/branch_views.xml',
         'views/permission_level_views.xml',
+        'views/perf_stat_views.xml',
     ],
     'installable': True,
     'application': True,
@@ -1 +1,2 @@
 from . import company_overview
+from . import perf_profiler
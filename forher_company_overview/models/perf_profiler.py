@@ -0,0 +1,173 @@
+# file: models/perf_profiler.py
+"""Đo số lần gọi, thời gian, số truy vấn SQL và số bản ghi cho các hàm nóng của forher.
+
+Gắn ``@profiled()`` ngay trên hàm (dưới các decorator ``api.*`` / ``http.route``)::
+
+    from odoo.addons.forher_company_overview.models.perf_profiler import profiled
+
+    @api.depends('check_in')
+    @profiled()
+    def _compute_date(self):
+        ...
+
+Bật bằng tham số hệ thống ``forher.perf_profiling`` = 1. Khi tắt, mỗi lần gọi chỉ tốn
+1 phép so sánh thời gian (tham số được đọc lại sau mỗi ``CHECK_INTERVAL`` giây).
+Số liệu nằm trong bộ nhớ từng worker, tách theo database, và được ghi ra log +
+``forher.perf.stat`` của đúng database đó sau mỗi ``DUMP_INTERVAL`` giây hoặc khi bấm
+"Ghi số liệu".
+"""
+import functools
+import logging
+import os
+import threading
+import time
+
+from odoo import SUPERUSER_ID, api, fields, models
+from odoo.http import request
+
+_logger = logging.getLogger(__name__)
+
+PROFILING_PARAM = 'forher.perf_profiling'
+CHECK_INTERVAL = 30
+DUMP_INTERVAL = 300
+
+_lock = threading.Lock()
+# db → {tên → [số lần gọi, tổng giây, tổng truy vấn, tổng bản ghi, giây lớn nhất]}
+_stats = {}
+# db → trạng thái bật/tắt và mốc kiểm tra / ghi số liệu của database đó
+_state = {}
+
+
+def _get_state(dbname):
+    state = _state.get(dbname)
+    if state is None:
+        state = _state.setdefault(dbname, {'enabled': False, 'checked': float('-inf'), 'dumped': time.monotonic()})
+    return state
+
+
+def _is_enabled(env):
+    state = _get_state(env.cr.dbname)
+    now = time.monotonic()
+    if now - state['checked'] > CHECK_INTERVAL:
+        state['checked'] = now
+        value = env['ir.config_parameter'].sudo().get_param(PROFILING_PARAM, '')
+        state['enabled'] = str(value).strip().lower() in ('1', 'true', 'yes')
+    return state['enabled']
+
+
+def _record(dbname, name, elapsed, queries, rows):
+    with _lock:
+        db_stats = _stats.setdefault(dbname, {})
+        stat = db_stats.get(name)
+        if stat is None:
+            stat = db_stats[name] = [0, 0.0, 0, 0, 0.0]
+        stat[0] += 1
+        stat[1] += elapsed
+        stat[2] += queries
+        stat[3] += rows
+        stat[4] = max(stat[4], elapsed)
+
+
+def get_stats(dbname, reset=False):
+    """Bản chụp số liệu của worker hiện tại cho ``dbname``: {tên: (gọi, giây, truy vấn, bản ghi, giây max)}."""
+    with _lock:
+        db_stats = _stats.get(dbname, {})
+        snapshot = {name: tuple(stat) for name, stat in db_stats.items()}
+        if reset:
+            db_stats.clear()
+    return snapshot
+
+
+def _maybe_dump(env):
+    state = _get_state(env.cr.dbname)
+    if time.monotonic() - state['dumped'] < DUMP_INTERVAL:
+        return
+    state['dumped'] = time.monotonic()
+    # Cursor riêng để không phụ thuộc giao dịch của request đang chạy
+    try:
+        with env.registry.cursor() as cr:
+            api.Environment(cr, SUPERUSER_ID, {})['forher.perf.stat']._dump_stats()
+    except Exception:
+        _logger.exception('Không ghi được số liệu profiling')
+
+
+def profiled(name=None):
+    """Decorator đo hàm của model (compute, constraint, cron) hoặc controller."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            env = getattr(self, 'env', None)
+            if env is None and request:
+                env = request.env
+            if env is None or not _is_enabled(env):
+                return func(self, *args, **kwargs)
+
+            cr = env.cr
+            queries = cr.sql_log_count
+            start = time.perf_counter()
+            result = func(self, *args, **kwargs)
+            elapsed = time.perf_counter() - start
+
+            rows = len(self) if isinstance(self, models.BaseModel) else 0
+            if not rows and isinstance(result, models.BaseModel):
+                rows = len(result)
+            _record(
+                cr.dbname,
+                name or '%s.%s' % (getattr(self, '_name', None) or type(self).__name__, func.__name__),
+                elapsed, cr.sql_log_count - queries, rows,
+            )
+            _maybe_dump(env)
+            return result
+        return wrapper
+    return decorator
+
+
+class ForHerPerfStat(models.Model):
+    """Số liệu profiling đã ghi ra từ bộ nhớ các worker."""
+    _name = 'forher.perf.stat'
+    _description = 'Số liệu hiệu năng Forher'
+    _order = 'dump_date desc, total_ms desc'
+
+    name = fields.Char('Hàm', required=True, readonly=True, index=True)
+    pid = fields.Integer('Worker (PID)', readonly=True)
+    dump_date = fields.Datetime('Thời điểm ghi', readonly=True, default=fields.Datetime.now)
+    calls = fields.Integer('Số lần gọi', readonly=True)
+    total_ms = fields.Float('Tổng thời gian (ms)', readonly=True)
+    avg_ms = fields.Float('TB / lần (ms)', readonly=True, aggregator='avg')
+    max_ms = fields.Float('Lâu nhất (ms)', readonly=True, aggregator='max')
+    queries = fields.Integer('Số truy vấn', readonly=True)
+    avg_queries = fields.Float('Truy vấn / lần', readonly=True, aggregator='avg')
+    rows = fields.Integer('Số bản ghi', readonly=True)
+    avg_rows = fields.Float('Bản ghi / lần', readonly=True, aggregator='avg')
+
+    @api.model
+    def _dump_stats(self, reset=True):
+        """Ghi số liệu đang có trong bộ nhớ worker ra log và bảng này."""
+        snapshot = get_stats(self.env.cr.dbname, reset=reset)
+        if not snapshot:
+            return self.browse()
+        pid = os.getpid()
+        vals_list = []
+        for name, (calls, seconds, queries, rows, max_seconds) in sorted(
+                snapshot.items(), key=lambda item: item[1][1], reverse=True):
+            _logger.info('Profiling %s: %s lần, %.1f ms, %s truy vấn, %s bản ghi',
+                         name, calls, seconds * 1000, queries, rows)
+            vals_list.append({
+                'name': name,
+                'pid': pid,
+                'calls': calls,
+                'total_ms': seconds * 1000,
+                'avg_ms': seconds * 1000 / calls,
+                'max_ms': max_seconds * 1000,
+                'queries': queries,
+                'avg_queries': queries / calls,
+                'rows': rows,
+                'avg_rows': rows / calls,
+            })
+        return self.sudo().create(vals_list)
+
+    @api.model
+    def action_dump_now(self):
+        """Ghi ngay số liệu của worker đang xử lý request này."""
+        self._dump_stats()
+        return {'type': 'ir.actions.client', 'tag': 'reload'}
@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
-from odoo import models, fields, api, _
+from odoo import models, fields, api, tools, _
 from odoo.exceptions import ValidationError
+from odoo.addons.forher_company_overview.models.perf_profiler import profiled
 from datetime import date, timedelta
 
 # =========================================================
@@ -34,9 +35,16 @@ class HolidayCalendar(models.Model):
         ("unique_holiday_date", "unique(date)", "Ngày lễ này đã tồn tại rồi!"),
     ]
 
+    @api.model
+    @tools.ormcache()
+    def _get_holiday_dates(self):
+        """Tập ngày lễ dùng chung cho mọi worker, xoá cache khi lịch thay đổi."""
+        return frozenset(self.sudo().search([]).mapped("date"))
+
     @api.model
     def create(self, vals):
         rec = super().create(vals)
+        self.env.registry.clear_cache()
 
         # 1. Tìm hoặc tạo leave type "Public Holiday"
         leave_type = self.env["forher.leave.type"].search([("code", "=", "HOLIDAY")], limit=1)
@@ -61,6 +69,17 @@ class HolidayCalendar(models.Model):
 
         return rec
 
+    def write(self, vals):
+        res = super().write(vals)
+        if "date" in vals:
+            self.env.registry.clear_cache()
+        return res
+
+    def unlink(self):
+        res = super().unlink()
+        self.env.registry.clear_cache()
+        return res
+
 
 
 # =========================================================
@@ -101,6 +120,7 @@ class LeaveRequest(models.Model):
     )
 
     @api.depends("employee_id", "leave_type_id")
+    @profiled()
     def _compute_remaining_days(self):
         for rec in self:
             if rec.employee_id and rec.leave_type_id:
@@ -132,6 +152,7 @@ class LeaveRequest(models.Model):
 
 
     @api.depends("start_date", "end_date")
+    @profiled()
     def _compute_days(self):
         for rec in self:
             if rec.start_date and rec.end_date:
@@ -141,16 +162,38 @@ class LeaveRequest(models.Model):
                 rec.days_count = 0
 
     @api.depends("start_date", "end_date")
+    @profiled()
     def _compute_is_holiday(self):
-        holidays = self.env["forher.holiday.calendar"].search([])
+        holiday_dates = self.env["forher.holiday.calendar"]._get_holiday_dates()
         for rec in self:
             rec.is_holiday_leave = False
             if rec.start_date and rec.end_date:
-                leave_days = [rec.start_date + timedelta(days=i) for i in range((rec.end_date - rec.start_date).days + 1)]
-                holiday_days = holidays.mapped("date")
-                if any(day in holiday_days for day in leave_days):
+                leave_days = (rec.start_date + timedelta(days=i) for i in range((rec.end_date - rec.start_date).days + 1))
+                if any(day in holiday_dates for day in leave_days):
                     rec.is_holiday_leave = True
 
+    @api.model
+    def _get_on_leave_pairs(self, pairs):
+        """Trả về tập (employee_id, ngày) đang nghỉ phép (đã duyệt/chờ duyệt) trong ``pairs``.
+
+        Toàn bộ cặp được so khớp bằng 1 truy vấn join với forher_leave_request.
+        """
+        pairs = {(employee_id, day) for employee_id, day in pairs if employee_id and day}
+        if not pairs:
+            return set()
+        self.flush_model(["employee_id", "state", "start_date", "end_date"])
+        employee_ids, days = zip(*pairs)
+        self.env.cr.execute("""
+            SELECT DISTINCT p.employee_id, p.day
+              FROM unnest(%s::int[], %s::date[]) AS p(employee_id, day)
+              JOIN forher_leave_request l
+                ON l.employee_id = p.employee_id
+               AND l.state IN ('approve', 'confirm')
+               AND l.start_date <= p.day
+               AND l.end_date >= p.day
+        """, (list(employee_ids), list(days)))
+        return set(self.env.cr.fetchall())
+
     # ===============================
     # VALIDATION
     # ===============================
@@ -161,6 +204,7 @@ class LeaveRequest(models.Model):
                 raise ValidationError("Ngày bắt đầu không được lớn hơn ngày kết thúc.")
 
     @api.constrains("days_count", "leave_type_id", "employee_id", "state")
+    @profiled()
     def _check_max_days(self):
         for rec in self:
             if rec.state in ["approve", "confirm"] and rec.leave_type_id.max_days:
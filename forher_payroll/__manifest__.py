@@ -14,6 +14,7 @@
           'security/ir.model.access.csv',
           'data/ir_sequence_data.xml',
           'data/payroll_rules_data.xml',
+          'data/ir_cron_data.xml',
           'views/salary_rule_views.xml',
           'views/payroll_config_views.xml',
           'views/payslip_run_views.xml',
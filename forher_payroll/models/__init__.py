@@ -1,5 +1,6 @@
 from . import forher_salary_rule
 from . import forher_payslip_run
+from . import forher_payslip_run_chunk
 from . import forher_payslip
 from . import sales_data_import
 from . import forher_contract
@@ -1,7 +1,22 @@
+from collections import defaultdict
 from datetime import timedelta
 
 from odoo import Command, _, api, fields, models
 from odoo.exceptions import UserError, ValidationError
+from odoo.addons.forher_company_overview.models.perf_profiler import profiled
+from odoo.addons.forher_payroll.models.forher_salary_rule import ALL_KEYS
+
+# Trường nhập tay trên phiếu → khoá trong localdict mà quy tắc đọc; sửa các trường này
+# trên phiếu đã tính chỉ tính lại các quy tắc bị ảnh hưởng
+INCREMENTAL_INPUT_FIELDS = {
+    'advance_amount': 'advance_amount',
+    'penalty_amount': 'penalty_amount',
+    'abc_rating': 'abc_rating',
+    'leave_days': 'worked_data',
+}
+# Khoá lấy từ số liệu chấm công / doanh số (cần nạp _load_payroll_inputs)
+LOADED_INPUT_KEYS = {'sales_total', 'attendance_hours', 'attendance_records', 'shift_days'}
+LOADED_CONTEXT_NAMES = {'worked_data', 'sales_records'}
 
 
 class ForherPayslipLine(models.Model):
@@ -54,21 +69,21 @@ class ForherPayslip(models.Model):
     total_deduction = fields.Monetary(currency_field='currency_id', compute='_compute_totals', store=True)
     total_net = fields.Monetary(currency_field='currency_id', compute='_compute_totals', store=True)
 
-    sales_total_amount = fields.Monetary(currency_field='currency_id', compute='_compute_sales_metrics', store=True)
-    sales_products_count = fields.Integer(string='Products sold', compute='_compute_sales_metrics', store=True)
+    sales_total_amount = fields.Monetary(currency_field='currency_id', compute='_compute_input_metrics', store=True)
+    sales_products_count = fields.Integer(string='Products sold', compute='_compute_input_metrics', store=True)
 
-    worked_hours_total = fields.Float(string='Worked hours', digits='Payroll', compute='_compute_attendance_metrics', store=True)
-    worked_day_count = fields.Float(string='Worked days', digits='Payroll', compute='_compute_attendance_metrics', store=True)
-    auto_leave_day_count = fields.Float(string='Leave days (auto)', digits='Payroll', compute='_compute_attendance_metrics', store=True)
+    worked_hours_total = fields.Float(string='Worked hours', digits='Payroll', compute='_compute_input_metrics', store=True)
+    worked_day_count = fields.Float(string='Worked days', digits='Payroll', compute='_compute_input_metrics', store=True)
+    auto_leave_day_count = fields.Float(string='Leave days (auto)', digits='Payroll', compute='_compute_input_metrics', store=True)
 
     leave_days = fields.Float(string='Paid leave days', default=0.0, help='Number of paid leave days to include in the payroll computation. Leave 0 to use automatic value.')
     ot_normal_hours = fields.Float(
     string='OT hours (standard)', digits='Payroll',
-    compute='_compute_ot_hours', store=True
+    compute='_compute_input_metrics', store=True
 )
     ot_holiday_hours = fields.Float(
         string='OT hours (holiday)', digits='Payroll',
-        compute='_compute_ot_hours', store=True
+        compute='_compute_input_metrics', store=True
     )
 
     abc_rating = fields.Selection([
@@ -100,66 +115,63 @@ class ForherPayslip(models.Model):
             vals.setdefault('company_id', contract.company_id.id)
             if 'structure_id' not in vals and contract.salary_structure_id:
                 vals['structure_id'] = contract.salary_structure_id.id
-        return super().write(vals)
+        fnames = [fname for fname in INCREMENTAL_INPUT_FIELDS if fname in vals]
+        if not fnames or 'line_ids' in vals or self.env.context.get('forher_payslip_skip_incremental'):
+            return super().write(vals)
+        computed = self.filtered(lambda s: s.state == 'computed' and s.line_ids)
+        old_values = {slip.id: {fname: slip[fname] for fname in fnames} for slip in computed}
+        res = super().write(vals)
+        # Chỉ tính lại từng phần các phiếu có giá trị thực sự đổi, gom theo tập khoá bị đổi
+        by_keys = defaultdict(lambda: self.browse())
+        for slip in computed:
+            changed_keys = frozenset(
+                INCREMENTAL_INPUT_FIELDS[fname] for fname in fnames if slip[fname] != old_values[slip.id][fname])
+            if changed_keys:
+                by_keys[changed_keys] |= slip
+        for changed_keys, slips in by_keys.items():
+            slips._recompute_affected_rules(set(changed_keys))
+        return res
 
     @api.depends('line_ids.amount', 'line_ids.rule_type')
+    @profiled()
     def _compute_totals(self):
+        # Phiếu đã lưu: 1 truy vấn tổng hợp cho cả tập; phiếu đang sửa trên form cộng trong bộ nhớ
+        totals = defaultdict(float)
+        stored = self.filtered('id')
+        if stored:
+            for slip, rule_type, amount in self.env['forher.payslip.line']._read_group(
+                    [('payslip_id', 'in', stored.ids)], ['payslip_id', 'rule_type'], ['amount:sum']):
+                totals[slip.id, rule_type == 'deduction'] += amount
+        for slip in self - stored:
+            for line in slip.line_ids:
+                totals[slip.id, line.rule_type == 'deduction'] += line.amount
         for slip in self:
-            gross = sum(line.amount for line in slip.line_ids if line.rule_type != 'deduction')
-            deduction = sum(line.amount for line in slip.line_ids if line.rule_type == 'deduction')
+            gross = totals[slip.id, False]
+            deduction = totals[slip.id, True]
             slip.total_gross = gross
             slip.total_deduction = deduction
             slip.total_net = gross - deduction
 
     @api.depends('run_id', 'employee_id', 'date_from', 'date_to', 'company_id')
-    def _compute_sales_metrics(self):
+    @profiled()
+    def _compute_input_metrics(self):
+        # Doanh số, chấm công và OT cùng 1 lần nạp số liệu
+        inputs = self._load_payroll_inputs()
         for slip in self:
-            sales_records = slip._get_sales_records()
-            slip.sales_total_amount = sum(sales_records.mapped('amount'))
-            slip.sales_products_count = sum(sales_records.mapped('products_sold'))
-
-    @api.depends('employee_id', 'date_from', 'date_to')
-    def _compute_attendance_metrics(self):
-        for slip in self:
-            if not slip.employee_id or not slip.date_from or not slip.date_to:
-                slip.worked_hours_total = 0.0
-                slip.worked_day_count = 0.0
-                slip.auto_leave_day_count = 0.0
-                slip.leave_days = 4
-                continue
-
-            Attendance = self.env['hr.attendance'].sudo()
-            attendances = Attendance.search([
-                ('employee_id', '=', slip.employee_id.id),
-                ('check_in', '>=', slip.date_from),
-                ('check_in', '<=', slip.date_to),
-            ])
-
-            # Tổng giờ làm từ quantity
-            total_hours = 0.0
-            for rec in attendances:
-                qty = rec.quantity or 0.0
-                unit = getattr(rec, 'attendance_type', 'hour')
-                if unit == 'hour':
-                    total_hours += qty
-                elif unit in ('day', 'task'):
-                    total_hours += qty * 8  # giả định 1 ngày/1 công = 8 giờ
-
+            data = inputs[slip.id]
+            slip.sales_total_amount = data['sales_total']
+            slip.sales_products_count = data['products_sold']
+            # Tổng giờ làm từ quantity (đơn vị giờ), gồm cả chấm công đã lưu trữ
+            slip.worked_hours_total = data['attendance_quantity']
             # Số ngày làm việc thực tế dựa trên check-in
-            attendance_days = {fields.Datetime.to_datetime(rec.check_in).date() for rec in attendances if rec.check_in}
-            total_days = len(attendance_days)
-
+            slip.worked_day_count = data['total_days']
             # Ngày nghỉ tự động
-            auto_leave = slip._get_attendance_summary().get('leave_days', 0.0)
-
-            # Ngày nghỉ hợp lệ tính lương (tối đa 4 ngày)
-            leave_valid = min(auto_leave, 4)
-
-            # Gán vào payslip
-            slip.worked_hours_total = total_hours
-            slip.worked_day_count = total_days
-            slip.auto_leave_day_count = auto_leave
-            slip.leave_days = 4
+            slip.auto_leave_day_count = data['leave_days']
+            slip.ot_normal_hours = data['ot_normal_hours']
+            slip.ot_holiday_hours = data['ot_holiday_hours']
+        # leave_days không phải trường tính toán: chỉ ghi khi đổi và không kích hoạt tính lại
+        # từng phần (đổi kỳ/nhân viên cần tính lại cả phiếu, không chỉ các quy tắc đọc worked_data)
+        self.filtered(lambda s: s.leave_days != 4).with_context(forher_payslip_skip_incremental=True).leave_days = 4
 
     @api.onchange('contract_id')
     def _onchange_contract_id(self):
@@ -187,63 +199,138 @@ class ForherPayslip(models.Model):
                         slip.company_id = contract.company_id
 
     def action_compute_sheet(self):
-        for slip in self:
-            slip._compute_lines()
+        self._compute_lines(self._load_payroll_inputs())
         return True
 
-    def _compute_lines(self):
+    @profiled()
+    def _compute_lines(self, inputs=None):
+        """Tính dòng lương cho cả tập phiếu (1 lô của kỳ lương) và ghi hàng loạt.
+
+        Dòng của mọi phiếu được dựng trong bộ nhớ; dòng cũ xoá bằng 1 lệnh unlink, dòng mới
+        tạo bằng 1 lệnh create nhiều bản ghi, tổng tiền tính lại bằng 1 truy vấn tổng hợp.
+        """
+        missing = self.filtered(lambda s: not s.structure_id and not s.contract_id.salary_structure_id)
+        if missing:
+            raise ValidationError(
+                _('Salary structure is missing for %(employee)s. Assign a structure on the contract.', employee=missing[0].employee_id.display_name)
+            )
+        for structure, slips in self.filtered(lambda s: not s.structure_id).grouped(
+                lambda s: s.contract_id.salary_structure_id).items():
+            slips.structure_id = structure
+
+        # Số liệu đầu vào nạp 1 lần cho cả tập phiếu
+        if inputs is None:
+            inputs = self._load_payroll_inputs()
+        rules_by_structure = {structure: structure.rule_ids.sorted('sequence') for structure in self.structure_id}
+        vals_list = []
         for slip in self:
-            structure = slip.structure_id or slip.contract_id.salary_structure_id
-            if not structure:
-                raise ValidationError(
-                    _('Salary structure is missing for %(employee)s. Assign a structure on the contract.', employee=slip.employee_id.display_name)
-                )
-            slip.structure_id = structure
-
-            localdict = slip._prepare_localdict()
-            categories = localdict['categories']
-            rules_buckets = localdict['rules']
-            commands = [Command.clear()]
-
-            for rule in structure.rule_ids.sorted('sequence'):
-                localdict.update({'quantity': 1.0, 'rate': 100.0})
-                amount, quantity, rate, skip_line = rule._compute_rule_amount(localdict)
-                if skip_line:
-                    rules_buckets[rule.code] = 0.0
-                    localdict[rule.code] = 0.0
-                    continue
+            localdict = slip._prepare_localdict(inputs[slip.id])
+            for rule in rules_by_structure[slip.structure_id]:
+                line_vals = slip._evaluate_rule(rule, localdict)
+                if line_vals:
+                    line_vals['payslip_id'] = slip.id
+                    vals_list.append(line_vals)
+
+        self.line_ids.unlink()
+        self.env['forher.payslip.line'].create(vals_list)
+        self.filtered(lambda s: s.state == 'draft').state = 'computed'
+
+    def _evaluate_rule(self, rule, localdict):
+        """Tính 1 quy tắc, ghi giá trị vào rules/categories của localdict.
+
+        Trả về giá trị dòng lương, hoặc False nếu quy tắc không tạo dòng.
+        """
+        localdict.update({'quantity': 1.0, 'rate': 100.0})
+        amount, quantity, rate, skip_line = rule._compute_rule_amount(localdict)
+        if skip_line:
+            self._set_rule_value(localdict, rule, 0.0)
+            return False
+
+        amount = amount or 0.0
+        if rule.rule_type == 'deduction':
+            stored_amount = abs(amount)
+            signed_amount = -stored_amount
+        else:
+            stored_amount = amount
+            signed_amount = stored_amount
 
-                amount = amount or 0.0
-                if rule.rule_type == 'deduction':
-                    stored_amount = abs(amount)
-                    signed_amount = -stored_amount
-                else:
-                    stored_amount = amount
-                    signed_amount = stored_amount
+        if not stored_amount and not rule.always_include:
+            self._set_rule_value(localdict, rule, signed_amount)
+            return False
 
-                if not stored_amount and not rule.always_include:
-                    rules_buckets[rule.code] = signed_amount
-                    localdict[rule.code] = signed_amount
-                    continue
+        self._set_rule_value(localdict, rule, signed_amount, in_category=True)
+        return {
+            'name': rule.name,
+            'code': rule.code,
+            'rule_id': rule.id,
+            'sequence': rule.sequence,
+            'rule_type': rule.rule_type,
+            'quantity': quantity,
+            'rate': rate,
+            'amount': stored_amount,
+        }
 
-                commands.append(Command.create({
-                    'name': rule.name,
-                    'code': rule.code,
-                    'rule_id': rule.id,
-                    'sequence': rule.sequence,
-                    'rule_type': rule.rule_type,
-                    'quantity': quantity,
-                    'rate': rate,
-                    'amount': stored_amount,
-                }))
-
-                rules_buckets[rule.code] = signed_amount
-                localdict[rule.code] = signed_amount
-                categories[rule.rule_type] = categories.get(rule.rule_type, 0.0) + signed_amount
-
-            slip.line_ids = commands
-            if slip.state == 'draft':
-                slip.state = 'computed'
+    @staticmethod
+    def _set_rule_value(localdict, rule, signed_amount, in_category=False):
+        localdict['rules'][rule.code] = signed_amount
+        localdict[rule.code] = signed_amount
+        if in_category:
+            categories = localdict['categories']
+            categories[rule.rule_type] = categories.get(rule.rule_type, 0.0) + signed_amount
+
+    @profiled()
+    def _recompute_affected_rules(self, changed_keys):
+        """Tính lại chỉ các quy tắc phụ thuộc (trực tiếp hoặc bắc cầu) vào ``changed_keys``.
+
+        Quy tắc không bị ảnh hưởng lấy lại giá trị từ dòng lương hiện có; chỉ các dòng
+        có giá trị thay đổi được cập nhật / thêm / xoá.
+        """
+        affected_by_structure = {}
+        for structure in self.structure_id:
+            affected = set()
+            needs_inputs = False
+            for node in structure._get_rule_graph():
+                if (node['inputs'] & changed_keys or ALL_KEYS in node['inputs']
+                        or node['context'] & changed_keys or 'payslip' in node['context']
+                        or node['depends'] & affected):
+                    affected.add(node['rule'].id)
+                    needs_inputs |= bool(
+                        node['context'] & LOADED_CONTEXT_NAMES
+                        or node['inputs'] & (LOADED_INPUT_KEYS | {ALL_KEYS})
+                    )
+            affected_by_structure[structure] = (affected, needs_inputs)
+
+        load_slips = self.filtered(lambda s: affected_by_structure[s.structure_id][1])
+        inputs = load_slips._load_payroll_inputs()
+        for slip in self:
+            affected = affected_by_structure[slip.structure_id][0]
+            if not affected:
+                continue
+            localdict = slip._prepare_localdict(inputs.get(slip.id) or slip._empty_payroll_inputs())
+            lines_by_rule = {line.rule_id.id: line for line in slip.line_ids if line.rule_id}
+            commands = []
+            for rule in slip.structure_id.rule_ids.sorted('sequence'):
+                line = lines_by_rule.get(rule.id)
+                if rule.id not in affected:
+                    signed_amount = (-line.amount if line.rule_type == 'deduction' else line.amount) if line else 0.0
+                    slip._set_rule_value(localdict, rule, signed_amount, in_category=bool(line))
+                    continue
+                line_vals = slip._evaluate_rule(rule, localdict)
+                if not line_vals:
+                    if line:
+                        commands.append(Command.unlink(line.id))
+                elif not line:
+                    commands.append(Command.create(line_vals))
+                else:
+                    changes = {
+                        name: value for name, value in line_vals.items()
+                        if name != 'rule_id' and line[name] != value
+                    }
+                    if changes:
+                        commands.append(Command.update(line.id, changes))
+            if commands:
+                slip.line_ids = commands
+        return True
 
     def action_confirm(self):
         for slip in self:
@@ -267,15 +354,15 @@ class ForherPayslip(models.Model):
         return True
 
     def action_reset_to_draft(self):
-        for slip in self:
-            slip.line_ids = [Command.clear()]
-            slip.state = 'draft'
+        self.line_ids.unlink()
+        self.state = 'draft'
         return True
 
-    def _prepare_localdict(self):
+    def _prepare_localdict(self, worked_data=None):
         self.ensure_one()
-        worked_data = self._get_attendance_summary()
-        sales_records = self._get_sales_records()
+        if worked_data is None:
+            worked_data = self._get_attendance_summary()
+        sales_records = worked_data['sales_records']
         rules_bucket = {}
         categories = {}
 
@@ -297,13 +384,15 @@ class ForherPayslip(models.Model):
                 'total_hours': worked_data.get('total_hours', 0.0),
                 'total_days': total_days,
                 'leave_days': applied_leave,
+                'shift_days': worked_data.get('shift_days', 0.0),
             },
             'sales_records': sales_records,
             'inputs': {
-                'sales_total': sum(sales_records.mapped('amount')),
+                'sales_total': worked_data.get('sales_total', 0.0),
                 'products_sold': self.sales_products_count,
                 'attendance_hours': worked_data.get('total_hours', 0.0),
                 'attendance_records': worked_data.get('records'),
+                'shift_days': worked_data.get('shift_days', 0.0),
                 'ot_normal_hours': self.ot_normal_hours,
                 'ot_holiday_hours': self.ot_holiday_hours,
                 'advance_amount': self.advance_amount,
@@ -330,96 +419,123 @@ class ForherPayslip(models.Model):
 
     def _get_attendance_summary(self):
         self.ensure_one()
-        
-        # Nếu chưa chọn nhân viên hoặc chưa có ngày từ/đến thì trả về mặc định
-        if not self.employee_id or not self.date_from or not self.date_to:
-            return {
-                'records': self.env['hr.attendance'],
-                'total_hours': 0.0,
-                'total_days': 0.0,
-                'leave_days': 0.0,
-                'ot_normal_hours': 0.0,
-                'ot_holiday_hours': 0.0,
-            }
-
-        # Chuyển ngày sang datetime để so sánh
-        start_dt = fields.Datetime.to_datetime(fields.Date.to_string(self.date_from))
-        end_dt = fields.Datetime.to_datetime(fields.Date.to_string(self.date_to)) + timedelta(days=1)
-
-        # --- Lấy dữ liệu chấm công ---
-        Attendance = self.env['hr.attendance'].sudo()
-        attendances = Attendance.search([
-            ('employee_id', '=', self.employee_id.id),
-            ('check_in', '>=', start_dt),
-            ('check_in', '<', end_dt),
-        ])
-
-        # Tổng giờ làm việc
-        total_hours = sum(attendances.mapped('worked_hours'))
+        return self._load_payroll_inputs()[self.id]
 
-        # Số ngày có chấm công
-        attendance_days = {
-            fields.Datetime.to_datetime(rec.check_in).date()
-            for rec in attendances if rec.check_in
-        }
-
-        # --- Giờ OT ---
-        ot_normal = sum(attendances.mapped('ot_hours_normal'))
-        ot_holiday = sum(attendances.mapped('ot_hours_holiday'))
-
-        # --- Tính ngày nghỉ phép ---
-        leave_days = 0.0
-        Leave = self.env['forher.leave.request'].sudo()
-        leaves = Leave.search([
-            ('employee_id', '=', self.employee_id.id),
-            ('state', 'in', ['approve', 'confirm']),
-            ('start_date', '<=', self.date_to),
-            ('end_date', '>=', self.date_from),
-        ])
-        for leave in leaves:
-            start = max(leave.start_date, self.date_from)
-            end = min(leave.end_date, self.date_to)
-            leave_days += max((end - start).days + 1, 0)
-
-        # --- Tính ngày nghỉ lễ (HOLIDAY) ---
-        holiday_leaves = Leave.search([
-            ('leave_type_id.code', '=', 'HOLIDAY'),
-            ('start_date', '<=', self.date_to),
-            ('end_date', '>=', self.date_from),
-        ])
-        for holiday in holiday_leaves:
-            start = max(holiday.start_date, self.date_from)
-            end = min(holiday.end_date, self.date_to)
-            leave_days += max((end - start).days + 1, 0)
-
-        # Trả về kết quả
+    def _empty_payroll_inputs(self):
         return {
-            'records': attendances,
-            'total_hours': total_hours,
-            'total_days': float(len(attendance_days)),
-            'leave_days': leave_days,
-            'ot_normal_hours': ot_normal,
-            'ot_holiday_hours': ot_holiday,
+            'records': self.env['hr.attendance'],
+            'total_hours': 0.0,
+            'attendance_quantity': 0.0,
+            'total_days': 0.0,
+            'leave_days': 0.0,
+            'ot_normal_hours': 0.0,
+            'ot_holiday_hours': 0.0,
+            'shift_days': 0.0,
+            'sales_records': self.env['forher.payroll.sales.data'],
+            'sales_total': 0.0,
+            'products_sold': 0,
         }
 
+    def _load_payroll_inputs(self):
+        """Số liệu đầu vào của cả tập phiếu lương: {payslip id: dict}.
 
-    def _get_sales_records(self):
-        self.ensure_one()
-        SalesData = self.env['forher.payroll.sales.data']
-        domain = [('employee_id', '=', self.employee_id.id)]
-        if self.run_id:
-            domain.append(('run_id', '=', self.run_id.id))
-        else:
-            if self.date_from:
-                domain.append(('date', '>=', self.date_from))
-            if self.date_to:
-                domain.append(('date', '<=', self.date_to))
-        return SalesData.search(domain)
-    
-    @api.depends('employee_id', 'date_from', 'date_to')
-    def _compute_ot_hours(self):
+        Phiếu được gom theo (kỳ lương, từ ngày, đến ngày); mỗi nhóm nạp chấm công (kể cả
+        phần đã lưu trữ), OT, nghỉ phép, ngày lễ, phân ca và doanh số của mọi nhân viên
+        bằng vài truy vấn GROUP BY thay vì tìm kiếm riêng cho từng phiếu.
+        """
+        result = {slip.id: self._empty_payroll_inputs() for slip in self}
+        groups = defaultdict(lambda: self.browse())
         for slip in self:
-            summary = slip._get_attendance_summary()
-            slip.ot_normal_hours = summary.get('ot_normal_hours', 0.0)
-            slip.ot_holiday_hours = summary.get('ot_holiday_hours', 0.0)
+            if slip.employee_id and slip.date_from and slip.date_to:
+                groups[(slip.run_id.id, slip.date_from, slip.date_to)] |= slip
+        for (run_id, date_from, date_to), slips in groups.items():
+            by_employee = self._query_payroll_inputs(run_id, date_from, date_to, list(set(slips.employee_id.ids)))
+            for slip in slips:
+                result[slip.id] = by_employee[slip.employee_id.id]
+        return result
+
+    def _query_payroll_inputs(self, run_id, date_from, date_to, employee_ids):
+        cr = self.env.cr
+        data = defaultdict(self._empty_payroll_inputs)
+        start_dt = fields.Datetime.to_datetime(fields.Date.to_string(date_from))
+        end_dt = fields.Datetime.to_datetime(fields.Date.to_string(date_to)) + timedelta(days=1)
+
+        # --- Chấm công: giờ làm, số lượng, OT, số ngày (nóng + lưu trữ) ---
+        Attendance = self.env['hr.attendance'].sudo()
+        Attendance.flush_model(['employee_id', 'check_in', 'worked_hours', 'quantity', 'ot_hours_normal', 'ot_hours_holiday'])
+        cr.execute("""
+            SELECT a.employee_id,
+                   SUM(COALESCE(a.worked_hours, 0)),
+                   SUM(COALESCE(a.quantity, 0)),
+                   SUM(COALESCE(a.ot_hours_normal, 0)),
+                   SUM(COALESCE(a.ot_hours_holiday, 0)),
+                   COUNT(DISTINCT a.check_in::date)
+              FROM %s a
+             WHERE a.employee_id = ANY(%%s)
+               AND a.check_in >= %%s AND a.check_in < %%s
+          GROUP BY a.employee_id
+        """ % self.env['forher.attendance.archive']._get_union_query(), (employee_ids, start_dt, end_dt))
+        for employee_id, hours, quantity, ot_normal, ot_holiday, days in cr.fetchall():
+            data[employee_id].update({
+                'total_hours': hours,
+                'attendance_quantity': quantity,
+                'ot_normal_hours': ot_normal,
+                'ot_holiday_hours': ot_holiday,
+                'total_days': float(days),
+            })
+        attendances = Attendance.search([
+            ('employee_id', 'in', employee_ids),
+            ('check_in', '>=', start_dt),
+            ('check_in', '<', end_dt),
+        ])
+        for employee, records in attendances.grouped('employee_id').items():
+            data[employee.id]['records'] = records
+
+        # --- Ngày nghỉ phép của nhân viên + ngày nghỉ lễ (chung cho mọi nhân viên) ---
+        self.env['forher.leave.request'].flush_model(['employee_id', 'leave_type_id', 'start_date', 'end_date', 'state'])
+        self.env['forher.leave.type'].flush_model(['code'])
+        period = {'employees': employee_ids, 'from': date_from, 'to': date_to}
+        cr.execute("""
+            SELECT l.employee_id,
+                   SUM(GREATEST(LEAST(l.end_date, %(to)s) - GREATEST(l.start_date, %(from)s) + 1, 0))
+              FROM forher_leave_request l
+             WHERE l.employee_id = ANY(%(employees)s)
+               AND l.state IN ('approve', 'confirm')
+               AND l.start_date <= %(to)s AND l.end_date >= %(from)s
+          GROUP BY l.employee_id
+        """, period)
+        leave_days = dict(cr.fetchall())
+        cr.execute("""
+            SELECT COALESCE(SUM(GREATEST(LEAST(l.end_date, %(to)s) - GREATEST(l.start_date, %(from)s) + 1, 0)), 0)
+              FROM forher_leave_request l
+              JOIN forher_leave_type t ON t.id = l.leave_type_id
+             WHERE t.code = 'HOLIDAY'
+               AND l.start_date <= %(to)s AND l.end_date >= %(from)s
+        """, period)
+        holiday_days = cr.fetchone()[0]
+
+        # --- Số ngày có phân ca ---
+        shift_days = self.env['forher.shift.assignment.line'].sudo()._get_shift_day_counts(
+            employee_ids, date_from, date_to)
+
+        # --- Doanh số: theo kỳ lương nếu có, ngược lại theo khoảng ngày ---
+        sales_domain = [('employee_id', 'in', employee_ids)]
+        if run_id:
+            sales_domain.append(('run_id', '=', run_id))
+        else:
+            sales_domain += [('date', '>=', date_from), ('date', '<=', date_to)]
+        sales = self.env['forher.payroll.sales.data'].search(sales_domain)
+        for employee, records in sales.grouped('employee_id').items():
+            data[employee.id].update({
+                'sales_records': records,
+                'sales_total': sum(records.mapped('amount')),
+                'products_sold': sum(records.mapped('products_sold')),
+            })
+
+        for employee_id in employee_ids:
+            data[employee_id].update({
+                'leave_days': float(leave_days.get(employee_id, 0) + holiday_days),
+                'shift_days': float(shift_days.get(employee_id, 0)),
+            })
+        return data
 
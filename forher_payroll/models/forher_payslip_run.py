@@ -1,3 +1,5 @@
+import psycopg2
+
 from odoo import _, api, fields, models
 from odoo.exceptions import UserError, ValidationError
 
@@ -24,6 +26,16 @@ class ForherPayslipRun(models.Model):
     company_id = fields.Many2one('res.company', required=True, default=lambda self: self.env.company)
     sales_data_ids = fields.One2many('forher.payroll.sales.data', 'run_id', string='Dữ liệu doanh số')
 
+    # Kỳ lương nhiều hơn COMPUTE_CHUNK_SIZE phiếu được chia lô và tính nền
+    COMPUTE_CHUNK_SIZE = 100
+
+    chunk_ids = fields.One2many('forher.payslip.run.chunk', 'run_id', string='Lô tính lương', readonly=True)
+    chunk_total = fields.Integer('Số lô', compute='_compute_chunk_progress')
+    chunk_done = fields.Integer('Lô đã tính', compute='_compute_chunk_progress')
+    chunk_failed = fields.Integer('Lô lỗi', compute='_compute_chunk_progress')
+    compute_running = fields.Boolean('Đang tính nền', compute='_compute_chunk_progress')
+    compute_progress = fields.Float('Tiến độ tính (%)', compute='_compute_chunk_progress')
+
     _sql_constraints = [
         ('check_dates', 'CHECK(date_start <= date_end)', 'The start date must be before the end date.'),
     ]
@@ -60,6 +72,22 @@ class ForherPayslipRun(models.Model):
         for run in self:
             run.payslip_count = len(run.payslip_ids)
 
+    @api.depends('chunk_ids.state', 'chunk_ids.slip_count')
+    def _compute_chunk_progress(self):
+        stats = {run.id: {} for run in self}
+        for run, state, count, slips in self.env['forher.payslip.run.chunk']._read_group(
+                [('run_id', 'in', self.ids)], ['run_id', 'state'], ['__count', 'slip_count:sum']):
+            stats[run.id][state] = (count, slips)
+        for run in self:
+            by_state = stats.get(run.id, {})
+            total = sum(count for count, _slips in by_state.values())
+            total_slips = sum(slips for _count, slips in by_state.values())
+            run.chunk_total = total
+            run.chunk_done = by_state.get('done', (0, 0))[0]
+            run.chunk_failed = by_state.get('failed', (0, 0))[0]
+            run.compute_running = bool(by_state.get('pending'))
+            run.compute_progress = 100.0 * by_state.get('done', (0, 0))[1] / total_slips if total_slips else 0.0
+
     @api.constrains('date_start', 'date_end')
     def _check_dates(self):
         for run in self:
@@ -134,13 +162,49 @@ class ForherPayslipRun(models.Model):
 
 
     def action_compute(self):
+        # Lô chỉ do hệ thống quản lý, người dùng chỉ có quyền đọc
+        Chunk = self.env['forher.payslip.run.chunk'].sudo()
+        chunked = False
         for run in self:
             if not run.payslip_ids:
                 raise UserError(_('Không có phiếu lương để tính. Hãy tạo phiếu lương trước.'))
-            run.payslip_ids.action_compute_sheet()
-            run.state = 'computed'
+            run._check_not_computing()
+            if len(run.payslip_ids) <= self.COMPUTE_CHUNK_SIZE:
+                run.payslip_ids.action_compute_sheet()
+                run.state = 'computed'
+                continue
+
+            # Kỳ lương lớn: chia lô, các cron làn tính song song, mỗi lô 1 giao dịch
+            run.chunk_ids.sudo().unlink()
+            Chunk.create(Chunk._prepare_chunks(run, run.payslip_ids.sorted('id'), self.COMPUTE_CHUNK_SIZE))
+            chunked = True
+        if chunked:
+            Chunk._trigger_lanes()
         return True
 
+    def action_resume_compute(self):
+        """Chỉ tính lại các lô bị lỗi."""
+        failed = self.chunk_ids.filtered(lambda c: c.state == 'failed')
+        if not failed:
+            raise UserError(_('Không có lô lỗi để tính lại.'))
+        failed.sudo().write({'state': 'pending', 'message': False})
+        self.env['forher.payslip.run.chunk']._trigger_lanes()
+        return True
+
+    def _finish_chunked_compute(self):
+        """Chuyển kỳ lương sang 'Đã tính' khi mọi lô đã tính xong."""
+        self.env['forher.payslip.run.chunk'].invalidate_model()
+        self.invalidate_recordset()
+        for run in self.filtered(lambda r: r.state == 'generated' and r.chunk_ids):
+            if any(chunk.state != 'done' for chunk in run.chunk_ids):
+                continue
+            try:
+                with self.env.cr.savepoint():
+                    run.state = 'computed'
+            except psycopg2.errors.SerializationFailure:
+                # Làn khác vừa cập nhật kỳ lương này
+                continue
+
     def action_validate(self):
         for run in self:
             if not run.payslip_ids:
@@ -157,14 +221,22 @@ class ForherPayslipRun(models.Model):
             run.state = 'done'
         return True
 
+    def _check_not_computing(self):
+        for run in self:
+            if run.compute_running:
+                raise UserError(_('Kỳ lương %s đang được tính nền, vui lòng chờ.') % run.name)
+
     def action_cancel(self):
+        self._check_not_computing()
         for run in self:
             run.payslip_ids.action_cancel()
             run.state = 'cancelled'
         return True
 
     def action_reset_to_draft(self):
+        self._check_not_computing()
         for run in self:
+            run.chunk_ids.sudo().unlink()
             run.payslip_ids.action_reset_to_draft()
             run.state = 'draft'
         return True
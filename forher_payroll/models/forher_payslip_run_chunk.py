@@ -0,0 +1,117 @@
+import json
+import logging
+import threading
+
+from odoo import api, fields, models
+from odoo.addons.forher_company_overview.models.perf_profiler import profiled
+
+_logger = logging.getLogger(__name__)
+
+
+class ForherPayslipRunChunk(models.Model):
+    """Lô phiếu lương của 1 kỳ lương được tính nền.
+
+    Mỗi lô được 1 cron "làn" nhận bằng ``FOR UPDATE SKIP LOCKED`` và tính trong giao dịch
+    riêng, nên nhiều worker cron tính song song các lô khác nhau; lô lỗi chỉ rollback
+    chính nó và có thể tính lại riêng.
+    """
+    _name = 'forher.payslip.run.chunk'
+    _description = 'Lô tính phiếu lương'
+    _order = 'run_id, sequence'
+
+    # Các cron cùng xử lý hàng đợi lô (mỗi cron chạy trên 1 worker)
+    LANE_CRONS = (
+        'forher_payroll.forher_payslip_run_compute_cron_1',
+        'forher_payroll.forher_payslip_run_compute_cron_2',
+        'forher_payroll.forher_payslip_run_compute_cron_3',
+    )
+    # Số lô tối đa 1 làn xử lý trong 1 lần chạy (cron tự chạy tiếp nếu còn)
+    CHUNKS_PER_RUN = 20
+
+    run_id = fields.Many2one('forher.payslip.run', string='Kỳ lương', required=True, index=True, ondelete='cascade')
+    sequence = fields.Integer('Thứ tự', default=1)
+    slip_ids = fields.Text('Phiếu lương', readonly=True, help='Danh sách id forher.payslip (JSON)')
+    slip_count = fields.Integer('Số phiếu', readonly=True)
+    state = fields.Selection([
+        ('pending', 'Chờ tính'),
+        ('done', 'Đã tính'),
+        ('failed', 'Lỗi'),
+    ], string='Trạng thái', default='pending', required=True, readonly=True, index=True)
+    attempt_count = fields.Integer('Số lần chạy', readonly=True)
+    message = fields.Char('Thông báo', readonly=True)
+    date_done = fields.Datetime('Hoàn tất lúc', readonly=True)
+
+    @api.model
+    def _trigger_lanes(self):
+        for xmlid in self.LANE_CRONS:
+            cron = self.env.ref(xmlid, raise_if_not_found=False)
+            if cron:
+                cron._trigger()
+
+    @api.model
+    def _claim_next(self):
+        """Khoá 1 lô đang chờ mà làn khác chưa giữ; khoá nhả khi giao dịch kết thúc."""
+        self.flush_model(['state', 'run_id', 'sequence'])
+        self.env.cr.execute("""
+            SELECT id FROM %s
+             WHERE state = 'pending'
+          ORDER BY run_id, sequence
+             LIMIT 1
+               FOR UPDATE SKIP LOCKED
+        """ % self._table)
+        row = self.env.cr.fetchone()
+        return self.browse(row[0]) if row else self.browse()
+
+    def _process(self):
+        """Tính các phiếu của lô; lỗi chỉ rollback lô này và được ghi lại trên lô."""
+        self.ensure_one()
+        slips = self.env['forher.payslip'].browse(json.loads(self.slip_ids or '[]')).exists()
+        try:
+            with self.env.cr.savepoint():
+                slips.action_compute_sheet()
+        except Exception as e:
+            _logger.exception('Lô %s của kỳ lương %s tính lỗi', self.sequence, self.run_id.name)
+            self.write({'state': 'failed', 'message': str(e), 'attempt_count': self.attempt_count + 1})
+            return False
+        self.write({
+            'state': 'done',
+            'message': False,
+            'attempt_count': self.attempt_count + 1,
+            'date_done': fields.Datetime.now(),
+        })
+        return True
+
+    @api.model
+    @profiled()
+    def _cron_compute_chunks(self):
+        auto_commit = not getattr(threading.current_thread(), 'testing', False)
+        runs = self.env['forher.payslip.run']
+        processed = 0
+        while processed < self.CHUNKS_PER_RUN:
+            chunk = self._claim_next()
+            if not chunk:
+                break
+            chunk._process()
+            runs |= chunk.run_id
+            processed += 1
+            if auto_commit:
+                self.env.cr.commit()
+
+        # Giao dịch mới sau commit thấy kết quả của các làn khác
+        runs._finish_chunked_compute()
+        if auto_commit:
+            self.env.cr.commit()
+
+        remaining = self.search_count([('state', '=', 'pending')])
+        self.env['ir.cron']._notify_progress(done=processed, remaining=remaining)
+        _logger.info('Tính phiếu lương nền: %s lô, còn %s lô chờ', processed, remaining)
+
+    @api.model
+    def _prepare_chunks(self, run, slips, chunk_size):
+        ids = slips.ids
+        return [{
+            'run_id': run.id,
+            'sequence': index + 1,
+            'slip_ids': json.dumps(ids[start:start + chunk_size]),
+            'slip_count': len(ids[start:start + chunk_size]),
+        } for index, start in enumerate(range(0, len(ids), chunk_size))]
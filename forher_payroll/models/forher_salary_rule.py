@@ -1,6 +1,18 @@
+import ast
+
 from odoo import _, api, fields, models
-from odoo.exceptions import UserError
-from odoo.tools.safe_eval import safe_eval
+from odoo.exceptions import UserError, ValidationError
+from odoo.tools.lru import LRU
+from odoo.tools.safe_eval import _BUILTINS, _SAFE_OPCODES, check_values, test_expr, unsafe_eval
+
+# Các biến trong localdict của phiếu lương mà quy tắc có thể đọc ngoài rules/categories/inputs
+CONTEXT_NAMES = ('worked_data', 'sales_records', 'payslip', 'employee', 'contract', 'env')
+# Ký hiệu "đọc cả từ điển" khi không xác định được khoá
+ALL_KEYS = '*'
+
+# Mã Python đã kiểm tra an toàn + biên dịch: (db, rule id) → (mã nguồn, code object);
+# chỉ dùng lại khi mã nguồn khớp amount_python_compute hiện tại
+_rule_code_cache = LRU(1024)
 
 
 class ForherSalaryStructure(models.Model):
@@ -14,6 +26,75 @@ class ForherSalaryStructure(models.Model):
     active = fields.Boolean(default=True)
     note = fields.Text()
 
+    def _get_rule_graph(self):
+        """Đồ thị phụ thuộc giữa các quy tắc của cấu trúc, theo thứ tự tính.
+
+        Trả về danh sách dict ``{'rule', 'depends', 'inputs', 'context'}`` trong đó ``depends``
+        là tập id quy tắc được đọc qua tên mã, ``rules``, ``sum_rules`` hoặc ``categories``
+        (chỉ các quy tắc cùng loại đứng trước, vì categories cộng dồn theo thứ tự tính).
+        """
+        self.ensure_one()
+        rules = self.rule_ids.sorted('sequence')
+        by_code = {rule.code: rule for rule in rules}
+        graph = []
+        for position, rule in enumerate(rules):
+            deps = rule._get_code_dependencies()
+            earlier = rules[:position]
+            depends = set()
+            if ALL_KEYS in deps['rules']:
+                depends.update(earlier.ids)
+            for code in deps['rules'] | deps['names']:
+                if code in by_code:
+                    depends.add(by_code[code].id)
+            if ALL_KEYS in deps['categories']:
+                depends.update(earlier.ids)
+            else:
+                depends.update(earlier.filtered(lambda r: r.rule_type in deps['categories']).ids)
+            graph.append({
+                'rule': rule,
+                'depends': depends,
+                'inputs': deps['inputs'],
+                'context': deps['context'],
+            })
+        return graph
+
+    def _check_rule_dependencies(self):
+        """Báo lỗi vòng lặp hoặc quy tắc đọc giá trị của quy tắc được tính sau nó."""
+        for structure in self:
+            graph = structure._get_rule_graph()
+            position = {node['rule'].id: index for index, node in enumerate(graph)}
+            depends = {node['rule'].id: node['depends'] for node in graph}
+            rules = {node['rule'].id: node['rule'] for node in graph}
+
+            errors = []
+            state = {}
+
+            def visit(rule_id, path):
+                state[rule_id] = 'visiting'
+                for dep_id in sorted(depends[rule_id], key=position.get):
+                    if state.get(dep_id) == 'visiting':
+                        cycle = path[path.index(dep_id):] + [dep_id]
+                        errors.append(_('Vòng lặp phụ thuộc: %s', ' → '.join(rules[i].code for i in cycle)))
+                    elif dep_id not in state:
+                        visit(dep_id, path + [dep_id])
+                state[rule_id] = 'done'
+
+            for node in graph:
+                if node['rule'].id not in state:
+                    visit(node['rule'].id, [node['rule'].id])
+            if not errors:
+                for node in graph:
+                    rule = node['rule']
+                    for dep_id in node['depends']:
+                        if position[dep_id] > position[rule.id]:
+                            errors.append(_(
+                                'Quy tắc %(rule)s (thứ tự %(sequence)s) dùng %(dep)s nhưng %(dep)s được tính sau (thứ tự %(dep_sequence)s).',
+                                rule=rule.code, sequence=rule.sequence,
+                                dep=rules[dep_id].code, dep_sequence=rules[dep_id].sequence,
+                            ))
+            if errors:
+                raise ValidationError(_('Cấu trúc lương %(name)s:\n%(errors)s', name=structure.name, errors='\n'.join(errors)))
+
 
 class ForherSalaryRule(models.Model):
     _name = 'forher.salary.rule'
@@ -56,8 +137,95 @@ class ForherSalaryRule(models.Model):
     def write(self, vals):
         if vals.get('code'):
             vals['code'] = vals['code'].strip().upper()
+        if 'amount_python_compute' in vals:
+            self._invalidate_compiled_code()
         return super().write(vals)
 
+    def unlink(self):
+        self._invalidate_compiled_code()
+        return super().unlink()
+
+    @api.constrains('code', 'sequence', 'rule_type', 'amount_python_compute', 'structure_id')
+    def _check_dependencies(self):
+        for rule in self:
+            try:
+                rule._get_code_dependencies()
+            except SyntaxError as exc:
+                raise ValidationError(_('Mã Python của quy tắc %(rule)s bị lỗi cú pháp:\n%(error)s', rule=rule.code, error=exc)) from exc
+        self.structure_id._check_rule_dependencies()
+
+    def _get_code_dependencies(self):
+        """Phân tích mã Python: những gì quy tắc đọc từ localdict của phiếu lương.
+
+        Trả về dict các tập: ``rules`` (mã qua ``rules[...]`` / ``rules.get`` / ``sum_rules``),
+        ``names`` (tên biến tự do, có thể là mã quy tắc), ``categories``, ``inputs`` và
+        ``context`` (worked_data, payslip, ...). Khoá không cố định được ghi là ``ALL_KEYS``.
+        """
+        self.ensure_one()
+        tree = ast.parse(self.amount_python_compute or 'result = 0.0', mode='exec')
+        deps = {'rules': set(), 'names': set(), 'categories': set(), 'inputs': set(), 'context': set()}
+        buckets = {'rules': 'rules', 'categories': 'categories', 'inputs': 'inputs'}
+        assigned = {
+            node.id for node in ast.walk(tree)
+            if isinstance(node, ast.Name) and isinstance(node.ctx, ast.Store)
+        }
+
+        def constant(node):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                return node.value
+            return ALL_KEYS
+
+        handled = set()
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Subscript) and isinstance(node.value, ast.Name) and node.value.id in buckets:
+                deps[buckets[node.value.id]].add(constant(node.slice))
+                handled.add(id(node.value))
+            elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                    and node.func.attr == 'get' and isinstance(node.func.value, ast.Name)
+                    and node.func.value.id in buckets and node.args):
+                deps[buckets[node.func.value.id]].add(constant(node.args[0]))
+                handled.add(id(node.func.value))
+            elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'sum_rules':
+                for arg in node.args:
+                    items = arg.elts if isinstance(arg, (ast.List, ast.Tuple, ast.Set)) else [arg]
+                    deps['rules'].update(constant(item) for item in items)
+                handled.add(id(node.func))
+
+        for node in ast.walk(tree):
+            if not isinstance(node, ast.Name) or not isinstance(node.ctx, ast.Load) or id(node) in handled:
+                continue
+            if node.id in buckets:
+                # Dùng cả từ điển (duyệt, truyền đi, ...): coi như đọc mọi khoá
+                deps[buckets[node.id]].add(ALL_KEYS)
+            elif node.id == 'sum_rules':
+                deps['rules'].add(ALL_KEYS)
+            elif node.id in CONTEXT_NAMES:
+                deps['context'].add(node.id)
+            elif node.id not in assigned:
+                deps['names'].add(node.id)
+        return deps
+
+    def _invalidate_compiled_code(self):
+        for rule_id in self.ids:
+            _rule_code_cache.pop((self.env.cr.dbname, rule_id), None)
+
+    def _get_compiled_code(self):
+        """Mã Python của quy tắc đã qua kiểm tra opcode của safe_eval và đã biên dịch.
+
+        Chỉ kiểm tra + biên dịch 1 lần cho mỗi mã nguồn của quy tắc; cache lưu kèm mã nguồn
+        và chỉ dùng lại khi khớp (write_date chỉ chính xác tới giây nên không đủ để so).
+        """
+        self.ensure_one()
+        key = (self.env.cr.dbname, self.id)
+        source = self.amount_python_compute or 'result = 0.0'
+        cached = _rule_code_cache.get(key)
+        if cached and cached[0] == source:
+            return cached[1]
+        code = test_expr(source, _SAFE_OPCODES, mode='exec', filename='forher.salary.rule(%s)' % self.id)
+        if self.id:
+            _rule_code_cache[key] = (source, code)
+        return code
+
     def _compute_rule_amount(self, localdict):
         self.ensure_one()
         safe_locals = dict(localdict)
@@ -65,7 +233,11 @@ class ForherSalaryRule(models.Model):
         safe_locals.setdefault('result_qty', safe_locals.get('quantity', 1.0))
         safe_locals.setdefault('result_rate', safe_locals.get('rate', 100.0))
         try:
-            safe_eval(self.amount_python_compute or 'result = 0.0', safe_locals, mode='exec', nocopy=True)
+            code = self._get_compiled_code()
+            # Cùng môi trường thực thi như safe_eval(..., mode='exec', nocopy=True)
+            check_values(safe_locals)
+            safe_locals['__builtins__'] = dict(_BUILTINS)
+            unsafe_eval(code, safe_locals)
         except Exception as exc:
             raise UserError(
                 _(
@@ -0,0 +1,3 @@
+from . import test_salary_rule_perf
+from . import test_salary_rule_dependencies
+from . import test_payslip_run_chunk
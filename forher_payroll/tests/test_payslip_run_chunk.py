@@ -0,0 +1,143 @@
+import json
+from contextlib import closing
+from datetime import date
+
+from odoo import SUPERUSER_ID, api, sql_db
+from odoo.exceptions import UserError
+from odoo.tests.common import TransactionCase
+
+
+class TestPayslipRunChunk(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        structure = cls.env.ref('forher_payroll.forher_salary_structure_default')
+        employees = cls.env['hr.employee'].create([{'name': 'NV lô lương %s' % i} for i in range(5)])
+        cls.env['forher.hr.contract'].create([{
+            'name': 'HĐ lô lương %s' % employee.id,
+            'employee_id': employee.id,
+            'company_id': employee.company_id.id,
+            'wage': 10000000,
+            'date_start': date(2020, 1, 1),
+            'state': 'open',
+            'salary_structure_id': structure.id,
+        } for employee in employees])
+        cls.run = cls.env['forher.payslip.run'].create({
+            'date_start': date(2025, 3, 1),
+            'date_end': date(2025, 3, 31),
+        })
+        cls.run.action_generate_payslips()
+        cls.failing_slip_ids = set()
+
+    def setUp(self):
+        super().setUp()
+        # 5 phiếu, lô 2 phiếu -> 3 lô
+        self.patch(type(self.run), 'COMPUTE_CHUNK_SIZE', 2)
+        Payslip = type(self.env['forher.payslip'])
+        compute_sheet = Payslip.action_compute_sheet
+        failing_slip_ids = self.failing_slip_ids
+
+        def action_compute_sheet(slips):
+            if failing_slip_ids & set(slips.ids):
+                raise UserError('Lỗi tính phiếu giả lập')
+            return compute_sheet(slips)
+
+        self.patch(Payslip, 'action_compute_sheet', action_compute_sheet)
+        self.addCleanup(failing_slip_ids.clear)
+
+    def _slips(self, chunk):
+        return self.env['forher.payslip'].browse(json.loads(chunk.slip_ids))
+
+    def test_split(self):
+        self.run.action_compute()
+        chunks = self.run.chunk_ids
+        self.assertEqual(chunks.mapped('sequence'), [1, 2, 3])
+        self.assertEqual(chunks.mapped('slip_count'), [2, 2, 1])
+        self.assertEqual(set(chunks.mapped('state')), {'pending'})
+        self.assertEqual(sorted(sum((json.loads(c.slip_ids) for c in chunks), [])), sorted(self.run.payslip_ids.ids))
+        self.assertTrue(self.run.compute_running)
+        self.assertEqual(self.run.state, 'generated')
+
+    def test_failed_chunk_and_resume(self):
+        self.run.action_compute()
+        first, failing, last = self.run.chunk_ids
+        self.failing_slip_ids.update(json.loads(failing.slip_ids))
+
+        self.env['forher.payslip.run.chunk']._cron_compute_chunks()
+        self.assertEqual((first.state, failing.state, last.state), ('done', 'failed', 'done'))
+        self.assertEqual(failing.attempt_count, 1)
+        self.assertTrue(failing.message)
+        self.assertTrue(all(slip.line_ids for slip in self._slips(first) | self._slips(last)))
+        self.assertFalse(any(slip.line_ids for slip in self._slips(failing)))
+        # Còn lô lỗi: kỳ lương chưa sang 'Đã tính'
+        self.assertEqual(self.run.state, 'generated')
+        self.assertEqual(self.run.chunk_failed, 1)
+
+        # Tính lại chỉ đưa lô lỗi về hàng đợi
+        self.failing_slip_ids.clear()
+        done_at = first.date_done
+        self.run.action_resume_compute()
+        self.assertEqual((first.state, failing.state, last.state), ('done', 'pending', 'done'))
+        self.assertFalse(failing.message)
+
+        self.env['forher.payslip.run.chunk']._cron_compute_chunks()
+        self.assertEqual(failing.state, 'done')
+        self.assertEqual(failing.attempt_count, 2)
+        self.assertEqual(first.attempt_count, 1)
+        self.assertEqual(first.date_done, done_at)
+        self.assertEqual(self.run.state, 'computed')
+        self.assertEqual(self.run.compute_progress, 100.0)
+
+    def test_finish_waits_for_all_chunks(self):
+        self.run.action_compute()
+        first = self.run.chunk_ids[0]
+        first._process()
+        self.run._finish_chunked_compute()
+        self.assertEqual(self.run.state, 'generated')
+
+        (self.run.chunk_ids - first).sudo().write({'state': 'done'})
+        self.run._finish_chunked_compute()
+        self.assertEqual(self.run.state, 'computed')
+
+    def test_actions_refused_while_computing(self):
+        self.run.action_compute()
+        with self.assertRaises(UserError):
+            self.run.action_reset_to_draft()
+        with self.assertRaises(UserError):
+            self.run.action_cancel()
+        with self.assertRaises(UserError):
+            self.run.action_compute()
+        self.assertEqual(len(self.run.chunk_ids), 3)
+
+    def test_claim_skip_locked(self):
+        # Khoá hàng cần giao dịch độc lập thấy cùng dữ liệu: tạo và commit trên kết nối riêng
+        db = sql_db.db_connect(self.env.cr.dbname)
+        with closing(db.cursor()) as cr:
+            env = api.Environment(cr, SUPERUSER_ID, {'tracking_disable': True})
+            run = env['forher.payslip.run'].create({
+                'date_start': date(2025, 4, 1),
+                'date_end': date(2025, 4, 30),
+            })
+            chunks = env['forher.payslip.run.chunk'].create([
+                {'run_id': run.id, 'sequence': sequence, 'slip_ids': '[]'} for sequence in (1, 2)
+            ])
+            run_id, chunk_ids = run.id, chunks.ids
+            cr.commit()
+
+        def cleanup():
+            with closing(db.cursor()) as cr:
+                cr.execute('DELETE FROM forher_payslip_run WHERE id = %s', (run_id,))
+                cr.commit()
+        self.addCleanup(cleanup)
+
+        with closing(db.cursor()) as cr_a, closing(db.cursor()) as cr_b:
+            lane_a = api.Environment(cr_a, SUPERUSER_ID, {})['forher.payslip.run.chunk']
+            lane_b = api.Environment(cr_b, SUPERUSER_ID, {})['forher.payslip.run.chunk']
+            claimed_a = lane_a._claim_next()
+            claimed_b = lane_b._claim_next()
+            self.assertTrue(claimed_a and claimed_b)
+            # Làn thứ 2 bỏ qua lô đang bị khoá thay vì chờ hoặc nhận trùng
+            self.assertNotEqual(claimed_a.id, claimed_b.id)
+            self.assertIn(claimed_b.id, chunk_ids)
+            cr_a.rollback()
+            cr_b.rollback()
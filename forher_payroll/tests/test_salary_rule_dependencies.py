@@ -0,0 +1,99 @@
+from datetime import date
+
+from odoo.exceptions import ValidationError
+from odoo.tests.common import TransactionCase
+
+
+class TestSalaryRuleDependencies(TransactionCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.structure = cls.env.ref('forher_payroll.forher_salary_structure_default')
+        employee = cls.env['hr.employee'].create({'name': 'NV phụ thuộc quy tắc'})
+        contract = cls.env['forher.hr.contract'].create({
+            'name': 'HĐ phụ thuộc quy tắc',
+            'employee_id': employee.id,
+            'company_id': employee.company_id.id,
+            'wage': 30000000,
+            'date_start': date(2020, 1, 1),
+            'state': 'open',
+            'salary_structure_id': cls.structure.id,
+        })
+        cls.slip = cls.env['forher.payslip'].create({
+            'employee_id': employee.id,
+            'contract_id': contract.id,
+            'structure_id': cls.structure.id,
+            'date_from': date(2025, 3, 1),
+            'date_to': date(2025, 3, 31),
+        })
+
+    def _rule(self, code):
+        return self.structure.rule_ids.filtered(lambda r: r.code == code)
+
+    def test_graph(self):
+        graph = {node['rule'].code: node for node in self.structure._get_rule_graph()}
+        self.assertEqual(graph['SOCINS']['depends'], set(self._rule('BASIC').ids))
+        # PIT đọc categories basic/allowance và SOCINS
+        expected = self.structure.rule_ids.filtered(
+            lambda r: r.rule_type in ('basic', 'allowance') or r.code == 'SOCINS')
+        self.assertEqual(graph['PIT']['depends'], set(expected.ids))
+        self.assertEqual(graph['ADVANCE']['inputs'], {'advance_amount'})
+        self.assertFalse(graph['ADVANCE']['depends'])
+
+    def test_cycle_rejected(self):
+        with self.assertRaises(ValidationError):
+            self._rule('BASIC').amount_python_compute = "result = rules.get('SOCINS', 0.0)"
+
+    def test_order_rejected(self):
+        with self.assertRaises(ValidationError):
+            self._rule('OT').amount_python_compute = 'result = PENALTY'
+
+    def test_syntax_error_rejected(self):
+        with self.assertRaises(ValidationError):
+            self._rule('OT').amount_python_compute = 'result = ('
+
+    def test_incremental_recompute(self):
+        self.slip.action_compute_sheet()
+        lines = {line.code: line for line in self.slip.line_ids}
+        before = {code: (line.id, line.amount) for code, line in lines.items()}
+        self.assertNotIn('ADVANCE', lines)
+
+        self.slip.advance_amount = 1000000
+        after = {line.code: (line.id, line.amount) for line in self.slip.line_ids}
+        self.assertEqual(after['ADVANCE'][1], 1000000)
+        # Các dòng khác giữ nguyên bản ghi và giá trị
+        self.assertEqual({code: value for code, value in after.items() if code != 'ADVANCE'}, before)
+        self.assertEqual(self.slip.total_deduction, sum(
+            line.amount for line in self.slip.line_ids if line.rule_type == 'deduction'))
+
+        self.slip.advance_amount = 0
+        self.assertNotIn('ADVANCE', self.slip.line_ids.mapped('code'))
+
+        # Kết quả tính lại từng phần trùng với tính lại toàn bộ
+        self.slip.abc_rating = 'A'
+        incremental = {line.code: line.amount for line in self.slip.line_ids}
+        self.slip.action_compute_sheet()
+        self.assertEqual({line.code: line.amount for line in self.slip.line_ids}, incremental)
+
+    def test_period_change_keeps_sheet_consistent(self):
+        # Đổi kỳ trên phiếu đã tính không được tính lại dở dang một phần các dòng
+        self.slip.action_compute_sheet()
+        before = {line.code: (line.id, line.amount) for line in self.slip.line_ids}
+        self.slip.date_from = date(2025, 3, 2)
+        self.env.flush_all()
+        self.assertEqual({line.code: (line.id, line.amount) for line in self.slip.line_ids}, before)
+        self.assertEqual(self.slip.leave_days, 4)
+
+        # Tính lại toàn bộ theo kỳ mới trùng với tính từ đầu
+        self.slip.action_compute_sheet()
+        recomputed = {line.code: line.amount for line in self.slip.line_ids}
+        self.slip.line_ids.unlink()
+        self.slip.action_compute_sheet()
+        self.assertEqual({line.code: line.amount for line in self.slip.line_ids}, recomputed)
+
+    def test_leave_days_incremental_only_on_change(self):
+        self.slip.action_compute_sheet()
+        before = {line.code: (line.id, line.amount) for line in self.slip.line_ids}
+        # Ghi lại cùng giá trị: không tính lại
+        self.slip.leave_days = self.slip.leave_days
+        self.assertEqual({line.code: (line.id, line.amount) for line in self.slip.line_ids}, before)
@@ -0,0 +1,136 @@
+import logging
+import os
+import time
+from datetime import date
+
+from odoo.tests.common import TransactionCase, tagged
+from odoo.tools.safe_eval import safe_eval
+
+_logger = logging.getLogger(__name__)
+
+
+@tagged('post_install', '-at_install', '-standard', 'perf')
+class TestSalaryRulePerf(TransactionCase):
+    """Benchmark tính lương trên cấu trúc lương mặc định (đủ các quy tắc thật).
+
+    Chạy riêng: ``odoo-bin -d <db> --test-tags perf -u forher_payroll --stop-after-init``.
+    - safe_eval mỗi lần so với cache mã đã biên dịch, ``FORHER_PERF_SLIPS`` vòng;
+    - tính cả tập ``FORHER_PERF_RUN_SLIPS`` phiếu so với từng phiếu (số truy vấn / phiếu).
+    """
+    SLIPS = int(os.environ.get('FORHER_PERF_SLIPS', 500))
+    RUN_SLIPS = int(os.environ.get('FORHER_PERF_RUN_SLIPS', 100))
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.structure = cls.env.ref('forher_payroll.forher_salary_structure_default')
+        cls.rules = cls.structure.rule_ids.sorted('sequence')
+        employee = cls.env['hr.employee'].create({'name': 'NV benchmark lương'})
+        contract = cls.env['forher.hr.contract'].create({
+            'name': 'HĐ benchmark lương',
+            'employee_id': employee.id,
+            'company_id': employee.company_id.id,
+            'wage': 8000000,
+            'date_start': date(2020, 1, 1),
+            'state': 'open',
+            'salary_structure_id': cls.structure.id,
+        })
+        today = date.today()
+        cls.slip = cls.env['forher.payslip'].create({
+            'employee_id': employee.id,
+            'contract_id': contract.id,
+            'structure_id': cls.structure.id,
+            'date_from': today.replace(day=1),
+            'date_to': today,
+        })
+
+    def _create_slips(self, count):
+        employees = self.env['hr.employee'].create([{'name': 'NV kỳ lương %s' % i} for i in range(count)])
+        contracts = self.env['forher.hr.contract'].create([{
+            'name': 'HĐ kỳ lương %s' % employee.id,
+            'employee_id': employee.id,
+            'company_id': employee.company_id.id,
+            'wage': 8000000,
+            'date_start': date(2020, 1, 1),
+            'state': 'open',
+            'salary_structure_id': self.structure.id,
+        } for employee in employees])
+        return self.env['forher.payslip'].create([{
+            'employee_id': contract.employee_id.id,
+            'contract_id': contract.id,
+            'structure_id': self.structure.id,
+            'date_from': self.slip.date_from,
+            'date_to': self.slip.date_to,
+        } for contract in contracts])
+
+    def _count_compute(self, slips):
+        self.env.flush_all()
+        queries = self.env.cr.sql_log_count
+        start = time.perf_counter()
+        slips.action_compute_sheet()
+        self.env.flush_all()
+        return self.env.cr.sql_log_count - queries, time.perf_counter() - start
+
+    def test_bulk_compute_sheet(self):
+        single_queries, _elapsed = self._count_compute(self.slip)
+        slips = self._create_slips(self.RUN_SLIPS)
+        queries, elapsed = self._count_compute(slips)
+        _logger.info('Benchmark payslip_bulk_compute: %s phiếu, %.2f truy vấn / phiếu (1 phiếu: %s), %.5fs / phiếu',
+                     len(slips), queries / len(slips), single_queries, elapsed / len(slips))
+        self.assertLess(queries / len(slips), single_queries)
+        self.assertEqual(len(slips.line_ids), len(slips) * len(self.slip.line_ids))
+        for slip in slips[:5]:
+            self.assertEqual(slip.total_net, slip.total_gross - slip.total_deduction)
+            self.assertEqual(slip.total_gross, sum(
+                line.amount for line in slip.line_ids if line.rule_type != 'deduction'))
+
+        # Tính lại: dòng cũ bị thay thế, không nhân đôi
+        slips.action_compute_sheet()
+        self.assertEqual(len(slips.line_ids), len(slips) * len(self.slip.line_ids))
+
+    def _evaluate_safe_eval(self, localdict):
+        """Cách tính cũ: kiểm tra + biên dịch lại mã của từng quy tắc mỗi lần."""
+        amounts = []
+        for rule in self.rules:
+            safe_locals = dict(localdict, result=0.0, result_qty=1.0, result_rate=100.0)
+            safe_eval(rule.amount_python_compute, safe_locals, mode='exec', nocopy=True)
+            amounts.append(safe_locals['result'])
+        return amounts
+
+    def _evaluate_cached(self, localdict):
+        return [rule._compute_rule_amount(localdict)[0] for rule in self.rules]
+
+    def _measure(self, name, func):
+        localdict = self.slip._prepare_localdict()
+        localdict.update({'quantity': 1.0, 'rate': 100.0})
+        start = time.perf_counter()
+        for _i in range(self.SLIPS):
+            amounts = func(localdict)
+        elapsed = time.perf_counter() - start
+        _logger.info('Benchmark %s: %s phiếu x %s quy tắc, %.5fs / phiếu',
+                     name, self.SLIPS, len(self.rules), elapsed / self.SLIPS)
+        return elapsed, amounts
+
+    def test_compiled_code_cache(self):
+        uncached, expected = self._measure('salary_rule_safe_eval', self._evaluate_safe_eval)
+        cached, amounts = self._measure('salary_rule_compiled_cache', self._evaluate_cached)
+        self.assertEqual(amounts, expected)
+        _logger.info('Cache mã quy tắc lương nhanh hơn %.1f lần', uncached / cached)
+        self.assertLess(cached, uncached)
+
+    def test_cache_invalidated_on_write(self):
+        rule = self.rules[0]
+        localdict = self.slip._prepare_localdict()
+        rule._compute_rule_amount(localdict)
+        rule.amount_python_compute = 'result = 123.0'
+        self.assertEqual(rule._compute_rule_amount(localdict)[0], 123.0)
+
+    def test_cache_follows_source(self):
+        # Mã nguồn đổi mà không qua write (worker khác, cùng write_date) vẫn không dùng code cũ
+        rule = self.rules[0]
+        localdict = self.slip._prepare_localdict()
+        rule._compute_rule_amount(localdict)
+        self.env.cr.execute(
+            "UPDATE forher_salary_rule SET amount_python_compute = 'result = 456.0' WHERE id = %s", (rule.id,))
+        rule.invalidate_recordset(['amount_python_compute'])
+        self.assertEqual(rule._compute_rule_amount(localdict)[0], 456.0)